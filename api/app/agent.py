@@ -1,12 +1,14 @@
-from app.utils.utils_lib import format_prompt
-from app.utils.image_utils import create_image_input
-from google.genai import types
-from app.services.genai_client import google_client
+import asyncio
+from app.utils.utils_lib import get_prompt_registry
+from app.utils.image_utils import create_image_input, create_image_input_async
+from app.services.genai_client import get_google_client
 from app.utils.response_handlers import handle_llm_response, ResponseSuccess
 from pydantic import BaseModel, Field
 from typing import List, Type, TypeVar, Dict, Any, Optional
-from app.utils.decorators import retry_on_failure
+from app.utils.decorators import retry_on_failure, async_retry_on_failure
 from app.utils.logger import logger
+from app.utils.metrics import stage_timer
+from app.services.llm_cache import get_gemini_cache, make_cache_key
 
 # ========= Schema Models =========
 class PromptItem(BaseModel):
@@ -42,34 +44,58 @@ class ImageCritique(BaseModel):
 
 T = TypeVar("T", bound=BaseModel)
 
-def _call_gemini_with_image(
-    *,
-    image_bytes: bytes,
-    user_prompt: str,
-    system_prompt_path: str,
-    response_schema: Optional[Type[T]]=None,
-    model:str="gemini-2.5-pro",
-) -> ResponseSuccess:
-    system_instruction = format_prompt(system_prompt_path)
-    image_input = create_image_input(image_bytes)
-    user_input = types.Part.from_text(text=user_prompt)
-    
+# google.genai.types is imported lazily: it is by far the most expensive import on the startup path
+def _build_generation_config(system_instruction: str, response_schema: Optional[Type[T]]) -> "types.GenerateContentConfig":
+    from google.genai import types
+
     generation_config = types.GenerateContentConfig(
         system_instruction=system_instruction,
     )
     if response_schema:
         generation_config.response_schema = response_schema
         generation_config.response_mime_type = "application/json"
-    contents = types.Content(role="user", parts=[image_input, user_input])
-    response = google_client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generation_config,
-    )
+    return generation_config
+
+def _build_contents(user_prompt: str, image_input=None) -> "types.Content":
+    from google.genai import types
+
+    parts = [image_input] if image_input is not None else []
+    parts.append(types.Part.from_text(text=user_prompt))
+    return types.Content(role="user", parts=parts)
+
+def _to_response_success(response, response_schema: Optional[Type[T]]) -> ResponseSuccess:
     response_attr = "parsed" if response_schema else "text"
     handle_llm_response(response, response_attr=response_attr)
     return ResponseSuccess(response=getattr(response, response_attr))
 
+def _call_gemini_with_image(
+    *,
+    image_bytes: bytes,
+    user_prompt: str,
+    system_prompt_path: str,
+    response_schema: Optional[Type[T]]=None,
+    model:str="gemini-2.5-pro",
+) -> ResponseSuccess:
+    system_prompt = get_prompt_registry().get(system_prompt_path)
+    system_instruction = system_prompt.render()
+    cache = get_gemini_cache()
+    cache_key = make_cache_key(user_prompt=user_prompt, prompt_version=system_prompt.content_hash, model=model, response_schema=response_schema, image_bytes=image_bytes)
+    cached = cache.get(cache_key, response_schema)
+    if cached is not None:
+        return cached
+    generation_config = _build_generation_config(system_instruction, response_schema)
+    image_input = create_image_input(image_bytes)
+    contents = _build_contents(user_prompt, image_input)
+    with stage_timer("gemini"):
+        response = get_google_client().models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config,
+        )
+    result = _to_response_success(response, response_schema)
+    cache.set(cache_key, result, response_schema)
+    return result
+
 def _call_gemini_with_text(
     *,
     user_prompt: str,
@@ -77,33 +103,86 @@ def _call_gemini_with_text(
     response_schema: Optional[Type[T]]=None,
     model:str="gemini-2.5-pro",
 ) -> ResponseSuccess:
-    system_instruction = format_prompt(system_prompt_path)
-    generation_config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
-    )
-    if response_schema:
-        generation_config.response_schema = response_schema
-        generation_config.response_mime_type = "application/json"
-    contents = types.Content(
-        role="user",
-        parts=[types.Part.from_text(text=user_prompt)]
-    )
-    response = google_client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generation_config,
+    system_prompt = get_prompt_registry().get(system_prompt_path)
+    system_instruction = system_prompt.render()
+    cache = get_gemini_cache()
+    cache_key = make_cache_key(user_prompt=user_prompt, prompt_version=system_prompt.content_hash, model=model, response_schema=response_schema)
+    cached = cache.get(cache_key, response_schema)
+    if cached is not None:
+        return cached
+    generation_config = _build_generation_config(system_instruction, response_schema)
+    contents = _build_contents(user_prompt)
+    with stage_timer("gemini"):
+        response = get_google_client().models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config,
+        )
+    result = _to_response_success(response, response_schema)
+    cache.set(cache_key, result, response_schema)
+    return result
+
+async def _call_gemini_with_image_async(
+    *,
+    image_bytes: bytes,
+    user_prompt: str,
+    system_prompt_path: str,
+    response_schema: Optional[Type[T]]=None,
+    model:str="gemini-2.5-pro",
+) -> ResponseSuccess:
+    system_prompt = get_prompt_registry().get(system_prompt_path)
+    system_instruction = system_prompt.render()
+    cache = get_gemini_cache()
+    # Hashing a multi-MB image is CPU work; keep it off the event loop
+    cache_key = await asyncio.to_thread(
+        make_cache_key, user_prompt=user_prompt, prompt_version=system_prompt.content_hash, model=model, response_schema=response_schema, image_bytes=image_bytes
     )
-    response_attr = "parsed" if response_schema else "text"
-    handle_llm_response(response, response_attr=response_attr)
-    return ResponseSuccess(response=getattr(response, response_attr))
+    cached = await cache.aget(cache_key, response_schema)
+    if cached is not None:
+        return cached
+    generation_config = _build_generation_config(system_instruction, response_schema)
+    image_input = await create_image_input_async(image_bytes)
+    contents = _build_contents(user_prompt, image_input)
+    with stage_timer("gemini"):
+        response = await get_google_client().aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config,
+        )
+    result = _to_response_success(response, response_schema)
+    await cache.aset(cache_key, result, response_schema)
+    return result
+
+async def _call_gemini_with_text_async(
+    *,
+    user_prompt: str,
+    system_prompt_path: str,
+    response_schema: Optional[Type[T]]=None,
+    model:str="gemini-2.5-pro",
+) -> ResponseSuccess:
+    system_prompt = get_prompt_registry().get(system_prompt_path)
+    system_instruction = system_prompt.render()
+    cache = get_gemini_cache()
+    cache_key = make_cache_key(user_prompt=user_prompt, prompt_version=system_prompt.content_hash, model=model, response_schema=response_schema)
+    cached = await cache.aget(cache_key, response_schema)
+    if cached is not None:
+        return cached
+    generation_config = _build_generation_config(system_instruction, response_schema)
+    contents = _build_contents(user_prompt)
+    with stage_timer("gemini"):
+        response = await get_google_client().aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config,
+        )
+    result = _to_response_success(response, response_schema)
+    await cache.aset(cache_key, result, response_schema)
+    return result
 
 
-@retry_on_failure()
-def translate_vision_to_image_prompt(vision: str, image_bytes: bytes) -> ResponseSuccess:
-    """
-    # CHANGE: Generate 4-shot plan (hero/detail/environment/flatlay) from vision + image.
-    """
-    user_prompt = f"""
+# ========= User prompts (shared by the sync and async APIs) =========
+def _vision_user_prompt(vision: str) -> str:
+    return f"""
 Based on the following theme/vision statement generate a set of detailed image prompts suitable for an AI image generation model. 
 Each prompt should include specific details about the subject, style, colors, and composition to create a vivid and engaging image.
 The required styles that the images should follow are:
@@ -114,16 +193,9 @@ The required styles that the images should follow are:
 VISION: {vision}
 You also have access to the reference image, which you must use to inform the style and composition of the generated prompts.
 """
-    return _call_gemini_with_image(
-        image_bytes=image_bytes,
-        user_prompt=user_prompt,
-        system_prompt_path="./app/prompts/translate_to_image_prompt_v2.txt",
-        response_schema=ImagePrompts,
-    )
 
-@retry_on_failure()
-def plan_variants(image_bytes: bytes, shot_type: str) -> ResponseSuccess:
-    user_prompt = f"""
+def _plan_variants_user_prompt(shot_type: str) -> str:
+    return f"""
 Context:
 - The shot_type is: {shot_type}
 - Use what you see in the image: subject material (glass/metal/fabric/leather), reflectivity/translucency, current lighting quality and direction, camera viewpoint (pitch/yaw/height), background style (solid/gradient/props), and overall mood.
@@ -139,34 +211,20 @@ Requirements:
 - Flatlay: keep pitch top-down; avoid extreme yaw; favor center_clean.
 - Environment: background can include subtle props or gradients; keep subject dominant.
 """
-    return _call_gemini_with_image(
-        image_bytes=image_bytes,
-        user_prompt=user_prompt,
-        system_prompt_path="./app/prompts/plan_variants.txt",
-        response_schema=VariantGroups,
-    )
 
-@retry_on_failure()
-def critique_image(image_bytes:bytes, shot_type:str, generation_details: Dict[str, Any])->ResponseSuccess:
-    user_prompt=f"""
+def _critique_user_prompt(shot_type: str, generation_details: Dict[str, Any]) -> str:
+    return f"""
 Please critique the provided image. 
 Context: 
 Intended shot type: {shot_type}
 Initial prompt for the image:
 {generation_details}
 """
-    return _call_gemini_with_image(
-        user_prompt=user_prompt,
-        image_bytes=image_bytes, 
-        system_prompt_path="./app/prompts/critique.txt", 
-        response_schema=ImageCritique
-    )
 
-@retry_on_failure()
-def create_refinement_prompt(image_critique: ImageCritique):
+def _refinement_user_prompt(image_critique: ImageCritique) -> str:
     critique_text = image_critique.critique
     rating = image_critique.overall_rating
-    user_prompt = f"""
+    return f"""
 You are given a production-focused image critique and an overall rating for the latest generation. 
 Write ONE refined natural-language text prompt for Bria FIBO to generate the next iteration that directly addresses the critique while preserving the successful aspects. 
 Critique:
@@ -174,9 +232,43 @@ Critique:
 
 Overall rating: {rating}/10
 """
+
+
+@retry_on_failure()
+def translate_vision_to_image_prompt(vision: str, image_bytes: bytes) -> ResponseSuccess:
+    """
+    # CHANGE: Generate 4-shot plan (hero/detail/environment/flatlay) from vision + image.
+    """
+    return _call_gemini_with_image(
+        image_bytes=image_bytes,
+        user_prompt=_vision_user_prompt(vision),
+        system_prompt_path="translate_to_image_prompt_v2.txt",
+        response_schema=ImagePrompts,
+    )
+
+@retry_on_failure()
+def plan_variants(image_bytes: bytes, shot_type: str) -> ResponseSuccess:
+    return _call_gemini_with_image(
+        image_bytes=image_bytes,
+        user_prompt=_plan_variants_user_prompt(shot_type),
+        system_prompt_path="plan_variants.txt",
+        response_schema=VariantGroups,
+    )
+
+@retry_on_failure()
+def critique_image(image_bytes:bytes, shot_type:str, generation_details: Dict[str, Any])->ResponseSuccess:
+    return _call_gemini_with_image(
+        user_prompt=_critique_user_prompt(shot_type, generation_details),
+        image_bytes=image_bytes, 
+        system_prompt_path="critique.txt", 
+        response_schema=ImageCritique
+    )
+
+@retry_on_failure()
+def create_refinement_prompt(image_critique: ImageCritique):
     return _call_gemini_with_text(
-        user_prompt=user_prompt,
-        system_prompt_path="./app/prompts/create_refinement_prompt.txt",
+        user_prompt=_refinement_user_prompt(image_critique),
+        system_prompt_path="create_refinement_prompt.txt",
         response_schema=PromptItem,
     )
    
@@ -195,6 +287,57 @@ def improve_image(image_bytes: bytes, shot_type: str, generation_details: Dict[s
         "refinement": refinement_response.response.prompt
     }
 
+# ========= Async API (use these from async def handlers) =========
+@async_retry_on_failure()
+async def translate_vision_to_image_prompt_async(vision: str, image_bytes: bytes) -> ResponseSuccess:
+    return await _call_gemini_with_image_async(
+        image_bytes=image_bytes,
+        user_prompt=_vision_user_prompt(vision),
+        system_prompt_path="translate_to_image_prompt_v2.txt",
+        response_schema=ImagePrompts,
+    )
+
+@async_retry_on_failure()
+async def plan_variants_async(image_bytes: bytes, shot_type: str) -> ResponseSuccess:
+    return await _call_gemini_with_image_async(
+        image_bytes=image_bytes,
+        user_prompt=_plan_variants_user_prompt(shot_type),
+        system_prompt_path="plan_variants.txt",
+        response_schema=VariantGroups,
+    )
+
+@async_retry_on_failure()
+async def critique_image_async(image_bytes: bytes, shot_type: str, generation_details: Dict[str, Any]) -> ResponseSuccess:
+    return await _call_gemini_with_image_async(
+        user_prompt=_critique_user_prompt(shot_type, generation_details),
+        image_bytes=image_bytes,
+        system_prompt_path="critique.txt",
+        response_schema=ImageCritique
+    )
+
+@async_retry_on_failure()
+async def create_refinement_prompt_async(image_critique: ImageCritique) -> ResponseSuccess:
+    return await _call_gemini_with_text_async(
+        user_prompt=_refinement_user_prompt(image_critique),
+        system_prompt_path="create_refinement_prompt.txt",
+        response_schema=PromptItem,
+    )
+
+async def improve_image_async(image_bytes: bytes, shot_type: str, generation_details: Dict[str, Any]) -> Dict[str, str]:
+    critique_response = await critique_image_async(
+        image_bytes=image_bytes,
+        shot_type=shot_type,
+        generation_details=generation_details
+    )
+    logger.info(f"Recieved critique {critique_response.response}")
+    refinement_response = await create_refinement_prompt_async(
+        image_critique=critique_response.response
+    )
+    return {
+        "critique": critique_response.response.critique,
+        "refinement": refinement_response.response.prompt
+    }
+
 if __name__=="__main__":
     from app.utils.image_utils import get_image_bytes
     image_path="https://storage.googleapis.com/refractions/generated_images/generated_image_20251124T215035Z.png"
@@ -0,0 +1,105 @@
+"""
+One-off backfill: replace structured prompts stored inline in existing image_revisions and
+generated_images documents (including revisions created by migrate_revisions) with
+{"sp_ref": <hash>} references into the structured_prompts collection.
+
+Idempotent and safe to re-run: prompts are upserted by content hash, and only fields that still
+hold an inline prompt are rewritten, one $set per field so sibling fields are never touched.
+
+    python -m app.db.backfill_prompt_refs [--batch-size 200] [--dry-run]
+"""
+import argparse
+import asyncio
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+from app.db.db_collections import REVISIONS_COLLECTION
+from app.db.db_connection import DatabaseConnection
+from app.services.prompt_store import REF_KEY, STRUCTURED_PROMPT_PATHS, StructuredPromptStore, get_prompt_store, prompt_hash
+from app.utils.logger import logger
+
+BACKFILL_COLLECTIONS = (REVISIONS_COLLECTION, "generated_images")
+
+# Documents with at least one structured prompt that isn't a ref yet
+INLINE_PROMPT_QUERY = {
+    "$or": [
+        {f"{parent}.{field}": {"$exists": True}, f"{parent}.{field}.{REF_KEY}": {"$exists": False}}
+        for parent, field in STRUCTURED_PROMPT_PATHS
+    ]
+}
+INLINE_PROMPT_PROJECTION = {parent: 1 for parent, _ in STRUCTURED_PROMPT_PATHS}
+
+
+def _inline_prompt(document: Dict[str, Any], parent: str, field: str) -> bool:
+    value = (document.get(parent) or {}).get(field)
+    if isinstance(value, dict) and REF_KEY in value:
+        return False
+    return isinstance(value, (dict, str)) and prompt_hash(value) is not None
+
+
+def ref_updates(original: Dict[str, Any], dehydrated: Dict[str, Any]) -> Dict[str, Any]:
+    """{"parent.field": ref} for each prompt dehydrate() replaced with a ref."""
+    updates = {}
+    for parent, field in STRUCTURED_PROMPT_PATHS:
+        before = (original.get(parent) or {}).get(field)
+        after = (dehydrated.get(parent) or {}).get(field)
+        if after is not before and isinstance(after, dict) and REF_KEY in after:
+            updates[f"{parent}.{field}"] = after
+    return updates
+
+
+async def backfill_collection(collection, store: StructuredPromptStore, batch_size: int = 200, dry_run: bool = False) -> Dict[str, int]:
+    stats = {"documents": 0, "fields": 0}
+
+    async def flush(batch: List[Dict[str, Any]]) -> None:
+        if dry_run:
+            for document in batch:
+                fields = sum(1 for parent, field in STRUCTURED_PROMPT_PATHS if _inline_prompt(document, parent, field))
+                stats["documents"] += 1 if fields else 0
+                stats["fields"] += fields
+            return
+        # Every new prompt in the batch is stored in one round trip before any document points at it
+        dehydrated = await store.dehydrate_many(batch)
+        writes = []
+        for original, stored in zip(batch, dehydrated):
+            updates = ref_updates(original, stored)
+            if updates:
+                writes.append(UpdateOne({"_id": original["_id"]}, {"$set": updates}))
+                stats["documents"] += 1
+                stats["fields"] += len(updates)
+        if writes:
+            await collection.bulk_write(writes, ordered=False)
+
+    batch: List[Dict[str, Any]] = []
+    async for document in collection.find(INLINE_PROMPT_QUERY, INLINE_PROMPT_PROJECTION, batch_size=batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return stats
+
+
+async def backfill(batch_size: int = 200, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    db_connection = DatabaseConnection.get_instance()
+    db_connection.initialize_async_mongo_client()
+    try:
+        results = {}
+        for name in BACKFILL_COLLECTIONS:
+            results[name] = await backfill_collection(
+                db_connection.get_async_collection(name), get_prompt_store(), batch_size, dry_run
+            )
+            logger.info(f"Prompt ref backfill {'(dry run) ' if dry_run else ''}for {name}: {results[name]}")
+        return results
+    finally:
+        await db_connection.close_async_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(backfill(batch_size=args.batch_size, dry_run=args.dry_run))
@@ -1,10 +1,35 @@
-from typing import Dict, List, Any, Optional, Union, Callable
-from pymongo import ReturnDocument
+from typing import Dict, List, Any, Literal, Optional, Tuple, Union, Callable
+from pymongo import DESCENDING
+from pymongo.write_concern import WriteConcern
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
 from app.utils.logger import logger
+from app.utils.metrics import stage_timer
 from app.db.db_connection import DatabaseConnection
+from app.services.prompt_store import get_prompt_store
 
+# Fields the critique and variant-planning routes need; skips the variants/edits history
+IMAGE_SUMMARY_PROJECTION = {"_id": 0, "result_data": 1, "generation_data": 1, "shot_type": 1}
+
+# Variants and edits live in their own collection so image documents stay small and constant-size
+REVISIONS_COLLECTION = "image_revisions"
+RevisionKind = Literal["variant", "edit"]
+REVISIONS_PAGE_MAX = 100
+
+
+def encode_revisions_cursor(revision: Dict) -> str:
+    return f"{int(revision['timestamp'].replace(tzinfo=timezone.utc).timestamp() * 1000)}_{revision['_id']}"
+
+
+def decode_revisions_cursor(cursor: str) -> Dict:
+    """Keyset filter for revisions strictly older than the cursor (timestamp desc, _id desc)."""
+    try:
+        millis, object_id = cursor.split("_", 1)
+        ts = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+        oid = ObjectId(object_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+    return {"$or": [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]}
 
 
 class DatabaseCollection:
@@ -25,38 +50,167 @@ class DatabaseCollection:
         logger.info(f"Inserted document with ID: {result.inserted_id} into collection {self.collection.name}")
         return result.inserted_id
     
-    def get_data_by_query(self, query: Dict) -> Optional[Dict]:
-        """Retrieve a single document matching the query."""
-        result = self.collection.find_one(query)
+    def get_data_by_query(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        """Retrieve a single document matching the query, optionally limited to projection."""
+        result = self.collection.find_one(query, projection)
+        logger.info(f"Queried document with {query} from collection {self.collection.name}")
+        return result
+
+
+class AsyncDatabaseCollection:
+    """
+    Async counterpart of DatabaseCollection backed by pymongo's AsyncMongoClient.
+    Same interface, but every method is awaitable so DB round trips never block the event loop.
+    """
+
+    def __init__(self, collection_name):
+        db_connection = DatabaseConnection.get_instance()
+        self.collection = db_connection.get_async_collection(collection_name)
+
+    async def insert_data(self, data: Dict) -> ObjectId:
+        """Insert a document into the collection."""
+        data["timestamp"] = datetime.now(timezone.utc)
+        with stage_timer("mongo_insert"):
+            result = await self.collection.insert_one(data)
+        logger.info(f"Inserted document with ID: {result.inserted_id} into collection {self.collection.name}")
+        return result.inserted_id
+
+    async def get_data_by_query(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        """Retrieve a single document matching the query, optionally limited to projection."""
+        with stage_timer("mongo_find"):
+            result = await self.collection.find_one(query, projection)
         logger.info(f"Queried document with {query} from collection {self.collection.name}")
         return result
 
 
-class GeneratedImagesCollection(DatabaseCollection):
+class AsyncGeneratedImagesCollection(AsyncDatabaseCollection):
     def __init__(self):
         super().__init__("generated_images")
+        self.revisions = AsyncImageRevisionsCollection()
 
-    def get_image_by_request_id(self, request_id: str) -> Optional[Dict]:
-        """Retrieve an image document by its request_id."""
-        return self.get_data_by_query({"result_data.request_id": request_id})
-    
-    def update_image_with_variant(self, request_id:str, variant_data:Dict) -> Optional[Dict]:
-        """Update an image document by adding a new variant."""
-        updated_document = self.collection.find_one_and_update(
-            {"result_data.request_id": request_id},
-            {"$push": {"variants": variant_data}},
-            return_document=ReturnDocument.AFTER
+    async def insert_data(self, data: Dict) -> ObjectId:
+        """Insert an image document, storing its structured prompts by reference."""
+        return await super().insert_data(await get_prompt_store().dehydrate(data))
+
+    async def get_image_by_request_id(self, request_id: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+        """Retrieve an image document by its request_id, with structured prompts resolved."""
+        document = await self.get_data_by_query({"result_data.request_id": request_id}, projection)
+        return await get_prompt_store().hydrate(document)
+
+    async def update_image_with_variant(self, request_id: str, variant_data: Dict) -> ObjectId:
+        """Record a new variant of an image (stored in image_revisions, not on the image document)."""
+        return await self.revisions.insert_data({**variant_data, "parent_request_id": request_id, "kind": "variant"})
+
+    async def push_variants(self, request_id: str, variants: List[Dict]) -> int:
+        """Record several variants in one round trip, acknowledged by a majority. Returns the count written."""
+        return await self.revisions.insert_revisions(request_id, "variant", variants)
+
+    async def update_image_with_edit(self, request_id: str, edited_image_data: Dict) -> ObjectId:
+        """Record a new edit of an image (stored in image_revisions, not on the image document)."""
+        return await self.revisions.insert_data({**edited_image_data, "parent_request_id": request_id, "kind": "edit"})
+
+    async def get_variant_result_by_payload_key(self, payload_key: str) -> Optional[Dict]:
+        """Return the stored result_data of a variant generated from an identical Bria payload, if any."""
+        return await self.revisions.get_variant_result_by_payload_key(payload_key)
+
+
+class AsyncImageRevisionsCollection(AsyncDatabaseCollection):
+    """Variants and edits of generated images, one document each, keyed by parent_request_id."""
+
+    def __init__(self):
+        super().__init__(REVISIONS_COLLECTION)
+
+    async def insert_data(self, data: Dict) -> ObjectId:
+        return await super().insert_data(await get_prompt_store().dehydrate(data))
+
+    async def insert_revisions(self, parent_request_id: str, kind: RevisionKind, revisions: List[Dict]) -> int:
+        if not revisions:
+            return 0
+        now = datetime.now(timezone.utc)
+        documents = [
+            {**r, "parent_request_id": parent_request_id, "kind": kind, "timestamp": now}
+            for r in await get_prompt_store().dehydrate_many(revisions)
+        ]
+        durable = self.collection.with_options(write_concern=WriteConcern(w="majority"))
+        with stage_timer("mongo_insert_many"):
+            result = await durable.insert_many(documents, ordered=True)
+        logger.info(f"Inserted {len(result.inserted_ids)} {kind} revisions for request_id: {parent_request_id}")
+        return len(result.inserted_ids)
+
+    async def list_revisions(
+        self,
+        parent_request_id: str,
+        kind: Optional[RevisionKind] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Newest-first page of revisions for an image. Returns (revisions, next_cursor);
+        next_cursor is None on the last page. Raises ValueError for a malformed cursor.
+        """
+        limit = max(1, min(limit, REVISIONS_PAGE_MAX))
+        query: Dict[str, Any] = {"parent_request_id": parent_request_id}
+        if kind:
+            query["kind"] = kind
+        if cursor:
+            query.update(decode_revisions_cursor(cursor))
+        with stage_timer("mongo_find"):
+            documents = await self.collection.find(query).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list()
+        next_cursor = encode_revisions_cursor(documents[limit - 1]) if len(documents) > limit else None
+        page = documents[:limit]
+        store = get_prompt_store()
+        for document in page:
+            document["_id"] = str(document["_id"])
+            await store.hydrate(document)
+        return page, next_cursor
+
+    async def get_variant_result_by_payload_key(self, payload_key: str) -> Optional[Dict]:
+        document = await self.collection.find_one(
+            {"payload_key": payload_key, "kind": "variant"},
+            {"_id": 0, "result_data": 1},
         )
-        logger.info(f"Updated document with request_id: {request_id} by adding new variant.")
-        return updated_document
-    
-    def update_image_with_edit(self, request_id:str, edited_image_data: Dict)->Optional[Dict]:
-        updated_document = self.collection.find_one_and_update(
-            {"result_data.request_id": request_id},
-            {"$push": {"edits": edited_image_data}},
-            return_document=ReturnDocument.AFTER
+        document = await get_prompt_store().hydrate(document)
+        return document.get("result_data") if document else None
+
+
+class AsyncJobsCollection(AsyncDatabaseCollection):
+    def __init__(self):
+        super().__init__("jobs")
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Retrieve a job document by its id (stored as request_id)."""
+        return await self.get_data_by_query({"request_id": job_id}, {"_id": 0})
+
+    async def update_job(self, job_id: str, fields: Dict[str, Any]) -> None:
+        """Set fields on a job and bump updated_at. Does not return the document."""
+        fields = {**fields, "updated_at": datetime.now(timezone.utc)}
+        await self.collection.update_one({"request_id": job_id}, {"$set": fields})
+
+    async def renew_leases(self, owner: str) -> int:
+        """Bump updated_at on the owner's pending/running jobs so other instances see them as live."""
+        result = await self.collection.update_many(
+            {"owner": owner, "status": {"$in": ["pending", "running"]}},
+            {"$set": {"updated_at": datetime.now(timezone.utc)}},
         )
-        logger.info(f"Updated document with request_id: {request_id} by adding new variant.")
-        return updated_document
-    
+        return result.modified_count
 
+    async def fail_interrupted_jobs(self, lease_seconds: float, previous_owner: Optional[str] = None) -> int:
+        """
+        Mark pending/running jobs as failed when their owner stopped renewing the lease more than
+        lease_seconds ago, plus every job of previous_owner (a restarted instance). Returns the count.
+        """
+        now = datetime.now(timezone.utc)
+        expired = now - timedelta(seconds=lease_seconds)
+        abandoned: List[Dict[str, Any]] = [
+            {"updated_at": {"$lt": expired}},
+            {"updated_at": None, "created_at": {"$lt": expired}},
+        ]
+        if previous_owner:
+            abandoned.append({"owner": previous_owner})
+        result = await self.collection.update_many(
+            {"status": {"$in": ["pending", "running"]}, "$or": abandoned},
+            {"$set": {"status": "failed", "error": "interrupted: worker instance stopped", "updated_at": now, "completed_at": now}},
+        )
+        if result.modified_count:
+            logger.warning(f"Marked {result.modified_count} interrupted jobs as failed")
+        return result.modified_count
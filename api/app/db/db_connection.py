@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, IndexModel, MongoClient
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
 
 from app.utils.logger import logger
@@ -9,10 +11,55 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
+# Pool and timeout tuning shared by the sync and async clients (overridable via env)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
 
 class DatabaseConnection:
     _instance = None
 
+    # Indexes every collection needs; created idempotently at startup by ensure_indexes()
+    INDEXES: Dict[str, List[IndexModel]] = {
+        "generated_images": [
+            IndexModel([("result_data.request_id", ASCENDING)], name="result_data_request_id"),
+            IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+            IndexModel([("shot_type", ASCENDING), ("timestamp", DESCENDING)], name="shot_type_timestamp"),
+        ],
+        "image_revisions": [
+            IndexModel(
+                [("parent_request_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                name="parent_timestamp",
+            ),
+            IndexModel(
+                [("parent_request_id", ASCENDING), ("kind", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                name="parent_kind_timestamp",
+            ),
+            IndexModel([("payload_key", ASCENDING)], name="payload_key", sparse=True),
+        ],
+        "jobs": [
+            IndexModel([("request_id", ASCENDING)], name="job_request_id", unique=True),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        ],
+    }
+
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
@@ -27,12 +74,15 @@ class DatabaseConnection:
         self.client = None
         self.db = None
         self.collections = {}
+        self.async_client: Optional[AsyncMongoClient] = None
+        self.async_db = None
+        self.async_collections = {}
 
     def initialize_mongo_client(self):
         """Initialize MongoDB Client"""
         if not self.client:
             try:
-                self.client = MongoClient(host=MONGO_URI)
+                self.client = MongoClient(host=MONGO_URI, **_client_options())
                 self.db = self.client[MONGO_DB_NAME]
                 logger.info("✅  MongoDB connection established ✅")
                 return self.db
@@ -40,6 +90,42 @@ class DatabaseConnection:
                 logger.error(f"❌ Failed to initialize MongoDB: {e} ❌")
                 raise
 
+    def initialize_async_mongo_client(self, host: Optional[str] = None, db_name: Optional[str] = None, **client_options):
+        """Initialize the async MongoDB client used by request handlers. Connections open lazily on first use."""
+        if not self.async_client:
+            try:
+                options = {**_client_options(), **client_options}
+                self.async_client = AsyncMongoClient(host=host or MONGO_URI, **options)
+                self.async_db = self.async_client[db_name or MONGO_DB_NAME]
+                logger.info(f"✅  Async MongoDB client initialized (maxPoolSize={options['maxPoolSize']}) ✅")
+                return self.async_db
+            except Exception as e:
+                logger.error(f"❌ Failed to initialize async MongoDB client: {e} ❌")
+                raise
+
+    async def ensure_indexes(self):
+        """Create the declared INDEXES. create_indexes is a no-op for indexes that already exist."""
+        for collection_name, indexes in self.INDEXES.items():
+            try:
+                created = await self.get_async_collection(collection_name).create_indexes(indexes)
+                logger.info(f"✅ Ensured indexes on {collection_name}: {created} ✅")
+            except Exception as e:
+                # Don't block startup on index builds; queries still work, just slower
+                logger.error(f"❌ Failed to ensure indexes on {collection_name}: {e} ❌")
+
+    async def close_async_connection(self):
+        """Close the async MongoDB client"""
+        if self.async_client:
+            try:
+                await self.async_client.close()
+                logger.info("✅ Async MongoDB connection closed ✅")
+            except Exception as e:
+                logger.error(f"❌ Failed to close async MongoDB connection: {e} ❌")
+            finally:
+                self.async_client = None
+                self.async_db = None
+                self.async_collections = {}
+
     def close_connection(self):
         """Close the MongoDB connection"""
         if self.client:
@@ -60,4 +146,16 @@ class DatabaseConnection:
         if collection_name not in self.collections:
             self.collections[collection_name] = self.db[collection_name]
 
-        return self.collections[collection_name]
\ No newline at end of file
+        return self.collections[collection_name]
+
+    def get_async_collection(self, collection_name) -> AsyncCollection:
+        """Get an async collection by name"""
+        if self.async_db is None:
+            raise Exception(
+                "Async database not initialized. Call initialize_async_mongo_client first."
+            )
+
+        if collection_name not in self.async_collections:
+            self.async_collections[collection_name] = self.async_db[collection_name]
+
+        return self.async_collections[collection_name]
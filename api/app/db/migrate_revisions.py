@@ -0,0 +1,89 @@
+"""
+One-off migration: move the embedded `variants` / `edits` arrays of generated_images documents
+into the image_revisions collection, then unset them on the parent.
+
+Idempotent and safe to re-run: each entry is upserted on (parent_request_id, kind, migrated_index),
+and arrays are only unset once all their entries have been written. Migrated entries still hold
+their structured prompts inline, so a full run finishes with the backfill_prompt_refs pass that
+swaps them (and any legacy image prompts) for structured_prompts refs.
+
+    python -m app.db.migrate_revisions [--batch-size 100] [--dry-run]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+from app.db.backfill_prompt_refs import backfill
+from app.db.db_collections import REVISIONS_COLLECTION
+from app.db.db_connection import DatabaseConnection
+from app.utils.logger import logger
+
+EMBEDDED_ARRAYS = {"variants": "variant", "edits": "edit"}
+
+
+def revision_documents(parent: Dict) -> List[Dict]:
+    """Child revision documents for one parent image, in their original order."""
+    parent_request_id = (parent.get("result_data") or {}).get("request_id")
+    base_ts = parent.get("timestamp") or datetime.now(timezone.utc)
+    documents = []
+    for field, kind in EMBEDDED_ARRAYS.items():
+        for index, entry in enumerate(parent.get(field) or []):
+            documents.append({
+                **entry,
+                "parent_request_id": parent_request_id,
+                "kind": kind,
+                # Embedded entries had no timestamp of their own; keep their order stable
+                "timestamp": entry.get("timestamp") or base_ts + timedelta(milliseconds=index + 1),
+                "migrated_index": index,
+            })
+    return documents
+
+
+def migrate(batch_size: int = 100, dry_run: bool = False) -> Dict[str, int]:
+    db_connection = DatabaseConnection.get_instance()
+    db_connection.initialize_mongo_client()
+    images = db_connection.get_collection("generated_images")
+    revisions = db_connection.get_collection(REVISIONS_COLLECTION)
+
+    stats = {"parents": 0, "revisions": 0, "skipped": 0}
+    query = {"$or": [{field: {"$exists": True}} for field in EMBEDDED_ARRAYS]}
+    projection = {"result_data.request_id": 1, "timestamp": 1, **{field: 1 for field in EMBEDDED_ARRAYS}}
+    for parent in images.find(query, projection, batch_size=batch_size):
+        documents = revision_documents(parent)
+        if documents and not documents[0]["parent_request_id"]:
+            logger.warning(f"Skipping image {parent['_id']}: no result_data.request_id")
+            stats["skipped"] += 1
+            continue
+        stats["parents"] += 1
+        stats["revisions"] += len(documents)
+        if dry_run:
+            continue
+        if documents:
+            revisions.bulk_write([
+                UpdateOne(
+                    {"parent_request_id": d["parent_request_id"], "kind": d["kind"], "migrated_index": d["migrated_index"]},
+                    {"$setOnInsert": d},
+                    upsert=True,
+                )
+                for d in documents
+            ], ordered=False)
+        images.update_one({"_id": parent["_id"]}, {"$unset": {field: "" for field in EMBEDDED_ARRAYS}})
+
+    if not dry_run:
+        # Replaced by the payload_key index on image_revisions
+        if "variants_payload_key" in images.index_information():
+            images.drop_index("variants_payload_key")
+    logger.info(f"Revision migration {'(dry run) ' if dry_run else ''}done: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    migrate(batch_size=args.batch_size, dry_run=args.dry_run)
+    asyncio.run(backfill(dry_run=args.dry_run))
@@ -1,23 +1,130 @@
 import httpx
 import asyncio
+import hashlib
 import json
-from typing import Any, Dict, Union, Optional
+from typing import Any, Dict, Literal, Union, Optional
 from functools import lru_cache
 import os
 from dotenv import load_dotenv
 from app.utils.logger import logger
-from app.utils.image_utils import download_image_from_url, encode_image_to_base64
+from app.utils.metrics import stage_timer
+from app.utils.image_utils import stream_image_from_url, encode_image_to_base64
+from app.services.status_poller import StatusPoller
+from app.services.single_flight import SingleFlight
+from app.services.prompt_store import prompt_hash
 load_dotenv()
 BRIA_API_TOKEN=os.getenv("BRIA_API_TOKEN")
-DEFAULT_BASE_URL="https://engine.prod.bria-api.com/v2"
+# Point at a local simulator (python -m loadtest.bria_simulator) for load tests
+DEFAULT_BASE_URL=os.getenv("BRIA_BASE_URL", "https://engine.prod.bria-api.com/v2")
+
+# Connection pool tuning for the shared Bria client (overridable via env)
+BRIA_MAX_CONNECTIONS = int(os.getenv("BRIA_MAX_CONNECTIONS", "50"))
+BRIA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BRIA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+BRIA_KEEPALIVE_EXPIRY = float(os.getenv("BRIA_KEEPALIVE_EXPIRY", "30"))
+BRIA_HTTP_TIMEOUT = float(os.getenv("BRIA_HTTP_TIMEOUT", "30"))
+BRIA_HTTP2 = os.getenv("BRIA_HTTP2", "false").lower() in ("1", "true", "yes")
+
+
+def build_refine_payload(seed: int, structured_prompt: Union[Dict[str, Any], str], new_prompt: str, **params) -> Dict[str, Any]:
+    """Bria request payload for a seeded refinement of a previous image."""
+    if isinstance(structured_prompt, dict):
+        sp_string = json.dumps(structured_prompt)
+    else:
+        sp_string = structured_prompt
+    request_payload = {"structured_prompt": sp_string,
+                       "visual_output_content_moderation": False,
+                       "seed": seed,
+                       "prompt": new_prompt
+                       }
+    request_payload.update(params)
+    return request_payload
+
+
+def canonical_payload_key(request_payload: Dict[str, Any], prompt_key: Optional[str] = None) -> str:
+    """
+    Stable hash of a generation payload. structured_prompt is compared by content (its prompt
+    store hash), so the same prompt sent as a dict or as differently-formatted JSON yields the
+    same key. Callers that already know that hash pass it as prompt_key to skip re-hashing.
+    """
+    canonical = dict(request_payload)
+    sp = canonical.pop("structured_prompt", None)
+    h = hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    if sp is not None:
+        h.update(b"\x00")
+        h.update((prompt_key or prompt_hash(sp) or sp).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 -- only needed when http2 is requested
+        return True
+    except ImportError:
+        return False
+
 
 class ImageGenClient:
-    def __init__(self, auth: Dict, base_url: str):
+    def __init__(
+        self,
+        auth: Dict,
+        base_url: str,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = BRIA_HTTP2,
+        timeout: float = BRIA_HTTP_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        save_to: Literal["file", "gcs"] = "gcs",
+    ):
         self.base_url = base_url
         self.headers = {
             "Content-Type": "application/json",
             **auth
         }
+        self.limits = limits or httpx.Limits(
+            max_connections=BRIA_MAX_CONNECTIONS,
+            max_keepalive_connections=BRIA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=BRIA_KEEPALIVE_EXPIRY,
+        )
+        if http2 and not _http2_available():
+            logger.warning("BRIA_HTTP2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.timeout = timeout
+        self._transport = transport
+        self.save_to = save_to
+        self._client: Optional[httpx.AsyncClient] = None
+        self.poller = StatusPoller(self._fetch_status)
+        self.single_flight = SingleFlight()
+        self.abandoned_requests = 0  # jobs left running on Bria after their caller was cancelled
+
+    async def open(self) -> httpx.AsyncClient:
+        """Create the shared connection pool. Safe to call more than once."""
+        if self._client is None or self._client.is_closed:
+            # Auth headers are sent per request: the pool is also used to download result images from other hosts
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=self.timeout,
+                transport=self._transport,
+            )
+            logger.info(
+                f"Opened Bria connection pool (max_connections={self.limits.max_connections}, "
+                f"keepalive={self.limits.max_keepalive_connections}, http2={self.http2})"
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Stop the status poller and close the shared connection pool."""
+        await self.poller.stop()
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Closed Bria connection pool")
+        self._client = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Lazily open the pool so scripts and tests work without the FastAPI lifespan
+        if self._client is None or self._client.is_closed:
+            return await self.open()
+        return self._client
 
     async def submit_image_gen_request(self, request_payload:Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -26,12 +133,35 @@ class ImageGenClient:
         Example: await client.submit_image_gen_request("...", model_version="FIBO", width=1024, height=1024)
         """
         logger.info(f"Submitting image generation request to {self.base_url} with payload keys: {list(request_payload.keys())}")
-        async with httpx.AsyncClient() as client:
-            image_gen_url=f"{self.base_url}/image/generate"
+        client = await self._get_client()
+        image_gen_url=f"{self.base_url}/image/generate"
+        with stage_timer("bria_submit"):
             response = await client.post(image_gen_url, json=request_payload, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
     
+    async def generate(self, request_payload: Dict[str, Any], prompt_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Submit a payload and poll until completion. Concurrent calls with an identical
+        (canonical) payload share one Bria job and all receive its result.
+        prompt_key is the structured prompt's hash, when the caller already has it.
+        """
+        return await self.single_flight.do(
+            canonical_payload_key(request_payload, prompt_key),
+            lambda: self._submit_and_poll(request_payload),
+        )
+
+    async def _submit_and_poll(self, request_payload: Dict[str, Any]) -> Dict[str, Any]:
+        request_data = await self.submit_image_gen_request(request_payload)
+        request_id = request_data["request_id"]
+        try:
+            return await self.poll_for_status(request_id)
+        except asyncio.CancelledError:
+            # Bria has no cancel endpoint; stop polling and let the job finish unobserved
+            self.abandoned_requests += 1
+            logger.warning(f"Abandoned Bria request {request_id} after cancellation")
+            raise
+
     async def create_image_from_text(self, text_prompt: str, **params) -> Dict[str, Any]:
         """
         Submit an image generation request with text prompt and poll until completion.
@@ -40,16 +170,19 @@ class ImageGenClient:
         request_payload = {"prompt": text_prompt, 
                             "visual_output_content_moderation": False}
         request_payload.update(params)
-        request_data = await self.submit_image_gen_request(request_payload)
-        request_id = request_data["request_id"]
-        return await self.poll_for_status(request_id)
+        return await self.generate(request_payload)
     
-    async def create_image_from_structured_prompt(self, structured_prompt: Union[Dict[str, Any], str], **params) -> Dict[str, Any]:
+    async def create_image_from_structured_prompt(
+        self, structured_prompt: Union[Dict[str, Any], str], prompt_key: Optional[str] = None, **params
+    ) -> Dict[str, Any]:
         """
         Submit an image generation request with a structured prompt and poll until completion.
-        Returns the final result when ready.
+        Returns the final result when ready. Pass the prompt already serialized (and its prompt_key)
+        when sending one prompt more than once.
         """
         if isinstance(structured_prompt, dict):
+            # Hash the dict directly rather than re-parsing the string it's serialized to
+            prompt_key = prompt_key or prompt_hash(structured_prompt)
             sp_string = json.dumps(structured_prompt)
         else:
             sp_string = structured_prompt
@@ -57,9 +190,7 @@ class ImageGenClient:
         request_payload = {"structured_prompt": sp_string,
                                        "visual_output_content_moderation": False}
         request_payload.update(params)
-        request_data = await self.submit_image_gen_request(request_payload)
-        request_id = request_data["request_id"]
-        return await self.poll_for_status(request_id)
+        return await self.generate(request_payload, prompt_key)
     
     async def create_image_from_image(self, image_url: str, **params) -> Dict[str, Any]:
         """
@@ -69,9 +200,7 @@ class ImageGenClient:
         image_data= await encode_image_to_base64(image_url)
         request_payload = {"images": [image_data]}
         request_payload.update(params)
-        request_data = await self.submit_image_gen_request(request_payload)
-        request_id = request_data["request_id"]
-        return await self.poll_for_status(request_id)
+        return await self.generate(request_payload)
     
     async def create_image_from_image_and_text(self, image_url: str, text_prompt: str, **params) -> Dict[str, Any]:
         """
@@ -85,89 +214,72 @@ class ImageGenClient:
             "visual_output_content_moderation": False
         }
         request_payload.update(params)
-        request_data = await self.submit_image_gen_request(request_payload)
-        request_id = request_data["request_id"]
-        return await self.poll_for_status(request_id)
+        return await self.generate(request_payload)
     
-    async def refine_prev_image(self, seed:int, structured_prompt:Dict[str, Any], new_prompt:str, **params):
-        if isinstance(structured_prompt, dict):
-            sp_string = json.dumps(structured_prompt)
-        else:
-            sp_string = structured_prompt
-        request_payload = {"structured_prompt": sp_string,
-                           "visual_output_content_moderation": False, 
-                           "seed": seed, 
-                           "prompt": new_prompt
-                           }
-        request_payload.update(params)
-        request_data = await self.submit_image_gen_request(request_payload)
-        request_id = request_data["request_id"]
-        return await self.poll_for_status(request_id)
+    async def refine_prev_image(self, seed:int, structured_prompt:Dict[str, Any], new_prompt:str, prompt_key: Optional[str] = None, **params):
+        request_payload = build_refine_payload(seed, structured_prompt, new_prompt, **params)
+        return await self.generate(request_payload, prompt_key)
+
 
 
+    async def _fetch_status(self, request_id: str) -> Dict[str, Any]:
+        client = await self._get_client()
+        status_response = await client.get(f"{self.base_url}/status/{request_id}", headers=self.headers)
+        status_response.raise_for_status()
+        return status_response.json()
 
-    async def poll_for_status(self, request_id: str, interval: int = 2, timeout: int = 300) -> Dict[str, Any]:
+    async def poll_for_status(self, request_id: str, timeout: int = 300) -> Dict[str, Any]:
         """
-        Poll for request status until completion or timeout.
-        Uses async sleep for non-blocking waits.
+        Wait for request completion via the shared StatusPoller, or time out.
         RETURNS:
           - Success dict: {"image_url", "seed", "structured_prompt", "saved_path", "request_id"}
           - Error dict: {"error": {"type": str, "message": str, "request_id": str, "status": str}}
         RATIONALE: Return error structures instead of raising so orchestrators can decide per-shot behavior.  # CHANGE: switch from raise to error dict
         """
-        status_url = f"{self.base_url}/status/{request_id}"
-        logger.info(f"Polling status URL: {status_url}")
-
-        start_time = asyncio.get_event_loop().time()
-
-        async with httpx.AsyncClient() as client:
-            while True:
-                status_response = await client.get(status_url, headers=self.headers)
-                status_response.raise_for_status()
-                status_data = status_response.json()
-                status_state = status_data.get("status")
-                result = status_data.get("result")
-                logger.info(f"Request {request_id} is {status_state}.")
-
-                if status_state == "ERROR":
-                    # Extract any error details returned by the API
-                    error_detail = status_data.get("error")
-                    logger.error(f"Request {request_id} failed with error: {error_detail}")
-                    return {  # CHANGE: return structured error instead of raising to keep batch resilient
-                        "error": {
-                            "type": "api_error",
-                            "message": str(error_detail) if error_detail else "unknown error",
-                            "request_id": request_id,
-                            "status": "ERROR",
-                        }
-                    }
-
-                if status_state == "COMPLETED":
-                    logger.info(f"Request {request_id} completed successfully")
-                    url = result.get("image_url")
-                    seed = result.get("seed")
-                    structured_prompt = result.get("structured_prompt")
-                    saved_path = download_image_from_url(url, save_to="gcs")  
-                    return {
-                        "image_url": url,
-                        "seed": seed,
-                        "structured_prompt": structured_prompt,
-                        "saved_path": saved_path,
-                        "request_id": request_id,
-                        "status": "SUCCESS"
-                    }
-
-                if asyncio.get_event_loop().time() - start_time > timeout:
-                    logger.error(f"Request {request_id} timed out after {timeout}s")
-                    return {
-                        "error": {
-                            "type": "timeout",
-                            "message": f"did not complete within {timeout} seconds",
-                            "request_id": request_id,
-                            "status": "TIMEOUT",
-                        }
-                    }
-                await asyncio.sleep(interval)
+        logger.info(f"Waiting on status for request {request_id}")
+        try:
+            with stage_timer("bria_job"):
+                status_data = await self.poller.wait_for(request_id, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Request {request_id} timed out after {timeout}s")
+            return {
+                "error": {
+                    "type": "timeout",
+                    "message": f"did not complete within {timeout} seconds",
+                    "request_id": request_id,
+                    "status": "TIMEOUT",
+                }
+            }
+
+        status_state = status_data.get("status")
+        if status_state == "ERROR":
+            # Extract any error details returned by the API
+            error_detail = status_data.get("error")
+            logger.error(f"Request {request_id} failed with error: {error_detail}")
+            return {  # CHANGE: return structured error instead of raising to keep batch resilient
+                "error": {
+                    "type": "api_error",
+                    "message": str(error_detail) if error_detail else "unknown error",
+                    "request_id": request_id,
+                    "status": "ERROR",
+                }
+            }
+
+        logger.info(f"Request {request_id} completed successfully")
+        result = status_data.get("result") or {}
+        url = result.get("image_url")
+        seed = result.get("seed")
+        structured_prompt = result.get("structured_prompt")
+        client = await self._get_client()
+        saved_path = await stream_image_from_url(url, http_client=client, save_to=self.save_to, request_id=request_id)
+        return {
+            "image_url": url,
+            "seed": seed,
+            "structured_prompt": structured_prompt,
+            "saved_path": saved_path,
+            "request_id": request_id,
+            "status": "SUCCESS"
+        }
 
 @lru_cache(maxsize=1)
 def get_image_gen_client(auth:Dict[str, str]={"api_token": BRIA_API_TOKEN}, base_url: str = DEFAULT_BASE_URL) -> ImageGenClient:
@@ -1,27 +1,54 @@
-from app.image_gen_client import ImageGenClient, get_image_gen_client
+from app.image_gen_client import ImageGenClient, get_image_gen_client, build_refine_payload, canonical_payload_key
 from app.utils.image_utils import get_image_bytes
 from app.utils.logger import logger
-from app.agent import translate_vision_to_image_prompt
-from app.db.db_collections import GeneratedImagesCollection
+from app.agent import translate_vision_to_image_prompt, translate_vision_to_image_prompt_async
+from app.db.db_collections import AsyncGeneratedImagesCollection
 from app.config.variant_registry import get_variants
+from app.services.bria_governor import BriaGovernor, get_bria_governor
+from app.services.prompt_store import prompt_hash
+from app.services.variant_writer import VariantBatchWriter, VARIANT_BATCH_MAX_SIZE
+from app.utils.cancellation import record_cancelled_generation
+from app.utils.metrics import record_error, stage_timer
 import json
 import asyncio 
-from typing import Any, Dict, List, Literal, Optional, Union, Callable, Awaitable
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union, Callable, Awaitable
 from contextlib import asynccontextmanager
+from functools import wraps
 
 # CHANGE: Centralize model version used for generation
 MODEL_VERSION = "FIBO"
 
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+
+def _count_error_results(fn):
+    """Count the {"type": ...} of every error result a per-shot/per-variant coroutine returns."""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        result = await fn(*args, **kwargs)
+        if isinstance(result, dict) and result.get("status") == "error":
+            record_error(result.get("error"))
+        return result
+    return wrapper
+
 
 class ImageGenOrchestrator:
-    def __init__(self, vision: Optional[str] = None, uploaded_image: Optional[Union[str, bytes]] = None):
+    def __init__(
+        self,
+        vision: Optional[str] = None,
+        uploaded_image: Optional[Union[str, bytes]] = None,
+        governor: Optional[BriaGovernor] = None,
+    ):
         self.uploaded_image = uploaded_image
+        # CHANGE: every Bria generation goes through the process-wide governor (global in-flight + rate limit)
+        self.governor = governor or get_bria_governor()
         self.vision = vision
         self.prompts: Dict[str, Any] = {}
         self.image_bytes: Optional[bytes] = None
         self.variants: Dict[str, Any] = {}
 
     # ========= Variants / Refinement =========
+    @_count_error_results
     async def refine_image_variant(
         self,
         seed: int,  # CHANGE: prev image seed as int for client compatibility
@@ -29,26 +56,47 @@ class ImageGenOrchestrator:
         request_id: str,
         variant_item: Dict[str, str],
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         semaphore: Optional[asyncio.Semaphore] = None,
         wait_time: int = 0,
         per_request_timeout: Optional[int] = None,
-        metadata: Optional[Dict[str, Any]]=None # so that we can save the critique n stuff too
+        metadata: Optional[Dict[str, Any]]=None, # so that we can save the critique n stuff too
+        use_result_cache: bool = False,
+        variant_writer: Optional[VariantBatchWriter] = None,
+        prompt_key: Optional[str] = None,
     ) -> Dict[str, Any]:
         new_prompt = variant_item.get("description")
         label = variant_item.get("variant_label", "unknown_variant")
         logger.info(f"Refining image for variant '{label}' with prompt: {new_prompt[:200]}")
+        # CHANGE: seeded refinements are deterministic, so identical payloads can reuse a stored result
+        payload_key = None
+        try:
+            # Bria picks the model server-side for refinements, so the version is keyed even though it isn't sent
+            payload_key = canonical_payload_key(
+                {"model_version": MODEL_VERSION, **build_refine_payload(int(seed), structured_prompt, new_prompt)},
+                prompt_key,
+            )
+            if use_result_cache:
+                cached_result = await images_collection.get_variant_result_by_payload_key(payload_key)
+                if cached_result is not None:
+                    logger.info(f"Result cache hit for variant {label} ({payload_key[:12]})")
+                    return {"label": label, "status": "ok", "data": cached_result, "metadata": metadata if metadata else None, "cached": True}
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed for variant {label}: {e}")
+        # Wait out the wait_time spacing before taking the per-request semaphore or an in-flight slot
+        await self.governor.pace(min_interval=wait_time, spacing_key=self)
         async with self._maybe_semaphore(semaphore):
             try:
                 # CHANGE: Only apply timeout if provided; coerce seed to int defensively
                 seed_int = int(seed)
-                coro = image_gen_client.refine_prev_image(
-                    seed=seed_int, structured_prompt=structured_prompt, new_prompt=new_prompt
-                )
-                if per_request_timeout is not None:
-                    refined_result = await asyncio.wait_for(coro, timeout=per_request_timeout)
-                else:
-                    refined_result = await coro
+                async with self.governor.in_flight_slot():
+                    coro = image_gen_client.refine_prev_image(
+                        seed=seed_int, structured_prompt=structured_prompt, new_prompt=new_prompt, prompt_key=prompt_key
+                    )
+                    if per_request_timeout is not None:
+                        refined_result = await asyncio.wait_for(coro, timeout=per_request_timeout)
+                    else:
+                        refined_result = await coro
 
                 if isinstance(refined_result, dict) and "error" in refined_result:
                     logger.error(f"Client returned error for {label}: {refined_result['error']}")
@@ -72,21 +120,29 @@ class ImageGenOrchestrator:
                     },
                     "result_data": refined_result,
                 }
+                if payload_key:
+                    saved_data["payload_key"] = payload_key
                 if metadata:
                     saved_data["metadata"]=metadata
 
 
                 try:
-                    images_collection.update_image_with_variant(request_id, saved_data)
+                    # CHANGE: fan-outs share a batch writer; a lone refinement still writes without fetching the document back
+                    if variant_writer is not None:
+                        await variant_writer.add(saved_data)
+                    else:
+                        await images_collection.push_variants(request_id, [saved_data])
                 except Exception as db_err:
                     logger.error(f"DB update failed for variant {label}: {db_err}")
                     return {"label": label, "status": "error", "error": {"type": "db_error", "message": str(db_err)}}
 
-                if wait_time:
-                    await asyncio.sleep(wait_time)  # optional pacing between variants
-
                 return {"label": label, "status": "ok", "data": refined_result, "metadata":metadata if metadata else None}
 
+            except asyncio.CancelledError:
+                # Client went away or the request deadline passed; release our slots and stop
+                record_cancelled_generation("variant")
+                logger.warning(f"Variant {label} cancelled")
+                raise
             except asyncio.TimeoutError:
                 timeout_msg = (
                     f"exceeded {per_request_timeout}s" if per_request_timeout is not None else "timeout"
@@ -113,9 +169,40 @@ class ImageGenOrchestrator:
         if semaphore is None:
             yield
         else:
-            async with semaphore:
+            with stage_timer("semaphore_wait"):
+                await semaphore.acquire()
+            try:
                 yield
-        
+            finally:
+                semaphore.release()
+
+    async def _gather_with_progress(
+        self, tasks: List[asyncio.Task], progress_cb: Optional[ProgressCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """gather() that reports the completed fraction of tasks to progress_cb as each one finishes."""
+        if progress_cb is None or not tasks:
+            return await asyncio.gather(*tasks)
+        completed = 0
+
+        async def _report(task: asyncio.Task) -> Dict[str, Any]:
+            nonlocal completed
+            result = await task
+            completed += 1
+            await progress_cb(completed / len(tasks))
+            return result
+
+        return await asyncio.gather(*(_report(t) for t in tasks))
+
+    async def _iter_as_completed(self, tasks: List[asyncio.Task]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield task results in completion order; cancels stragglers if the consumer stops early."""
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
 
     def _normalize_structured_prompt(self, result_data: Dict[str, Any], shot_type: str) -> None:
         # CHANGE: normalize structured_prompt returned from API if it's a JSON string
@@ -135,11 +222,13 @@ class ImageGenOrchestrator:
         wait_time: int,
         call_coro_fn: Callable[[], Awaitable[Dict[str, Any]]],
         build_saved_data: Callable[[Dict[str, Any]], Dict[str, Any]],
-        persist_fn: Callable[[Dict[str, Any]], None],
+        persist_fn: Callable[[Dict[str, Any]], Awaitable[Any]],
     ) -> Dict[str, Any]:
-        async with semaphore:
+        await self.governor.pace(min_interval=wait_time, spacing_key=self)
+        async with self._maybe_semaphore(semaphore):
             try:
-                result_data = await asyncio.wait_for(call_coro_fn(), timeout=per_request_timeout)
+                async with self.governor.in_flight_slot():
+                    result_data = await asyncio.wait_for(call_coro_fn(), timeout=per_request_timeout)
 
                 if isinstance(result_data, dict) and "error" in result_data:
                     logger.error(f"Client returned error for {shot_type}: {result_data['error']}")
@@ -149,7 +238,7 @@ class ImageGenOrchestrator:
 
                 try:
                     envelope = build_saved_data(result_data)
-                    persist_fn(envelope)
+                    await persist_fn(envelope)
                 except Exception as db_err:
                     logger.error(f"DB insert failed for {shot_type}: {db_err}")
                     return {
@@ -158,10 +247,12 @@ class ImageGenOrchestrator:
                         "error": {"type": "db_error", "message": str(db_err)},
                     }
 
-                if wait_time:
-                    await asyncio.sleep(wait_time)
                 return {"shot_type": shot_type, "status": "ok", "data": result_data}
 
+            except asyncio.CancelledError:
+                record_cancelled_generation("generation")
+                logger.warning(f"Generation for {shot_type} cancelled")
+                raise
             except asyncio.TimeoutError:
                 logger.error(f"Timeout for {shot_type}: exceeded {per_request_timeout}s")
                 return {
@@ -174,17 +265,18 @@ class ImageGenOrchestrator:
                 return {"shot_type": shot_type, "status": "error", "error": {"type": "unhandled", "message": str(e)}}
 
     # ========= Generation =========
+    @_count_error_results
     async def generate_one(
         self,
         shot_type: str,
         item: Dict[str, Any],
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         semaphore: asyncio.Semaphore,
         wait_time: int,
         per_request_timeout: int,
         generation_method: Literal["structured_prompt", "text"],
-        db_save_fn: Optional[Callable[[Dict[str, Any]], None]] = None,
+        db_save_fn: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
     ) -> Dict[str, Any]:
         """
         # CHANGE: Generate a single shot with explicit generation_method and pluggable persistence.
@@ -256,25 +348,40 @@ class ImageGenOrchestrator:
 
     def get_prompts(self):
         prompts = translate_vision_to_image_prompt(self.vision, self.image_bytes)
+        self._set_prompts(prompts)
+
+    async def get_prompts_async(self):
+        prompts = await translate_vision_to_image_prompt_async(self.vision, self.image_bytes)
+        self._set_prompts(prompts)
+
+    def _set_prompts(self, prompts):
         self.prompts = prompts.response.model_dump()
         if not isinstance(self.prompts, dict) or not self.prompts:
             logger.error("No prompts returned from translation step; skipping generation")
             self.prompts = {}
 
-    async def create_variants(
+    def _variant_tasks(
         self,
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         seed: int,
         request_id: str,
         structured_prompt: Dict[str, Any],
         selected_variant_list: List,
         wait_time: int,
-        max_concurrency: int = 4,
-        per_request_timeout: int = 120,
-    ) -> List[Dict[str, Any]]:
+        max_concurrency: int,
+        per_request_timeout: int,
+        use_result_cache: bool = False,
+    ) -> List[asyncio.Task]:
         semaphore = asyncio.Semaphore(max_concurrency)
-        tasks: List[asyncio.Task] = [
+        # CHANGE: serialize and hash the shared prompt once for the whole fan-out instead of once per Bria request
+        prompt_key = prompt_hash(structured_prompt)
+        if isinstance(structured_prompt, dict):
+            structured_prompt = json.dumps(structured_prompt)
+        variant_writer = VariantBatchWriter(
+            images_collection, request_id, max_batch=min(len(selected_variant_list), VARIANT_BATCH_MAX_SIZE)
+        )
+        return [
             asyncio.create_task(
                 self.refine_image_variant(
                     seed=seed,
@@ -286,26 +393,67 @@ class ImageGenOrchestrator:
                     semaphore=semaphore,
                     wait_time=wait_time,
                     per_request_timeout=per_request_timeout,
+                    use_result_cache=use_result_cache,
+                    variant_writer=variant_writer,
+                    prompt_key=prompt_key,
                 )
             )
             for v in selected_variant_list
         ]
-        return await asyncio.gather(*tasks)
 
-    async def generate_initial_images_from_prompts(
+    async def create_variants(
         self,
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
+        seed: int,
+        request_id: str,
+        structured_prompt: Dict[str, Any],
+        selected_variant_list: List,
         wait_time: int,
         max_concurrency: int = 4,
         per_request_timeout: int = 120,
+        progress_cb: Optional[ProgressCallback] = None,
+        use_result_cache: bool = False,
     ) -> List[Dict[str, Any]]:
-        """Generate images for all prompts with concurrency.
+        tasks = self._variant_tasks(
+            image_gen_client, images_collection, seed, request_id, structured_prompt,
+            selected_variant_list, wait_time, max_concurrency, per_request_timeout,
+            use_result_cache=use_result_cache,
+        )
+        return await self._gather_with_progress(tasks, progress_cb)
 
-        Per-shot failures return structured error dicts; tasks do not raise, so the batch completes.  # CHANGE
-        """
+    async def iter_variants(
+        self,
+        image_gen_client: ImageGenClient,
+        images_collection: AsyncGeneratedImagesCollection,
+        seed: int,
+        request_id: str,
+        structured_prompt: Dict[str, Any],
+        selected_variant_list: List,
+        wait_time: int = 0,
+        max_concurrency: int = 4,
+        per_request_timeout: int = 120,
+        use_result_cache: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming counterpart of create_variants: yields each variant result as soon as it finishes."""
+        tasks = self._variant_tasks(
+            image_gen_client, images_collection, seed, request_id, structured_prompt,
+            selected_variant_list, wait_time, max_concurrency, per_request_timeout,
+            use_result_cache=use_result_cache,
+        )
+        async for result in self._iter_as_completed(tasks):
+            yield result
+
+    def _initial_gen_tasks(
+        self,
+        image_gen_client: ImageGenClient,
+        images_collection: AsyncGeneratedImagesCollection,
+        wait_time: int,
+        max_concurrency: int,
+        per_request_timeout: int,
+    ) -> List[asyncio.Task]:
         semaphore = asyncio.Semaphore(max_concurrency)
-        tasks: List[asyncio.Task] = [
+        return [
             asyncio.create_task(
                 self.generate_one(
                     shot_type=k,
@@ -321,12 +469,39 @@ class ImageGenOrchestrator:
             for k, v in self.prompts.items()
         ]
 
-        return await asyncio.gather(*tasks)  # CHANGE: tasks return dicts; no exceptions bubble here
+    async def generate_initial_images_from_prompts(
+        self,
+        image_gen_client: ImageGenClient,
+        images_collection: AsyncGeneratedImagesCollection,
+        wait_time: int,
+        max_concurrency: int = 4,
+        per_request_timeout: int = 120,
+        progress_cb: Optional[ProgressCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """Generate images for all prompts with concurrency.
+
+        Per-shot failures return structured error dicts; tasks do not raise, so the batch completes.  # CHANGE
+        """
+        tasks = self._initial_gen_tasks(image_gen_client, images_collection, wait_time, max_concurrency, per_request_timeout)
+        return await self._gather_with_progress(tasks, progress_cb)  # CHANGE: tasks return dicts; no exceptions bubble here
+
+    async def iter_initial_images_from_prompts(
+        self,
+        image_gen_client: ImageGenClient,
+        images_collection: AsyncGeneratedImagesCollection,
+        wait_time: int = 0,
+        max_concurrency: int = 4,
+        per_request_timeout: int = 120,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming counterpart of generate_initial_images_from_prompts: yields each shot as soon as it finishes."""
+        tasks = self._initial_gen_tasks(image_gen_client, images_collection, wait_time, max_concurrency, per_request_timeout)
+        async for result in self._iter_as_completed(tasks):
+            yield result
 
     async def run_json_edit(
         self,
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         request_id: str,  # to store
         shot_type: str,
         user_structured_prompt: Dict[str, Any],
@@ -336,8 +511,8 @@ class ImageGenOrchestrator:
         semaphore = asyncio.Semaphore(1)  # just one bc we are just running once
         prompt_data = {"user_structured_prompt": user_structured_prompt}
 
-        def request_id_wrapper(saved_data: Dict[str, Any]):
-            images_collection.update_image_with_edit(request_id=request_id, edited_image_data=saved_data)
+        async def request_id_wrapper(saved_data: Dict[str, Any]):
+            await images_collection.update_image_with_edit(request_id=request_id, edited_image_data=saved_data)
 
         return await self.generate_one(
             shot_type=shot_type,  # pass from frontend in request
@@ -354,7 +529,7 @@ class ImageGenOrchestrator:
     async def run_variant_gen(
         self,
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         seed: int,
         request_id: str,
         structured_prompt: Dict[str, Any],
@@ -362,6 +537,8 @@ class ImageGenOrchestrator:
         wait_time: int,
         max_concurrency: int = 4,
         per_request_timeout: int = 120,
+        progress_cb: Optional[ProgressCallback] = None,
+        use_result_cache: bool = False,
     ) -> List[Dict[str, Any]]:
         return await self.create_variants(
             image_gen_client=image_gen_client,
@@ -373,34 +550,57 @@ class ImageGenOrchestrator:
             wait_time=wait_time,
             max_concurrency=max_concurrency,
             per_request_timeout=per_request_timeout,
+            progress_cb=progress_cb,
+            use_result_cache=use_result_cache,
         )
 
     async def run_initial_gen(
         self,
         image_gen_client: ImageGenClient,
-        images_collection: GeneratedImagesCollection,
+        images_collection: AsyncGeneratedImagesCollection,
         wait_time: int = 0,
         max_concurrency: int = 4,
         per_request_timeout: int = 120,
+        progress_cb: Optional[ProgressCallback] = None,
     ) -> List[Dict[str, Any]]:
         self.setup()
-        self.get_prompts()
+        await self.get_prompts_async()
         return await self.generate_initial_images_from_prompts(
             image_gen_client,
             images_collection,
             wait_time,
             max_concurrency=max_concurrency,
             per_request_timeout=per_request_timeout,
+            progress_cb=progress_cb,
         )
 
+    async def run_initial_gen_stream(
+        self,
+        image_gen_client: ImageGenClient,
+        images_collection: AsyncGeneratedImagesCollection,
+        wait_time: int = 0,
+        max_concurrency: int = 4,
+        per_request_timeout: int = 120,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        self.setup()
+        await self.get_prompts_async()
+        async for result in self.iter_initial_images_from_prompts(
+            image_gen_client,
+            images_collection,
+            wait_time,
+            max_concurrency=max_concurrency,
+            per_request_timeout=per_request_timeout,
+        ):
+            yield result
+
 
 # Example manual usage (kept commented for reference)
 # async def main():
 #     from app.db.db_connection import DatabaseConnection
-#     from app.db.db_collections import GeneratedImagesCollection
+#     from app.db.db_collections import AsyncGeneratedImagesCollection
 #     db = DatabaseConnection.get_instance()
 #     db.initialize_mongo_client()
-#     images_collection = GeneratedImagesCollection()
+#     images_collection = AsyncGeneratedImagesCollection()
 #     image_gen_client = get_image_gen_client()
 #     image_path = "./input_images/tech_drawing_sample.png"
 #     vision = "Oriental maximalism, vibrant, gold accents, intricate patterns"
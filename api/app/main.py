@@ -1,21 +1,55 @@
-from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Query
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
 from typing import Literal
-from app.db.db_collections import GeneratedImagesCollection
+from app.db.db_collections import AsyncGeneratedImagesCollection
 from app.models.image_data import ImageEditRequestBody
 from app.image_orchestrator import ImageGenOrchestrator
 from app.image_gen_client import get_image_gen_client
 from app.db.db_connection import DatabaseConnection
 from app.utils.logger import logger
+from app.utils.streaming import ndjson_results_response
+from app.utils.cancellation import run_until_disconnect, cancellation_stats, cancelled_requests, cancelled_generations
+from app.utils.metrics import REGISTRY, RequestLatencyMiddleware
+from app.utils.loop_watchdog import LOOP_WATCHDOG_ENABLED, get_loop_watchdog
+from app.utils.profiler import REQUEST_PROFILING_ENABLED, RequestProfilingMiddleware
 from app.routes.schema import router as schema_router
 from app.routes.shots import router as shots_router
+from app.routes.jobs import router as jobs_router, enqueue_job
+from app.routes.profiles import router as profiles_router
+from app.services.job_queue import get_job_queue
+from app.services.bria_governor import get_bria_governor
+from app.utils.utils_lib import get_prompt_registry
+from app.services.genai_client import get_google_client
+from app.services.storage_service import get_storage_client
+from app.services.llm_cache import get_gemini_cache
 
 
-def lifespan(app: FastAPI):
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_WATCHDOG_ENABLED:
+        # Started first so blocking work during startup is caught too
+        get_loop_watchdog().start()
+    get_prompt_registry().load_all()
+    # CHANGE: cloud clients are no longer built at import time; build them here so the first request doesn't pay for it
+    await asyncio.gather(asyncio.to_thread(get_google_client), asyncio.to_thread(get_storage_client))
     db_connection = DatabaseConnection.get_instance()
-    db_connection.initialize_mongo_client()
-    yield
-    db_connection.close_connection()
+    db_connection.initialize_async_mongo_client()
+    await db_connection.ensure_indexes()
+    image_gen_client = get_image_gen_client()
+    await image_gen_client.open()
+    job_queue = get_job_queue()
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await image_gen_client.aclose()
+        await db_connection.close_async_connection()
+        if LOOP_WATCHDOG_ENABLED:
+            await get_loop_watchdog().stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -34,6 +68,49 @@ app.add_middleware(
 # Routers
 app.include_router(schema_router)
 app.include_router(shots_router)
+app.include_router(jobs_router)
+
+app.add_middleware(RequestLatencyMiddleware)
+
+if REQUEST_PROFILING_ENABLED:
+    # Opt in per request with `X-Profile: 1` or `?profile=1`; when disabled nothing is installed
+    app.add_middleware(RequestProfilingMiddleware)
+    app.include_router(profiles_router)
+
+
+# Scrape-time views of state the services already keep; nothing extra on the request path
+REGISTRY.callback("refractions_bria_queue_depth", "Generations waiting for a Bria governor slot", lambda: get_bria_governor().queue_depth)
+REGISTRY.callback("refractions_bria_in_flight", "Generations holding a Bria governor slot", lambda: get_bria_governor().in_flight)
+REGISTRY.callback("refractions_bria_tracked_jobs", "Bria jobs the status poller is waiting on", lambda: get_image_gen_client().poller.in_flight)
+REGISTRY.callback(
+    "refractions_bria_status_calls_total", "Bria status requests made", lambda: get_image_gen_client().poller.status_calls, type_name="counter"
+)
+REGISTRY.callback(
+    "refractions_bria_coalesced_total", "Generations that joined an identical in-flight Bria job", lambda: get_image_gen_client().single_flight.coalesced, type_name="counter"
+)
+REGISTRY.callback(
+    "refractions_bria_abandoned_total", "Bria jobs left running after their caller was cancelled", lambda: get_image_gen_client().abandoned_requests, type_name="counter"
+)
+REGISTRY.callback("refractions_job_queue_depth", "Background jobs waiting for a worker", lambda: get_job_queue().depth)
+REGISTRY.callback(
+    "refractions_cancelled_requests_total", "Requests cancelled, by reason", lambda: dict(cancelled_requests), ("reason",), "counter"
+)
+REGISTRY.callback(
+    "refractions_cancelled_generations_total", "Generations cancelled mid-flight, by kind", lambda: dict(cancelled_generations), ("kind",), "counter"
+)
+REGISTRY.callback(
+    "refractions_gemini_cache_lookups_total",
+    "Gemini response cache lookups, by result",
+    lambda: {k: v for k, v in get_gemini_cache().stats().items() if k in ("memory_hits", "disk_hits", "misses")},
+    ("result",),
+    "counter",
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 def root():
@@ -41,7 +118,10 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    health = {"status": "ok", "bria": get_bria_governor().stats(), "cancellations": cancellation_stats()}
+    if LOOP_WATCHDOG_ENABLED:
+        health["event_loop"] = get_loop_watchdog().stats()
+    return health
 @app.post("/generate")
 async def generate_initial_image(
     method: Literal["structured_prompt_to_image", "image_to_image", "text_to_image"] = Query(
@@ -51,7 +131,10 @@ async def generate_initial_image(
     ),
     vision: str = Form(...), 
     image_file: UploadFile = File(...),
-    images_collection: GeneratedImagesCollection = Depends(GeneratedImagesCollection)
+    images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection),
+    background: bool = Query(False, description="Enqueue as a background job and return its id immediately"),
+    response: Response = None,
+    request: Request = None,
 ):
     """Generate initial campaign images from CAD design + vision."""
     # CHANGE: validate inputs early
@@ -72,25 +155,37 @@ async def generate_initial_image(
         
         if method != "text_to_image":
             raise HTTPException(status_code=400, detail=f"Unsupported generation method: {method}") # i dont have that yet :(
-        results = await orchestrator.run_initial_gen(
-            image_gen_client=image_gen_client,
-            images_collection=images_collection,
-            wait_time=0,
-            max_concurrency=4,
-            per_request_timeout=120
-        )
-        
-        successes = [r for r in results if r.get("status") == "ok"]
-        failures = [r for r in results if r.get("status") == "error"]
-        
-        return {
-            "status": "completed",
-            "total": len(results),
-            "successful": len(successes),
-            "failed": len(failures),
-            "results": results,
-            "message": f"Generated {len(successes)}/{len(results)} shots successfully"
-        }
+
+        async def run(progress_cb=None):
+            results = await orchestrator.run_initial_gen(
+                image_gen_client=image_gen_client,
+                images_collection=images_collection,
+                wait_time=0,
+                max_concurrency=4,
+                per_request_timeout=120,
+                progress_cb=progress_cb,
+            )
+
+            successes = [r for r in results if r.get("status") == "ok"]
+            failures = [r for r in results if r.get("status") == "error"]
+
+            return {
+                "status": "completed",
+                "total": len(results),
+                "successful": len(successes),
+                "failed": len(failures),
+                "results": results,
+                "message": f"Generated {len(successes)}/{len(results)} shots successfully"
+            }
+
+        if background:
+            return await enqueue_job(
+                response,
+                job_type="initial_generation",
+                input_data={"method": method, "vision": vision, "filename": image_file.filename, "image_size": len(image_bytes)},
+                job_fn=run,
+            )
+        return await run_until_disconnect(request, run())
         
     except HTTPException:
         raise  #
@@ -102,13 +197,55 @@ async def generate_initial_image(
         )
     
 
+@app.post("/generate/stream")
+async def generate_initial_image_stream(
+    vision: str = Form(...),
+    image_file: UploadFile = File(...),
+    images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection),
+):
+    """Same as /generate (text_to_image), but streams each shot as NDJSON the moment it finishes."""
+    if not vision.strip():
+        raise HTTPException(status_code=400, detail="Vision text cannot be empty")
+
+    if not image_file.content_type or not image_file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file must be an image")
+
+    image_bytes = await image_file.read()
+    if len(image_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Uploaded image is empty")
+
+    orchestrator = ImageGenOrchestrator(vision=vision, uploaded_image=image_bytes)
+    results = orchestrator.run_initial_gen_stream(
+        image_gen_client=get_image_gen_client(),
+        images_collection=images_collection,
+        wait_time=0,
+        max_concurrency=4,
+        per_request_timeout=120,
+    )
+
+    def build_summary(results):
+        successes = [r for r in results if r.get("status") == "ok"]
+        return {
+            "status": "completed",
+            "total": len(results),
+            "successful": len(successes),
+            "failed": len(results) - len(successes),
+            "message": f"Generated {len(successes)}/{len(results)} shots successfully",
+        }
+
+    return ndjson_results_response(results, build_summary)
+
+
 @app.post("/edit/{request_id}")
 async def edit_endpoint(
-    request_body: ImageEditRequestBody, request_id:str, images_collection: GeneratedImagesCollection=Depends(GeneratedImagesCollection),     method: Literal["from_structured_prompt"] = Query(
+    request_body: ImageEditRequestBody, request_id:str, images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection),     method: Literal["from_structured_prompt"] = Query(
         ..., 
         description="The image generation method to use",
         enum=["from_structured_prompt"]  # just the one for now
     ),
+    background: bool = Query(False, description="Enqueue as a background job and return its id immediately"),
+    response: Response = None,
+    request: Request = None,
 ):
     try: 
         orchestrator=ImageGenOrchestrator()
@@ -116,12 +253,21 @@ async def edit_endpoint(
         user_structured_prompt=request_body.user_structured_prompt
         if not user_structured_prompt:
             raise HTTPException(status_code=400, detail="user_structured_prompt is required for this method")
-        result=await orchestrator.run_json_edit(image_gen_client, 
-                                                images_collection,
-                                                request_id,  
-                                                shot_type=request_body.shot_type, 
-                                                user_structured_prompt=request_body.user_structured_prompt)
-        return result
+        async def run(progress_cb=None):
+            return await orchestrator.run_json_edit(image_gen_client, 
+                                                    images_collection,
+                                                    request_id,  
+                                                    shot_type=request_body.shot_type, 
+                                                    user_structured_prompt=request_body.user_structured_prompt)
+
+        if background:
+            return await enqueue_job(
+                response,
+                job_type="json_edit",
+                input_data={"request_id": request_id, **request_body.model_dump()},
+                job_fn=run,
+            )
+        return await run_until_disconnect(request, run())
     except HTTPException:
         raise
     except Exception as e:
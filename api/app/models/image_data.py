@@ -32,4 +32,5 @@ class VariantGenRequestBody(BaseModel):
     seed:int
     shot_type: str
     structured_prompt: Dict[str, Any]
-    selected_variant_list: List # idk
\ No newline at end of file
+    selected_variant_list: List # idk
+    use_cache: bool = False  # reuse stored results for byte-identical seeded refinements
\ No newline at end of file
@@ -20,6 +20,9 @@ class Job(BaseModel):
     progress: float = 0.0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = None
+    # Instance whose worker pool runs the job; it renews updated_at as a lease while the job is live
+    owner: Optional[str] = None
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
-    result_ref: Optional[str] = None
\ No newline at end of file
+    result_ref: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
\ No newline at end of file
@@ -0,0 +1,36 @@
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException, Response
+from app.services.job_queue import JobFn, JobQueueFull, get_job_queue
+from app.utils.logger import logger
+
+router = APIRouter(prefix="/jobs")
+
+
+async def enqueue_job(
+    response: Response,
+    job_type: str,
+    input_data: Dict[str, Any],
+    job_fn: JobFn,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Submit job_fn to the worker pool and return a 202 payload pointing at the status endpoint."""
+    try:
+        job = await get_job_queue().submit(job_type=job_type, input_data=input_data, job_fn=job_fn, metadata=metadata)
+    except JobQueueFull as e:
+        logger.warning(f"Rejecting {job_type} job: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    response.status_code = 202
+    return {
+        "job_id": job.request_id,
+        "status": job.status.value,
+        "status_url": f"{router.prefix}/{job.request_id}",
+    }
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """Report status, progress and (once finished) the result or error of a background job."""
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
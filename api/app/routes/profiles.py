@@ -0,0 +1,41 @@
+import json
+import os
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.utils import profiler
+
+router = APIRouter(prefix="/profiles")
+
+
+# Plain def handlers: FastAPI runs them in its threadpool, so the file reads stay off the event loop
+@router.get("")
+def list_profiles(limit: int = Query(20, ge=1, le=200)):
+    """Most recent request profiles, newest first."""
+    if not os.path.isdir(profiler.PROFILE_DIR):
+        return []
+    entries = sorted(
+        (e for e in os.scandir(profiler.PROFILE_DIR) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True,
+    )
+    profiles = []
+    for entry in entries[:limit]:
+        with open(entry.path) as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("collapsed", enum=["collapsed", "json"])):
+    """Collapsed stacks (feed to flamegraph.pl or speedscope) or the profile's metadata."""
+    try:
+        path = profiler.profile_path(profile_id, "collapsed" if format == "collapsed" else "json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    with open(path) as f:
+        content = f.read()
+    if format == "json":
+        return json.loads(content)
+    return PlainTextResponse(content)
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends
 from app.config.variant_registry import get_variants
-from app.db.db_collections import GeneratedImagesCollection
-from app.utils.image_utils import get_image_bytes
+from app.db.db_collections import AsyncGeneratedImagesCollection, IMAGE_SUMMARY_PROJECTION
+from app.utils.image_utils import get_image_bytes_async
 from app.utils.logger import logger
-from app.agent import plan_variants
+from app.agent import plan_variants_async
 router = APIRouter(prefix="/schema")
 
 
@@ -15,13 +15,13 @@ async def list_variants():
 
 
 @router.get("/variants/{request_id}")
-async def get_variants_for_image(request_id:str, generated_images_collection:GeneratedImagesCollection=Depends(GeneratedImagesCollection)):
-    requested_image=generated_images_collection.get_image_by_request_id(request_id=request_id)
+async def get_variants_for_image(request_id:str, generated_images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection)):
+    requested_image=await generated_images_collection.get_image_by_request_id(request_id=request_id, projection=IMAGE_SUMMARY_PROJECTION)
     saved_path = requested_image["result_data"]["saved_path"]
     logger.info(f"Fetching image with {saved_path} URL")
-    image_bytes=get_image_bytes(saved_path)
+    image_bytes=await get_image_bytes_async(saved_path)
     shot_type=requested_image["shot_type"]
-    variants_resp=plan_variants(image_bytes=image_bytes, shot_type=shot_type)
+    variants_resp=await plan_variants_async(image_bytes=image_bytes, shot_type=shot_type)
     variants=variants_resp.response.model_dump()
     logger.info(f"Received variants {variants}")
     formatted_variants={
@@ -1,11 +1,15 @@
-from fastapi import Body, APIRouter, Depends, HTTPException
+from fastapi import Body, APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Literal, Optional
 from app.utils.logger import logger
 from app.image_orchestrator import ImageGenOrchestrator
 from app.image_gen_client import get_image_gen_client
-from app.db.db_collections import GeneratedImagesCollection
+from app.db.db_collections import AsyncGeneratedImagesCollection, AsyncImageRevisionsCollection, IMAGE_SUMMARY_PROJECTION, REVISIONS_PAGE_MAX
 from app.models.image_data import VariantGenRequestBody
-from app.utils.image_utils import get_image_bytes
-from app.agent import improve_image
+from app.utils.image_utils import get_image_bytes_async
+from app.agent import improve_image_async
+from app.routes.jobs import enqueue_job
+from app.utils.streaming import ndjson_results_response
+from app.utils.cancellation import run_until_disconnect
 
 router=APIRouter(prefix="/shots")
 @router.post("/{request_id}/variants/{selected_variant_label}")
@@ -13,53 +17,119 @@ async def run_variant_generation(
     request_id: str,
     selected_variant_label: str,
     body: VariantGenRequestBody = Body(...),
-    images_collection: GeneratedImagesCollection = Depends(GeneratedImagesCollection),
+    images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection),
+    background: bool = Query(False, description="Enqueue as a background job and return its id immediately"),
+    response: Response = None,
+    request: Request = None,
 ):
     try:
         orchestrator = ImageGenOrchestrator()
         image_gen_client = get_image_gen_client()
 
-        results = await orchestrator.run_variant_gen(
-            image_gen_client=image_gen_client,
-            images_collection=images_collection,
-            seed=body.seed,
-            request_id=request_id,
-            structured_prompt=body.structured_prompt,
-            selected_variant_list=body.selected_variant_list,
-            wait_time=0,
-            max_concurrency=4,
-            per_request_timeout=120,
-        )
+        async def run(progress_cb=None):
+            results = await orchestrator.run_variant_gen(
+                image_gen_client=image_gen_client,
+                images_collection=images_collection,
+                seed=body.seed,
+                request_id=request_id,
+                structured_prompt=body.structured_prompt,
+                selected_variant_list=body.selected_variant_list,
+                wait_time=0,
+                max_concurrency=4,
+                per_request_timeout=120,
+                progress_cb=progress_cb,
+                use_result_cache=body.use_cache,
+            )
 
+            successes = [r for r in results if r.get("status") == "ok"]
+            failures = [r for r in results if r.get("status") == "error"]
+            return {
+                "status": "completed",
+                "total": len(results),
+                "successful": len(successes),
+                "failed": len(failures),
+                "results": results,
+                "message": f"Variants {selected_variant_label}: {len(successes)}/{len(results)} ok",
+            }
+
+        if background:
+            return await enqueue_job(
+                response,
+                job_type="variant_generation",
+                input_data={"request_id": request_id, "selected_variant_label": selected_variant_label, **body.model_dump()},
+                job_fn=run,
+            )
+        return await run_until_disconnect(request, run())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Variant gen failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Variant generation failed: {str(e)}")
+    
+@router.post("/{request_id}/variants/{selected_variant_label}/stream")
+async def stream_variant_generation(
+    request_id: str,
+    selected_variant_label: str,
+    body: VariantGenRequestBody = Body(...),
+    images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection),
+):
+    """Same as the variants endpoint, but streams each variant as NDJSON the moment it finishes."""
+    orchestrator = ImageGenOrchestrator()
+    results = orchestrator.iter_variants(
+        image_gen_client=get_image_gen_client(),
+        images_collection=images_collection,
+        seed=body.seed,
+        request_id=request_id,
+        structured_prompt=body.structured_prompt,
+        selected_variant_list=body.selected_variant_list,
+        wait_time=0,
+        max_concurrency=4,
+        per_request_timeout=120,
+        use_result_cache=body.use_cache,
+    )
+
+    def build_summary(results):
         successes = [r for r in results if r.get("status") == "ok"]
-        failures = [r for r in results if r.get("status") == "error"]
         return {
             "status": "completed",
             "total": len(results),
             "successful": len(successes),
-            "failed": len(failures),
-            "results": results,
+            "failed": len(results) - len(successes),
             "message": f"Variants {selected_variant_label}: {len(successes)}/{len(results)} ok",
         }
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Variant gen failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Variant generation failed: {str(e)}")
-    
+
+    return ndjson_results_response(results, build_summary)
+
+
+@router.get("/{request_id}/revisions")
+async def list_image_revisions(
+    request_id: str,
+    kind: Optional[Literal["variant", "edit"]] = Query(None, description="Only return variants or only edits"),
+    limit: int = Query(20, ge=1, le=REVISIONS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    revisions_collection: AsyncImageRevisionsCollection = Depends(AsyncImageRevisionsCollection),
+):
+    """Newest-first, cursor-paginated variants and edits of an image."""
+    try:
+        revisions, next_cursor = await revisions_collection.list_revisions(request_id, kind=kind, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"request_id": request_id, "revisions": revisions, "next_cursor": next_cursor}
+
+
 @router.get("/{request_id}/critique")
-async def improve_img_from_critique(request_id:str, images_collection:GeneratedImagesCollection=Depends(GeneratedImagesCollection)):
+async def improve_img_from_critique(request_id:str, images_collection: AsyncGeneratedImagesCollection = Depends(AsyncGeneratedImagesCollection)):
         orchestrator = ImageGenOrchestrator()
         image_gen_client = get_image_gen_client()
-        requested_image=images_collection.get_image_by_request_id(request_id=request_id)
+        requested_image=await images_collection.get_image_by_request_id(request_id=request_id, projection=IMAGE_SUMMARY_PROJECTION)
         saved_path=requested_image["result_data"]["saved_path"]
         logger.info(f"Fetching image with {saved_path} URL")
-        image_bytes=get_image_bytes(saved_path)
+        image_bytes=await get_image_bytes_async(saved_path)
         shot_type=requested_image["shot_type"]
         seed=requested_image["result_data"]["seed"]
         prev_structured_prompt=requested_image["result_data"]["structured_prompt"]
         generation_details=requested_image["generation_data"]
-        refinement_run_data=improve_image(shot_type=shot_type, image_bytes=image_bytes, generation_details=generation_details)
+        refinement_run_data=await improve_image_async(shot_type=shot_type, image_bytes=image_bytes, generation_details=generation_details)
         refined_prompt=refinement_run_data["refinement"]
         critique=refinement_run_data["critique"]
         refinement_data={
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional
+
+from app.utils.logger import logger
+from app.utils.metrics import STAGE_SECONDS
+
+# Process-wide limits for Bria generations (overridable via env)
+BRIA_MAX_IN_FLIGHT = int(os.getenv("BRIA_MAX_IN_FLIGHT", "8"))
+BRIA_MAX_RPS = float(os.getenv("BRIA_MAX_RPS", "2.0"))
+BRIA_BURST = int(os.getenv("BRIA_BURST", "4"))
+
+
+class BriaGovernor:
+    """
+    Shared gate every Bria generation goes through.
+
+    - min_interval adds a minimum spacing between grants sharing a spacing_key (e.g. one
+      request's shots), replacing ad-hoc sleeps inside a held slot; other callers aren't slowed.
+    - max_in_flight caps concurrent generations (submit -> poll -> download) across all requests.
+    - A token bucket (rate per second, burst capacity) paces submissions to Bria.
+    pace() (spacing) runs before an in-flight slot is taken, so no slot is held while sleeping it off.
+    The rate token is taken inside in_flight_slot(), right before the caller submits, so the bucket
+    bounds the actual submit rate even when queued callers get slots back to back.
+    Waiters are served FIFO; queue_depth reports how many are waiting for a slot.
+    """
+
+    def __init__(self, max_in_flight: int = BRIA_MAX_IN_FLIGHT, rate: float = BRIA_MAX_RPS, burst: int = BRIA_BURST):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        # spacing_key -> earliest time its next grant may happen
+        self._next_grant: Dict[Hashable, float] = {}
+        self._waiting = 0
+        self._in_flight = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._rate_lock = asyncio.Lock()
+            self._loop = loop
+            self._waiting = 0
+            self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rate_per_second": self.rate,
+        }
+
+    async def _wait_for_spacing(self, min_interval: float, spacing_key: Optional[Hashable]) -> None:
+        if min_interval <= 0 or spacing_key is None:
+            return
+        now = time.monotonic()
+        # Reserve this caller's grant time up front so concurrent callers with the same key queue behind it
+        grant_at = max(now, self._next_grant.get(spacing_key, 0.0))
+        self._next_grant = {k: t for k, t in self._next_grant.items() if t > now}
+        self._next_grant[spacing_key] = grant_at + min_interval
+        if grant_at > now:
+            await asyncio.sleep(grant_at - now)
+
+    async def _wait_for_token(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._rate_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._tokens -= 1
+
+    async def pace(self, min_interval: float = 0.0, spacing_key: Optional[Hashable] = None) -> None:
+        """Wait out this caller's min_interval spacing. Call before taking any slot."""
+        self._bind_loop()
+        with STAGE_SECONDS.time(stage="governor_pacing"):
+            await self._wait_for_spacing(min_interval, spacing_key)
+
+    @asynccontextmanager
+    async def in_flight_slot(self):
+        """Hold one in-flight Bria slot for the duration of the block; enters once a rate token is granted."""
+        self._bind_loop()
+        wait_started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            await self._wait_for_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        STAGE_SECONDS.observe(time.perf_counter() - wait_started, stage="governor_wait")
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, min_interval: float = 0.0, spacing_key: Optional[Hashable] = None):
+        """pace(), then hold one in-flight Bria slot (rate token included) for the duration of the block."""
+        await self.pace(min_interval, spacing_key)
+        async with self.in_flight_slot():
+            yield
+
+
+@lru_cache(maxsize=1)
+def get_bria_governor() -> BriaGovernor:
+    governor = BriaGovernor()
+    logger.info(
+        f"Bria governor: max_in_flight={governor.max_in_flight}, rate={governor.rate}/s, burst={governor.burst}"
+    )
+    return governor
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+
+from app.services.genai_client import get_google_client
+from app.services.single_flight import SingleFlight
+from app.services.storage_service import gcs_uri, upload_image_to_gcs
+from app.utils.logger import logger
+
+# Gemini keeps uploaded files for 48h; used when the API doesn't report an expiration_time
+GEMINI_FILE_TTL_SECONDS = float(os.getenv("GEMINI_FILE_TTL_SECONDS", str(47 * 3600)))
+# Re-upload this long before the reported expiry so a handle never lapses mid-request
+GEMINI_FILE_EXPIRY_MARGIN_SECONDS = float(os.getenv("GEMINI_FILE_EXPIRY_MARGIN_SECONDS", "600"))
+# Vertex AI has no Files API: large images are staged in GCS under this prefix and referenced as gs:// URIs
+GEMINI_GCS_PREFIX = os.getenv("GEMINI_GCS_PREFIX", "gemini-inputs")
+
+
+class FileHandle(NamedTuple):
+    uri: str
+    mime_type: str
+    expires_at: float
+
+
+def upload_to_gcs(key: str, data: bytes, mime_type: str) -> str:
+    """Stage image bytes in GCS under a content-addressed name and return their gs:// URI."""
+    blob_name = f"{GEMINI_GCS_PREFIX}/{key}{mimetypes.guess_extension(mime_type) or ''}"
+    upload_image_to_gcs(blob_name, data, content_type=mime_type)
+    return gcs_uri(blob_name)
+
+
+class GeminiFileRegistry:
+    """
+    Remembers image uploads by content hash, so the same image used for prompt translation,
+    variant planning and repeated critiques is uploaded once per expiry window.
+    Concurrent uploads of the same bytes are coalesced.
+
+    Gemini Developer clients upload through the Files API. Vertex AI clients (client.vertexai)
+    don't support it, so the bytes go to GCS instead and are referenced by gs:// URI.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        ttl_seconds: float = GEMINI_FILE_TTL_SECONDS,
+        expiry_margin: float = GEMINI_FILE_EXPIRY_MARGIN_SECONDS,
+        clock: Callable[[], float] = time.time,
+        gcs_upload: Callable[[str, bytes, str], str] = upload_to_gcs,
+    ):
+        self._client = client
+        self.uses_gcs = bool(getattr(client, "vertexai", False))
+        self._gcs_upload = gcs_upload
+        self.ttl_seconds = ttl_seconds
+        self.expiry_margin = expiry_margin
+        self._clock = clock
+        self._handles: Dict[str, FileHandle] = {}
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self.uploads = 0
+        self.reuses = 0
+
+    @staticmethod
+    def key_for(data: bytes, mime_type: str) -> str:
+        return hashlib.sha256(mime_type.encode("utf-8") + b"\x00" + data).hexdigest()
+
+    def _valid(self, key: str) -> Optional[FileHandle]:
+        handle = self._handles.get(key)
+        if handle is None:
+            return None
+        if self._clock() >= handle.expires_at - self.expiry_margin:
+            with self._lock:
+                self._handles.pop(key, None)
+            logger.info(f"Gemini file handle {key[:12]} expired; will re-upload")
+            return None
+        self.reuses += 1
+        return handle
+
+    def _remember(self, key: str, uploaded: Any, mime_type: str) -> FileHandle:
+        expiration = getattr(uploaded, "expiration_time", None)
+        expires_at = expiration.timestamp() if expiration is not None else self._clock() + self.ttl_seconds
+        handle = FileHandle(uri=uploaded.uri, mime_type=uploaded.mime_type or mime_type, expires_at=expires_at)
+        return self._store(key, handle)
+
+    def _remember_gcs(self, key: str, uri: str, mime_type: str) -> FileHandle:
+        # GCS objects don't expire on their own; the TTL just bounds how long a bucket lifecycle rule could leave a stale URI
+        return self._store(key, FileHandle(uri=uri, mime_type=mime_type, expires_at=self._clock() + self.ttl_seconds))
+
+    def _store(self, key: str, handle: FileHandle) -> FileHandle:
+        with self._lock:
+            self._handles[key] = handle
+        self.uploads += 1
+        logger.info(f"Uploaded image for Gemini as {handle.uri}")
+        return handle
+
+    def invalidate(self, data: bytes, mime_type: str) -> None:
+        with self._lock:
+            self._handles.pop(self.key_for(data, mime_type), None)
+
+    def get_or_upload(self, data: bytes, mime_type: str) -> FileHandle:
+        key = self.key_for(data, mime_type)
+        handle = self._valid(key)
+        if handle is not None:
+            return handle
+        if self.uses_gcs:
+            return self._remember_gcs(key, self._gcs_upload(key, data, mime_type), mime_type)
+        from google.genai import types
+
+        uploaded = self._client.files.upload(file=io.BytesIO(data), config=types.UploadFileConfig(mime_type=mime_type))
+        return self._remember(key, uploaded, mime_type)
+
+    async def aget_or_upload(self, data: bytes, mime_type: str) -> FileHandle:
+        key = await asyncio.to_thread(self.key_for, data, mime_type)
+        handle = self._valid(key)
+        if handle is not None:
+            return handle
+
+        from google.genai import types
+
+        async def upload() -> FileHandle:
+            if self.uses_gcs:
+                uri = await asyncio.to_thread(self._gcs_upload, key, data, mime_type)
+                return self._remember_gcs(key, uri, mime_type)
+            uploaded = await self._client.aio.files.upload(
+                file=io.BytesIO(data), config=types.UploadFileConfig(mime_type=mime_type)
+            )
+            return self._remember(key, uploaded, mime_type)
+
+        return await self._single_flight.do(key, upload)
+
+
+@lru_cache(maxsize=1)
+def get_gemini_file_registry() -> GeminiFileRegistry:
+    return GeminiFileRegistry(get_google_client())
@@ -1,10 +1,22 @@
-from google.genai import Client
-# from google.auth.credentials import Credentials
-from google.oauth2 import service_account
+from functools import lru_cache
 from app.utils.creds import get_vertexai_service_account_info
 
-service_account_info = get_vertexai_service_account_info()
-credentials=service_account.Credentials.from_service_account_info(service_account_info, scopes=["https://www.googleapis.com/auth/cloud-platform"])
-google_client = Client(
-    vertexai=True, project="social-style-scan", location="us-central1", credentials=credentials
-)
+
+@lru_cache(maxsize=1)
+def get_google_client():
+    """Vertex AI client, built on first use (or during app startup) rather than at import time."""
+    from google.genai import Client
+    from google.oauth2 import service_account
+
+    service_account_info = get_vertexai_service_account_info()
+    credentials=service_account.Credentials.from_service_account_info(service_account_info, scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    return Client(
+        vertexai=True, project="social-style-scan", location="us-central1", credentials=credentials
+    )
+
+
+def __getattr__(name):
+    # Backwards compatible `from app.services.genai_client import google_client`, resolved lazily
+    if name == "google_client":
+        return get_google_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.db.db_collections import AsyncJobsCollection
+from app.models.job import Job, JobStatus
+from app.utils.logger import logger
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+# Jobs are owned by one instance; hostname-pid stays stable across a container restart in the same pod
+JOB_INSTANCE_ID = os.getenv("JOB_INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+ProgressCallback = Callable[[float], Awaitable[None]]
+JobFn = Callable[[ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    In-process worker pool for long-running generation work.
+    submit() persists a pending Job and returns its id immediately; workers run the job
+    function, reporting progress, and record the final result or error on the Job document.
+
+    Each job is stamped with this instance's id and its updated_at is renewed as a lease while it's
+    pending or running, so with several instances only jobs whose owner died are failed as interrupted.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_size: int = JOB_QUEUE_MAX_SIZE,
+        instance_id: str = JOB_INSTANCE_ID,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.workers = workers
+        self.max_size = max_size
+        self.instance_id = instance_id
+        self.lease_seconds = lease_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._reserved = 0
+        self._tasks: List[asyncio.Task] = []
+        self._jobs_collection: Optional[AsyncJobsCollection] = None
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._jobs_collection = AsyncJobsCollection()
+        # A previous process of this same instance can't still be running its jobs
+        await self._fail_interrupted_jobs(previous_owner=self.instance_id)
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"job-worker-{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._renew_leases(), name="job-lease-renewer"))
+        logger.info(f"Started job queue with {self.workers} workers (instance {self.instance_id})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Stopped job queue")
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(
+        self,
+        job_type: str,
+        input_data: Dict[str, Any],
+        job_fn: JobFn,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        """Persist a pending job and enqueue job_fn. Raises JobQueueFull when the backlog is at capacity."""
+        if self._queue is None:
+            raise RuntimeError("JobQueue not started. Call start() during app startup.")
+        # Reserve the slot before awaiting the insert, so concurrent submits can't overfill the queue
+        if self._queue.qsize() + self._reserved >= self.max_size:
+            raise JobQueueFull(f"job queue is full ({self.max_size} pending)")
+        self._reserved += 1
+        try:
+            job = Job(
+                request_id=uuid.uuid4().hex,
+                job_type=job_type,
+                input_data=input_data,
+                metadata=metadata or {},
+                owner=self.instance_id,
+                updated_at=datetime.now(timezone.utc),
+            )
+            job_doc = job.model_dump()
+            job_doc["status"] = job.status.value
+            await self._jobs_collection.insert_data(job_doc)
+            self._queue.put_nowait((job.request_id, job_fn))
+        finally:
+            self._reserved -= 1
+        logger.info(f"Enqueued {job_type} job {job.request_id} (queue depth {self.depth})")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._jobs_collection.get_job(job_id)
+
+    async def _fail_interrupted_jobs(self, previous_owner: Optional[str] = None) -> None:
+        try:
+            await self._jobs_collection.fail_interrupted_jobs(self.lease_seconds, previous_owner)
+        except Exception as e:
+            logger.error(f"Could not clean up interrupted jobs: {e}")
+
+    async def _renew_leases(self) -> None:
+        """Keep this instance's jobs live, and reclaim jobs of instances whose leases expired."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._jobs_collection.renew_leases(self.instance_id)
+            except Exception as e:
+                logger.warning(f"Could not renew job leases: {e}")
+            await self._fail_interrupted_jobs()
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job_id, job_fn = await self._queue.get()
+            try:
+                await self._run(job_id, job_fn)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, job_fn: JobFn) -> None:
+        jobs = self._jobs_collection
+
+        async def report_progress(progress: float) -> None:
+            try:
+                await jobs.update_job(job_id, {"progress": round(min(max(progress, 0.0), 1.0), 3)})
+            except Exception as e:
+                logger.warning(f"Progress update failed for job {job_id}: {e}")
+
+        try:
+            await jobs.update_job(job_id, {"status": JobStatus.running.value})
+            result = await job_fn(report_progress)
+            await jobs.update_job(job_id, {
+                "status": JobStatus.completed.value,
+                "progress": 1.0,
+                "result": result,
+                "completed_at": datetime.now(timezone.utc),
+            })
+            logger.info(f"Job {job_id} completed")
+        except asyncio.CancelledError:
+            try:
+                await asyncio.shield(jobs.update_job(job_id, {
+                    "status": JobStatus.failed.value,
+                    "error": "cancelled",
+                    "completed_at": datetime.now(timezone.utc),
+                }))
+            except Exception as db_err:
+                logger.error(f"Could not record cancellation for job {job_id}: {db_err}")
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            try:
+                await jobs.update_job(job_id, {
+                    "status": JobStatus.failed.value,
+                    "error": str(e),
+                    "completed_at": datetime.now(timezone.utc),
+                })
+            except Exception as db_err:
+                logger.error(f"Could not record failure for job {job_id}: {db_err}")
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> JobQueue:
+    return JobQueue()
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from app.utils.cache import CACHE_ROOT, DiskCache, LRUCache
+from app.utils.logger import logger
+from app.utils.response_handlers import ResponseSuccess
+
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GEMINI_CACHE_MEMORY_ENTRIES = int(os.getenv("GEMINI_CACHE_MEMORY_ENTRIES", "256"))
+GEMINI_CACHE_DIR = os.getenv("GEMINI_CACHE_DIR", os.path.join(CACHE_ROOT, "gemini"))
+GEMINI_CACHE_MAX_BYTES = int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+GEMINI_CACHE_TTL_SECONDS = float(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+@lru_cache(maxsize=64)
+def _schema_fingerprint(response_schema: Optional[Type[BaseModel]]) -> str:
+    if response_schema is None:
+        return "text"
+    return json.dumps(response_schema.model_json_schema(), sort_keys=True)
+
+
+def make_cache_key(
+    *,
+    user_prompt: str,
+    prompt_version: str,
+    model: str,
+    response_schema: Optional[Type[BaseModel]],
+    image_bytes: Optional[bytes] = None,
+) -> str:
+    """
+    Content-addressed key: any change to image, user prompt, system prompt template
+    (prompt_version is the template's content hash), model or schema yields a new key.
+    """
+    h = hashlib.sha256()
+    for part in (
+        hashlib.sha256(image_bytes).hexdigest() if image_bytes is not None else "no-image",
+        user_prompt,
+        prompt_version,
+        model,
+        _schema_fingerprint(response_schema),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class GeminiResponseCache:
+    """
+    Two-tier cache for successful Gemini responses: an in-memory LRU in front of a
+    TTL/size-bounded disk tier that survives restarts. Structured (parsed) responses are
+    stored as JSON and re-validated against the response schema on the way out.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = GEMINI_CACHE_ENABLED,
+        memory_entries: int = GEMINI_CACHE_MEMORY_ENTRIES,
+        directory: str = GEMINI_CACHE_DIR,
+        max_bytes: int = GEMINI_CACHE_MAX_BYTES,
+        ttl_seconds: float = GEMINI_CACHE_TTL_SECONDS,
+    ):
+        self.enabled = enabled
+        self.memory = LRUCache(max_entries=memory_entries)
+        self.disk = DiskCache(directory, max_bytes=max_bytes, ttl_seconds=ttl_seconds, suffix=".json")
+
+    # ========= (de)serialization =========
+    @staticmethod
+    def _serialize(response: Any, response_schema: Optional[Type[BaseModel]]) -> bytes:
+        value = response.model_dump(mode="json") if response_schema else response
+        return json.dumps({"value": value}).encode("utf-8")
+
+    @staticmethod
+    def _deserialize(raw: bytes, response_schema: Optional[Type[BaseModel]]) -> Any:
+        value = json.loads(raw)["value"]
+        return response_schema.model_validate(value) if response_schema else value
+
+    def _wrap(self, cached: Any, response_schema: Optional[Type[BaseModel]]) -> ResponseSuccess:
+        # Hand out a copy so callers can't mutate the cached model
+        return ResponseSuccess(response=cached.model_copy(deep=True) if response_schema else cached)
+
+    def _from_memory(self, key: str, response_schema: Optional[Type[BaseModel]]) -> Optional[ResponseSuccess]:
+        cached = self.memory.get(key)
+        if cached is None:
+            return None
+        logger.info(f"Gemini cache hit (memory) {key[:12]}")
+        return self._wrap(cached, response_schema)
+
+    def _from_disk(self, key: str, response_schema: Optional[Type[BaseModel]]) -> Optional[ResponseSuccess]:
+        raw = self.disk.get(key)
+        if raw is None:
+            return None
+        try:
+            cached = self._deserialize(raw, response_schema)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable Gemini cache entry {key[:12]}: {e}")
+            return None
+        self.memory.set(key, cached)
+        logger.info(f"Gemini cache hit (disk) {key[:12]}")
+        return self._wrap(cached, response_schema)
+
+    def get(self, key: str, response_schema: Optional[Type[BaseModel]]) -> Optional[ResponseSuccess]:
+        if not self.enabled:
+            return None
+        return self._from_memory(key, response_schema) or self._from_disk(key, response_schema)
+
+    def set(self, key: str, result: ResponseSuccess, response_schema: Optional[Type[BaseModel]]) -> None:
+        if not self.enabled:
+            return
+        try:
+            raw = self._serialize(result.response, response_schema)
+        except Exception as e:
+            logger.warning(f"Not caching Gemini response {key[:12]}: {e}")
+            return
+        self.memory.set(key, result.response.model_copy(deep=True) if response_schema else result.response)
+        try:
+            self.disk.set(key, raw)
+        except OSError as e:
+            logger.warning(f"Gemini disk cache write failed: {e}")
+
+    async def aget(self, key: str, response_schema: Optional[Type[BaseModel]]) -> Optional[ResponseSuccess]:
+        """Like get(), but disk reads run in a worker thread."""
+        if not self.enabled:
+            return None
+        return self._from_memory(key, response_schema) or await asyncio.to_thread(self._from_disk, key, response_schema)
+
+    async def aset(self, key: str, result: ResponseSuccess, response_schema: Optional[Type[BaseModel]]) -> None:
+        if self.enabled:
+            await asyncio.to_thread(self.set, key, result, response_schema)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory.hits + self.memory.misses
+        hits = self.memory.hits + self.disk.hits
+        return {
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk.hits,
+            "misses": self.disk.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_gemini_cache() -> GeminiResponseCache:
+    return GeminiResponseCache()
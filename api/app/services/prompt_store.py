@@ -0,0 +1,173 @@
+import copy
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+
+from app.db.db_connection import DatabaseConnection
+from app.utils.cache import LRUCache
+from app.utils.logger import logger
+from app.utils.metrics import stage_timer
+
+STRUCTURED_PROMPTS_COLLECTION = "structured_prompts"
+PROMPT_STORE_MEMORY_ENTRIES = int(os.getenv("PROMPT_STORE_MEMORY_ENTRIES", "1024"))
+
+# Where structured prompts appear in image and revision documents
+STRUCTURED_PROMPT_PATHS = (
+    ("result_data", "structured_prompt"),
+    ("refinement_data", "previous_structured_prompt"),
+    ("generation_data", "structured_prompt"),
+)
+# Stored documents hold {"sp_ref": <hash>} in place of the prompt itself
+REF_KEY = "sp_ref"
+
+StructuredPrompt = Union[Dict[str, Any], str]
+
+
+@lru_cache(maxsize=256)
+def _canonical_from_string(structured_prompt: str) -> Optional[str]:
+    try:
+        parsed = json.loads(structured_prompt)
+    except json.JSONDecodeError:
+        return None
+    return json.dumps(parsed, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def canonical_prompt_json(structured_prompt: StructuredPrompt) -> Optional[str]:
+    """
+    Canonical JSON for a structured prompt given as a dict or JSON string; None if the string
+    isn't JSON. String inputs are memoized, so a fan-out over one prompt parses it once.
+    """
+    if isinstance(structured_prompt, str):
+        return _canonical_from_string(structured_prompt)
+    return json.dumps(structured_prompt, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+@lru_cache(maxsize=256)
+def _hash_canonical(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def prompt_hash(structured_prompt: StructuredPrompt) -> Optional[str]:
+    canonical = canonical_prompt_json(structured_prompt)
+    return _hash_canonical(canonical) if canonical is not None else None
+
+
+def _is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and REF_KEY in value
+
+
+class StructuredPromptStore:
+    """
+    Content-addressed storage for structured prompts. Documents keep {"sp_ref": hash} where the
+    prompt used to be; each distinct prompt is written once to the structured_prompts collection
+    (keyed by its canonical hash) and cached in memory for reads.
+    """
+
+    def __init__(self, memory_entries: int = PROMPT_STORE_MEMORY_ENTRIES):
+        self._memory = LRUCache(max_entries=memory_entries)
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = DatabaseConnection.get_instance().get_async_collection(STRUCTURED_PROMPTS_COLLECTION)
+        return self._collection
+
+    # ========= persistence (overridable in tests) =========
+    async def _save(self, prompts: Dict[str, Dict[str, Any]]) -> None:
+        now = datetime.now(timezone.utc)
+        durable = self.collection.with_options(write_concern=WriteConcern(w="majority"))
+        with stage_timer("mongo_prompt_store_write"):
+            await durable.bulk_write(
+                [UpdateOne({"_id": h}, {"$setOnInsert": {"prompt": p, "created_at": now}}, upsert=True) for h, p in prompts.items()],
+                ordered=False,
+            )
+
+    async def _load(self, hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        with stage_timer("mongo_prompt_store_read"):
+            documents = await self.collection.find({"_id": {"$in": hashes}}).to_list()
+        return {d["_id"]: d["prompt"] for d in documents}
+
+    # ========= public API =========
+    async def put_many(self, structured_prompts: Iterable[StructuredPrompt]) -> List[Optional[str]]:
+        """Store prompts that aren't known yet; returns each prompt's hash (None for non-JSON strings)."""
+        hashes: List[Optional[str]] = []
+        new: Dict[str, Dict[str, Any]] = {}
+        for sp in structured_prompts:
+            h = prompt_hash(sp)
+            hashes.append(h)
+            if h is None or h in new or self._memory.get(h) is not None:
+                continue
+            new[h] = json.loads(canonical_prompt_json(sp)) if isinstance(sp, str) else copy.deepcopy(sp)
+        if new:
+            await self._save(new)
+            for h, p in new.items():
+                self._memory.set(h, p)
+            logger.info(f"Stored {len(new)} new structured prompts")
+        return hashes
+
+    async def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for h in set(hashes):
+            cached = self._memory.get(h)
+            if cached is not None:
+                found[h] = cached
+            else:
+                missing.append(h)
+        if missing:
+            loaded = await self._load(missing)
+            for h, p in loaded.items():
+                self._memory.set(h, p)
+            found.update(loaded)
+            if len(loaded) < len(missing):
+                logger.error(f"Missing structured prompts for refs: {sorted(set(missing) - set(loaded))}")
+        return {h: copy.deepcopy(p) for h, p in found.items()}
+
+    async def dehydrate(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of document with structured prompts replaced by refs (the input is not modified)."""
+        return (await self.dehydrate_many([document]))[0]
+
+    async def dehydrate_many(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """dehydrate() for a batch, writing all of its new prompts in one round trip."""
+        slots = []
+        for index, document in enumerate(documents):
+            for parent_key, field in STRUCTURED_PROMPT_PATHS:
+                parent = document.get(parent_key)
+                if isinstance(parent, dict) and isinstance(parent.get(field), (dict, str)) and not _is_ref(parent[field]):
+                    slots.append((index, parent_key, field, parent[field]))
+        if not slots:
+            return documents
+        hashes = await self.put_many(sp for _, _, _, sp in slots)
+        documents = [dict(d) for d in documents]
+        for (index, parent_key, field, _), h in zip(slots, hashes):
+            if h is not None:
+                documents[index][parent_key] = {**documents[index][parent_key], field: {REF_KEY: h}}
+        return documents
+
+    async def hydrate(self, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Resolve refs in place (documents read from Mongo are ours to modify). Legacy inline prompts pass through."""
+        if not document:
+            return document
+        refs = []
+        for parent_key, field in STRUCTURED_PROMPT_PATHS:
+            parent = document.get(parent_key)
+            if isinstance(parent, dict) and _is_ref(parent.get(field)):
+                refs.append((parent, field, parent[field][REF_KEY]))
+        if refs:
+            prompts = await self.get_many(h for _, _, h in refs)
+            for parent, field, h in refs:
+                if h in prompts:
+                    parent[field] = prompts[h]
+        return document
+
+
+@lru_cache(maxsize=1)
+def get_prompt_store() -> StructuredPromptStore:
+    return StructuredPromptStore()
@@ -0,0 +1,65 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.utils.logger import logger
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the work, later
+    callers with the same key await the same task and receive (a copy of) the same result.
+    The shared task is shielded from individual callers; it is only cancelled once every
+    waiter has gone away. Keys are forgotten as soon as the work finishes, so this is
+    de-duplication of in-flight work, not a result cache.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.coalesced = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._flights.clear()
+            self._loop = loop
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._bind_loop()
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight generation {key[:12]} ({flight.waiters} waiting)")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        # Each caller gets its own copy so one caller mutating the result can't affect another
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from app.utils.logger import logger
+from app.utils.metrics import BRIA_POLLS_PER_JOB
+
+# Adaptive schedule tuning (overridable via env)
+POLL_MIN_INTERVAL = float(os.getenv("BRIA_POLL_MIN_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.getenv("BRIA_POLL_MAX_INTERVAL", "4.0"))
+POLL_BACKOFF = float(os.getenv("BRIA_POLL_BACKOFF", "1.5"))
+POLL_JITTER = float(os.getenv("BRIA_POLL_JITTER", "0.2"))
+POLL_HISTORY_SIZE = int(os.getenv("BRIA_POLL_HISTORY_SIZE", "200"))
+# Status GETs in flight at once; each runs as its own task so a hung one doesn't hold up the rest
+POLL_CONCURRENCY = int(os.getenv("BRIA_POLL_CONCURRENCY", "8"))
+
+TERMINAL_STATES = ("COMPLETED", "ERROR")
+
+
+class _TrackedJob:
+    __slots__ = ("request_id", "future", "submitted_at", "next_poll_at", "polls", "polling")
+
+    def __init__(self, request_id: str, future: asyncio.Future, submitted_at: float):
+        self.request_id = request_id
+        self.future = future
+        self.submitted_at = submitted_at
+        self.next_poll_at = submitted_at
+        self.polls = 0
+        self.polling = False  # a status GET for this job is scheduled or in flight
+
+
+class StatusPoller:
+    """
+    One background task that polls every outstanding Bria request_id.
+
+    Callers register a request_id with track() (or wait_for()) and await the returned
+    future; it resolves with the raw status payload once the job is COMPLETED or ERROR.
+    Polls start fast and back off with jitter. Once completion times have been observed,
+    the first poll is deferred to the fast tail of the distribution (p10) and the
+    backoff is capped relative to p90, so long jobs are not hammered and short jobs
+    are still picked up quickly.
+    """
+
+    def __init__(
+        self,
+        fetch_status: Callable[[str], Awaitable[Dict[str, Any]]],
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        backoff: float = POLL_BACKOFF,
+        jitter: float = POLL_JITTER,
+        history_size: int = POLL_HISTORY_SIZE,
+        concurrency: int = POLL_CONCURRENCY,
+    ):
+        self._fetch_status = fetch_status
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.concurrency = max(1, concurrency)
+        self._completion_times: Deque[float] = deque(maxlen=history_size)
+        self._jobs: Dict[str, _TrackedJob] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._poll_tasks: Set[asyncio.Task] = set()
+        self._poll_semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.status_calls = 0
+
+    # ========= Lifecycle =========
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Bound to a previous (closed) loop, e.g. between asyncio.run() calls in scripts
+            self._jobs.clear()
+            self._task = None
+            self._poll_tasks = set()
+            self._wakeup = asyncio.Event()
+            self._poll_semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(), name="bria-status-poller")
+
+    async def stop(self) -> None:
+        """Stop the background task and cancel every outstanding waiter."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        poll_tasks, self._poll_tasks = self._poll_tasks, set()
+        for poll_task in poll_tasks:
+            poll_task.cancel()
+        await asyncio.gather(*poll_tasks, return_exceptions=True)
+        for job in self._jobs.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+
+    # ========= Public API =========
+    @property
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def track(self, request_id: str) -> asyncio.Future:
+        """Register a request_id and return a future resolved with its terminal status payload."""
+        self._ensure_running()
+        job = self._jobs.get(request_id)
+        if job is None:
+            now = time.monotonic()
+            job = _TrackedJob(request_id, self._loop.create_future(), now)
+            job.next_poll_at = now + self._next_delay(job, now)
+            self._jobs[request_id] = job
+            self._wakeup.set()
+        return job.future
+
+    def untrack(self, request_id: str) -> None:
+        job = self._jobs.pop(request_id, None)
+        if job is not None and not job.future.done():
+            job.future.cancel()
+
+    async def wait_for(self, request_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Await the terminal status payload for request_id.
+        Raises asyncio.TimeoutError when timeout elapses; the job is then no longer polled.
+        """
+        future = self.track(request_id)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.untrack(request_id)
+            raise
+
+    def completion_percentile(self, pct: float) -> Optional[float]:
+        """Observed submit-to-completion time (seconds) at the given percentile, if any."""
+        if not self._completion_times:
+            return None
+        ordered = sorted(self._completion_times)
+        idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    # ========= Scheduling =========
+    def _next_delay(self, job: _TrackedJob, now: float) -> float:
+        elapsed = now - job.submitted_at
+        cap = self.max_interval
+        p10 = self.completion_percentile(10)
+        p90 = self.completion_percentile(90)
+        if p10 is not None and job.polls == 0 and elapsed < p10:
+            # Nothing has historically finished this early; first poll lands on the fast tail
+            delay = max(self.min_interval, p10 - elapsed)
+        else:
+            if p90 is not None:
+                # Keep worst-case detection lag to ~10% of a slow job
+                cap = min(self.max_interval, max(self.min_interval, p90 * 0.1))
+            delay = min(cap, self.min_interval * (self.backoff ** job.polls))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            # Jobs with a poll in flight are rescheduled when it returns
+            waiting = [job for job in self._jobs.values() if not job.polling]
+            next_due = min((job.next_poll_at for job in waiting), default=None)
+            if next_due is None or next_due > now:
+                self._wakeup.clear()
+                try:
+                    # A newly tracked job or a finished poll may make something due sooner
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=None if next_due is None else next_due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for job in waiting:
+                if job.next_poll_at <= now:
+                    job.polling = True
+                    task = asyncio.create_task(self._poll_in_background(job), name=f"bria-status-{job.request_id}")
+                    self._poll_tasks.add(task)
+                    task.add_done_callback(self._poll_tasks.discard)
+
+    async def _poll_in_background(self, job: _TrackedJob) -> None:
+        try:
+            async with self._poll_semaphore:
+                await self._poll_one(job)
+        finally:
+            job.polling = False
+            self._wakeup.set()
+
+    async def _poll_one(self, job: _TrackedJob) -> None:
+        if self._jobs.get(job.request_id) is not job:
+            return  # untracked (timed out / cancelled) after it was picked as due
+        try:
+            self.status_calls += 1
+            status_data = await self._fetch_status(job.request_id)
+        except Exception as e:
+            logger.error(f"Status poll for {job.request_id} failed: {e}")
+            self._finish(job, exc=e)
+            return
+
+        job.polls += 1
+        status_state = status_data.get("status")
+        if status_state in TERMINAL_STATES:
+            elapsed = time.monotonic() - job.submitted_at
+            if status_state == "COMPLETED":
+                self._completion_times.append(elapsed)
+            logger.info(f"Request {job.request_id} is {status_state} after {job.polls} polls ({elapsed:.1f}s)")
+            BRIA_POLLS_PER_JOB.observe(job.polls)
+            self._finish(job, result=status_data)
+            return
+
+        now = time.monotonic()
+        job.next_poll_at = now + self._next_delay(job, now)
+
+    def _finish(self, job: _TrackedJob, result: Optional[Dict[str, Any]] = None, exc: Optional[BaseException] = None) -> None:
+        if self._jobs.get(job.request_id) is job:
+            del self._jobs[job.request_id]
+        if job.future.done():
+            return
+        if exc is not None:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
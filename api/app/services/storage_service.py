@@ -1,11 +1,30 @@
+import asyncio
 from datetime import timedelta
-
-from google.cloud import storage
+from functools import lru_cache
+from typing import AsyncIterator
 
 from app.utils.creds import get_gcs_service_account_info
 
-service_account_info = get_gcs_service_account_info()
-storage_client = storage.Client.from_service_account_info(service_account_info)
+BUCKET_NAME = "refractions"
+# GCS resumable uploads require chunk sizes in multiples of 256 KiB
+GCS_CHUNK_ALIGNMENT = 256 * 1024
+
+
+@lru_cache(maxsize=1)
+def get_storage_client():
+    """GCS client, built on first use (or during app startup) rather than at import time."""
+    from google.cloud import storage
+
+    service_account_info = get_gcs_service_account_info()
+    return storage.Client.from_service_account_info(service_account_info)
+
+
+def gcs_public_url(destination_blob_name: str) -> str:
+    return f"https://storage.googleapis.com/{BUCKET_NAME}/{destination_blob_name}"
+
+
+def gcs_uri(destination_blob_name: str) -> str:
+    return f"gs://{BUCKET_NAME}/{destination_blob_name}"
 
 
 def upload_image_to_gcs(
@@ -14,9 +33,30 @@ def upload_image_to_gcs(
     """
     Uploads image bytes to GCS and returns a dict with bucket and blob info for MongoDB.
     """
-    bucket_name = "refractions"
-    bucket = storage_client.bucket(bucket_name)
+    bucket_name = BUCKET_NAME
+    bucket = get_storage_client().bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
     blob.upload_from_string(image_bytes, content_type=content_type)
-    url = f"https://storage.googleapis.com/{bucket_name}/{destination_blob_name}"
-    return url
+    return gcs_public_url(destination_blob_name)
+
+
+async def stream_image_to_gcs(
+    destination_blob_name: str,
+    chunks: AsyncIterator[bytes],
+    chunk_size: int,
+    content_type: str = "image/png",
+) -> str:
+    """
+    Upload an async stream of bytes to GCS via a resumable upload.
+    The blocking GCS writes run in a worker thread; at most ~one upload chunk is held in memory.
+    """
+    chunk_size = max(GCS_CHUNK_ALIGNMENT, -(-chunk_size // GCS_CHUNK_ALIGNMENT) * GCS_CHUNK_ALIGNMENT)
+    bucket = get_storage_client().bucket(BUCKET_NAME)
+    blob = bucket.blob(destination_blob_name)
+    writer = await asyncio.to_thread(blob.open, "wb", chunk_size=chunk_size, content_type=content_type)
+    # If the source stream fails we deliberately never close() the writer: closing would
+    # finalize a truncated object, while an unfinished resumable session simply expires.
+    async for chunk in chunks:
+        await asyncio.to_thread(writer.write, chunk)
+    await asyncio.to_thread(writer.close)
+    return gcs_public_url(destination_blob_name)
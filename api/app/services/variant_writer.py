@@ -0,0 +1,82 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.db.db_collections import AsyncGeneratedImagesCollection
+from app.utils.logger import logger
+
+# Longest a finished variant waits for siblings before its batch is written (seconds)
+VARIANT_BATCH_MAX_DELAY = float(os.getenv("VARIANT_BATCH_MAX_DELAY", "0.25"))
+VARIANT_BATCH_MAX_SIZE = int(os.getenv("VARIANT_BATCH_MAX_SIZE", "16"))
+
+
+class VariantBatchWriter:
+    """
+    Write-behind persistence for one variant fan-out.
+
+    add() queues a variant and returns once the batch containing it is durably written
+    (majority write concern), so callers still only report success for persisted work.
+    A batch is flushed as a single bulk write when it reaches max_batch entries or
+    max_delay seconds after its first entry, whichever comes first. Flushes are not tied to
+    any one caller, so a cancelled caller can't drop its siblings' writes.
+    """
+
+    def __init__(
+        self,
+        images_collection: AsyncGeneratedImagesCollection,
+        request_id: str,
+        max_batch: int = VARIANT_BATCH_MAX_SIZE,
+        max_delay: float = VARIANT_BATCH_MAX_DELAY,
+    ):
+        self.images_collection = images_collection
+        self.request_id = request_id
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+        self.batches_written = 0
+
+    async def add(self, variant_data: Dict[str, Any]) -> None:
+        """Queue variant_data and wait until it has been persisted. Raises if the batch write fails."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Mark a failure as retrieved even if this caller was cancelled before the write finished
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((variant_data, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        await asyncio.shield(future)
+
+    async def flush(self) -> None:
+        """Write anything still pending and wait for all in-progress batches."""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            await self.images_collection.push_variants(self.request_id, [data for data, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched write of {len(batch)} variants for {self.request_id} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches_written += 1
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.utils.logger import logger
+
+# Root of the on-disk caches, anchored to the api package rather than the process CWD
+CACHE_ROOT = os.getenv(
+    "CACHE_ROOT", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache")
+)
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU bounded by entry count and (optionally) total size.
+    size_fn measures a value's size in the same unit as max_size (e.g. len for bytes).
+    """
+
+    def __init__(self, max_entries: int = 256, max_size: Optional[int] = None, size_fn: Callable[[Any], int] = lambda v: 1):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._size_fn = size_fn
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._total_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._size_fn(value)
+        if self.max_size is not None and size > self.max_size:
+            return  # never worth evicting everything for one oversized value
+        with self._lock:
+            if key in self._data:
+                self._total_size -= self._sizes.pop(key)
+                del self._data[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self._total_size += size
+            while len(self._data) > self.max_entries or (
+                self.max_size is not None and self._total_size > self.max_size
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self._total_size -= self._sizes.pop(old_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._total_size = 0
+
+
+class DiskCache:
+    """
+    Size-capped, TTL-bounded byte cache in a local directory (one file per key).
+    Entries expire ttl_seconds after they were written (mtime); once the directory exceeds max_bytes
+    the least recently used entries (atime, set explicitly on every hit) are evicted down to ~90% of
+    the cap. Writes are atomic (temp file + rename).
+    Keys must be filesystem-safe (e.g. hex digests).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: Optional[float] = None, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+            if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                self._remove(path, stat.st_size)
+                self.misses += 1
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            # Record the access explicitly (noatime/relatime mounts won't); mtime keeps the write time for the TTL
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self.open_writer(key) as f:
+            f.write(data)
+
+    def open_writer(self, key: str) -> "_DiskCacheWriter":
+        """File-like writer for streaming a value in; it only becomes visible on a clean close."""
+        return _DiskCacheWriter(self, key)
+
+    def _commit(self, tmp_path: str, key: str) -> None:
+        path = self.path_for(key)
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        with self._lock:
+            self._ensure_total()
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += size - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _remove(self, path: str, size: int) -> None:
+        with self._lock:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def _ensure_total(self) -> None:
+        if self._total_bytes is None:
+            self._total_bytes = sum(st.st_size for _, st in self._entries())
+
+    def _evict_locked(self) -> None:
+        target = int(self.max_bytes * 0.9)
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda e: max(e[1].st_atime, e[1].st_mtime))
+        evicted = 0
+        for path, st in entries:
+            expired = self.ttl_seconds is not None and now - st.st_mtime > self.ttl_seconds
+            if not expired and self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= st.st_size
+            evicted += 1
+        logger.info(f"Evicted {evicted} entries from disk cache {self.directory} ({self._total_bytes} bytes remain)")
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self.set, key, data)
+
+
+class _DiskCacheWriter:
+    def __init__(self, cache: DiskCache, key: str):
+        self._cache = cache
+        self._key = key
+        directory = os.path.dirname(cache.path_for(key))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(prefix=".tmp", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def close(self, commit: bool = True) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        if commit:
+            self._cache._commit(self._tmp_path, self._key)
+        else:
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,68 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Any, Awaitable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from app.utils.logger import logger
+
+# Hard ceiling on synchronous generation requests (seconds); background jobs are not affected
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "600"))
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# nginx's "client closed request"; nobody will read it, but it keeps access logs honest
+CLIENT_CLOSED_REQUEST = 499
+
+# Process-wide counts of cancelled work
+cancelled_requests: Counter = Counter()  # by reason: disconnect / deadline
+cancelled_generations: Counter = Counter()  # by kind: initial / variant / edit
+
+
+def record_cancelled_request(reason: str) -> None:
+    cancelled_requests[reason] += 1
+
+
+def record_cancelled_generation(kind: str) -> None:
+    cancelled_generations[kind] += 1
+
+
+def cancellation_stats() -> Dict[str, Any]:
+    return {"requests": dict(cancelled_requests), "generations": dict(cancelled_generations)}
+
+
+async def _wait_for_disconnect(request: Request, interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def run_until_disconnect(
+    request: Request,
+    work: Awaitable[Any],
+    deadline: Optional[float] = REQUEST_DEADLINE_SECONDS,
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+) -> Any:
+    """
+    Await work, cancelling it as soon as the client disconnects or deadline seconds pass.
+    Cancellation propagates through the orchestrator tasks, governor/semaphore slots and the
+    Bria status poller, so abandoned requests stop holding capacity immediately.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request, poll_interval))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        reason = "disconnect" if watcher in done else "deadline"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        record_cancelled_request(reason)
+        logger.warning(f"Cancelled {request.method} {request.url.path}: {reason}")
+        if reason == "disconnect":
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="client disconnected")
+        raise HTTPException(status_code=504, detail=f"request exceeded {deadline}s deadline")
+    finally:
+        watcher.cancel()
+        if not task.done():
+            # We were cancelled ourselves (e.g. server shutdown)
+            task.cancel()
@@ -1,3 +1,5 @@
+import asyncio
+import random
 import time
 from functools import wraps
 from typing import Literal, ParamSpec, TypeVar
@@ -48,4 +50,51 @@ def retry_on_failure(
 
         return retry_wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def async_retry_on_failure(
+    max_retries: int = 3, delay: float = 1.0, backoff_exp: float = 2.0, jitter: float = 0.5
+):
+    """
+    Async counterpart of retry_on_failure for coroutine functions.
+    Backoff sleeps with asyncio.sleep (never blocking the loop) and is jittered by +/- jitter
+    so concurrent retries don't hit the API in lockstep.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def retry_wrapper(*args, **kwargs):
+            last_exception = None
+            for attempt in range(max_retries + 1):
+                try:
+                    logger.info(
+                        f"{func.__name__} attempt {attempt + 1}/{max_retries + 1}"
+                    )
+                    return await func(*args, **kwargs)
+
+                except Exception as e:
+                    last_exception = e
+                    logger.warning(
+                        f"{func.__name__} attempt {attempt + 1} failed: {str(e)}"
+                    )
+
+                    if attempt < max_retries:
+                        wait_time = delay * (backoff_exp**attempt) * random.uniform(1 - jitter, 1 + jitter)
+                        logger.info(
+                            f"Retrying {func.__name__} in {wait_time:.2f} seconds..."
+                        )
+                        await asyncio.sleep(wait_time)
+                    else:
+                        logger.error(
+                            f"All {func.__name__} attempts failed after {max_retries + 1} tries"
+                        )
+                        error_message = (
+                            f"Function {func.__name__} failed: {str(last_exception)}"
+                        )
+                        return ResponseFailure(
+                            error=error_message, details=str(last_exception)
+                        )
+
+        return retry_wrapper
+
+    return decorator
@@ -1,25 +1,111 @@
-from typing import Optional, Literal, Union
+from typing import AsyncIterator, Optional, Literal, Union
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 import httpx
 from datetime import datetime, timezone
 import os
 import base64
 from app.utils.logger import logger
-from app.services.storage_service import upload_image_to_gcs
-from app.services.genai_client import google_client
-from google.genai import types
+from app.utils.metrics import BYTES_TRANSFERRED, stage_timer
+from app.services.storage_service import upload_image_to_gcs, stream_image_to_gcs, gcs_public_url
+from app.utils.cache import CACHE_ROOT, DiskCache, LRUCache
+from app.services.gemini_files import get_gemini_file_registry
 import io
-import trimesh
-import numpy as np
-from PIL import Image
-from pygltflib import GLTF2
+import asyncio
+# trimesh, numpy, PIL and pygltflib are imported inside the functions that need them to keep startup fast
+
+# Bytes read from the network per chunk when streaming generated images (bounds peak memory per transfer)
+TRANSFER_CHUNK_SIZE = int(os.getenv("IMAGE_TRANSFER_CHUNK_SIZE", str(1024 * 1024)))
+
+# Local cache of images we generated/uploaded, so critique and variant planning don't re-download them
+IMAGE_CACHE_MEMORY_BYTES = int(os.getenv("IMAGE_CACHE_MEMORY_BYTES", str(128 * 1024 * 1024)))
+IMAGE_CACHE_MEMORY_ENTRIES = int(os.getenv("IMAGE_CACHE_MEMORY_ENTRIES", "64"))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(CACHE_ROOT, "images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+class ImageByteCache:
+    """
+    Image bytes keyed by where they live (GCS URL or local path): a byte-bounded in-memory
+    LRU in front of a size-capped disk tier. Disk reads promote entries into memory.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = IMAGE_CACHE_MEMORY_BYTES,
+        memory_entries: int = IMAGE_CACHE_MEMORY_ENTRIES,
+        directory: str = IMAGE_CACHE_DIR,
+        max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+    ):
+        self.memory = LRUCache(max_entries=memory_entries, max_size=memory_bytes, size_fn=len)
+        self.disk = DiskCache(directory, max_bytes=max_bytes)
+
+    @staticmethod
+    def key_for(location: str) -> str:
+        return hashlib.sha256(location.encode("utf-8")).hexdigest()
+
+    def get(self, location: str) -> Optional[bytes]:
+        key = self.key_for(location)
+        data = self.memory.get(key)
+        if data is None:
+            data = self.disk.get(key)
+            if data is not None:
+                self.memory.set(key, data)
+        return data
+
+    async def aget(self, location: str) -> Optional[bytes]:
+        key = self.key_for(location)
+        data = self.memory.get(key)
+        if data is None:
+            data = await self.disk.aget(key)
+            if data is not None:
+                self.memory.set(key, data)
+        return data
+
+    def set(self, location: str, data: bytes) -> None:
+        key = self.key_for(location)
+        self.memory.set(key, data)
+        try:
+            self.disk.set(key, data)
+        except OSError as e:
+            logger.warning(f"Image cache write failed for {location}: {e}")
+
+    async def aset(self, location: str, data: bytes) -> None:
+        await asyncio.to_thread(self.set, location, data)
+
+    def open_writer(self, location: str):
+        """Disk-tier writer for streaming an image in; committed on clean close."""
+        return self.disk.open_writer(self.key_for(location))
+
+
+@lru_cache(maxsize=1)
+def get_image_cache() -> ImageByteCache:
+    return ImageByteCache()
+
+
+async def _tee_to_cache(chunks: AsyncIterator[bytes], writer) -> AsyncIterator[bytes]:
+    """Pass chunks through unchanged while copying them into a cache writer (best effort)."""
+    async for chunk in chunks:
+        BYTES_TRANSFERRED.inc(len(chunk), direction="download")
+        if writer is not None:
+            try:
+                await asyncio.to_thread(writer.write, chunk)
+            except OSError as e:
+                logger.warning(f"Image cache tee failed, continuing without caching: {e}")
+                writer.close(commit=False)
+                writer = None
+        yield chunk
+
 def patch_glb_transparency(glb_path: str, alpha_mode: str = "BLEND", double_sided: bool = True, alpha_cutoff: float = 0.5) -> None:
     """
     # CHANGE: Ensure PNG transparency works in viewers (e.g., MS 3D Viewer)
     Sets material alphaMode and doubleSided on the exported GLB.
     Safe no-op if pygltflib is not available or file cannot be patched.
     """
-    if GLTF2 is None:
+    try:
+        from pygltflib import GLTF2
+    except ImportError:
         logger.warn("pygltflib not installed; skipping GLB transparency patch")
         return
     try:
@@ -46,6 +132,10 @@ def image_to_glb_plane(image_path: str, glb_out: str = "image_plane.glb", height
         height: Desired plane height in world units.
         flip_v: Flip the V (vertical) UV coordinate to correct upside-down textures in viewers.  # CHANGE
     """
+    import numpy as np
+    import trimesh
+    from PIL import Image
+
     img = Image.open(image_path).convert("RGBA")  # CHANGE: ensure RGBA for transparency
     w, h = img.size
     aspect = w / h
@@ -98,17 +188,82 @@ def download_image_from_url(url: str, save_to: Optional[Literal["file", "gcs"]]=
         with open(file_path, "wb") as f:
             f.write(response.content)
             logger.info(f"Image saved to {os.path.join(dir_name, file_name)}")
-            return file_path
+        get_image_cache().set(file_path, response.content)
+        return file_path
     elif save_to=="gcs":
         gcs_path= f"generated_images/{file_name}"
         gcs_url= upload_image_to_gcs(gcs_path, response.content, content_type="image/png")
         logger.info(f"Image uploaded to GCS at {gcs_url}")
+        get_image_cache().set(gcs_url, response.content)
         return gcs_url
     else: 
         raise ValueError("save_to must be either 'file' or 'gcs'")
     
 
 
+async def stream_image_from_url(
+    url: str,
+    http_client: httpx.AsyncClient,
+    save_to: Literal["file", "gcs"] = "gcs",
+    dir_name: str = "generated_images",
+    request_id: Optional[str] = None,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+) -> str:
+    """
+    Async counterpart of download_image_from_url that never buffers the whole image.
+    The response body is streamed in chunk_size pieces straight into a local file or a GCS resumable upload.
+    Returns the saved file path or GCS URL.
+    """
+    ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    # CHANGE: include request_id so concurrent completions in the same second don't overwrite each other
+    file_name = f"generated_image_{ts}_{request_id}.png" if request_id else f"generated_image_{ts}.png"
+    if save_to == "file":
+        location = os.path.join(dir_name, file_name)
+    elif save_to == "gcs":
+        gcs_path = f"generated_images/{file_name}"
+        location = gcs_public_url(gcs_path)
+    else:
+        raise ValueError("save_to must be either 'file' or 'gcs'")
+
+    # CHANGE: tee the bytes into the local image cache so later critique/variant calls skip the download
+    try:
+        cache_writer = await asyncio.to_thread(get_image_cache().open_writer, location)
+    except OSError as e:
+        logger.warning(f"Image cache unavailable: {e}")
+        cache_writer = None
+    try:
+        with stage_timer(f"image_transfer_{save_to}"):
+            async with http_client.stream("GET", url) as response:
+                response.raise_for_status()
+                chunks = _tee_to_cache(response.aiter_bytes(chunk_size), cache_writer)
+                if save_to == "file":
+                    # Every filesystem call runs in a worker thread, like the GCS branch's writes
+                    await asyncio.to_thread(os.makedirs, dir_name, exist_ok=True)
+                    f = await asyncio.to_thread(open, location, "wb")
+                    try:
+                        async for chunk in chunks:
+                            await asyncio.to_thread(f.write, chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+                    logger.info(f"Image streamed to {location}")
+                else:
+                    content_type = response.headers.get("content-type", "image/png")
+                    if not content_type.startswith("image/"):
+                        content_type = "image/png"
+                    location = await stream_image_to_gcs(gcs_path, chunks, chunk_size=chunk_size, content_type=content_type)
+                    logger.info(f"Image streamed to GCS at {location}")
+    except BaseException:
+        if cache_writer is not None:
+            await asyncio.to_thread(cache_writer.close, False)
+        raise
+    if cache_writer is not None:
+        try:
+            await asyncio.to_thread(cache_writer.close)
+        except OSError as e:
+            logger.warning(f"Image cache commit failed for {location}: {e}")
+    return location
+
+
 async def encode_image_to_base64(source: Union[str, Path]) -> str:
     """
     Convert image from file path or URL to Base64-encoded string.
@@ -159,30 +314,140 @@ async def encode_image_to_base64(source: Union[str, Path]) -> str:
         raise
 
 # TO-DO: refactor to class wheni get bored
-def get_image_bytes(image_data: Union[str, bytes]) -> str:
+def get_image_bytes(image_data: Union[str, bytes]) -> bytes:
     """
-    Load image bytes from a local file path or URL.
+    Load image bytes from a local file path or URL, via the local image cache.
     """
     if isinstance(image_data, bytes):
         return image_data
+    cache = get_image_cache()
+    cached = cache.get(image_data)
+    if cached is not None:
+        return cached
     if image_data.startswith("http://") or image_data.startswith("https://"):
-        img_bytes = httpx.get(image_data).content
-        return img_bytes
+        response = httpx.get(image_data)
+        response.raise_for_status()
+        img_bytes = response.content
     else:
         with open(image_data, "rb") as img_file:
             img_bytes = img_file.read()
-        return img_bytes
+    cache.set(image_data, img_bytes)
+    return img_bytes
 
 
-def create_image_input(image_bytes: bytes):
-    max_bytes = 15 * 1024 * 1024  # 15 MB
-    size = len(image_bytes or b"")
-    if size > max_bytes:
-        image_file = google_client.files.upload(io.BytesIO(image_bytes))
-        return image_file
+async def get_image_bytes_async(image_data: Union[str, bytes], http_client: Optional[httpx.AsyncClient] = None) -> bytes:
+    """
+    Async get_image_bytes: cache hits never leave the process, misses are fetched without blocking the loop
+    (over the shared ImageGenClient pool unless http_client is given).
+    """
+    if isinstance(image_data, bytes):
+        return image_data
+    cache = get_image_cache()
+    cached = await cache.aget(image_data)
+    if cached is not None:
+        return cached
+    logger.info(f"Image cache miss for {image_data}")
+    if image_data.startswith("http://") or image_data.startswith("https://"):
+        if http_client is None:
+            # Reuse the process-wide pooled client rather than a new connection per miss
+            from app.image_gen_client import get_image_gen_client
+
+            http_client = await get_image_gen_client().open()
+        response = await http_client.get(image_data)
+        response.raise_for_status()
+        img_bytes = response.content
+        BYTES_TRANSFERRED.inc(len(img_bytes), direction="download")
     else:
-        image_file = types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-    return image_file
+        img_bytes = await asyncio.to_thread(Path(image_data).read_bytes)
+    await cache.aset(image_data, img_bytes)
+    return img_bytes
+
+
+GEMINI_INLINE_MAX_BYTES = 15 * 1024 * 1024  # 15 MB
+
+# Gemini doesn't need full-resolution renders to write prompts or critiques
+GEMINI_IMAGE_MAX_EDGE = int(os.getenv("GEMINI_IMAGE_MAX_EDGE", "1536"))
+GEMINI_IMAGE_QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "85"))
+
+_GEMINI_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def _gemini_image_format(value: str) -> str:
+    """Normalize a GEMINI_IMAGE_FORMAT value to one Gemini accepts, falling back to WEBP."""
+    image_format = value.strip().upper()
+    if image_format == "JPG":
+        return "JPEG"
+    if image_format not in _GEMINI_MIME_TYPES:
+        logger.warning(f"Unsupported GEMINI_IMAGE_FORMAT {value!r}; using WEBP")
+        return "WEBP"
+    return image_format
+
+
+GEMINI_IMAGE_FORMAT = _gemini_image_format(os.getenv("GEMINI_IMAGE_FORMAT", "WEBP"))
+
+
+def preprocess_image_for_gemini(
+    image_bytes: bytes,
+    max_edge: int = GEMINI_IMAGE_MAX_EDGE,
+    target_format: str = GEMINI_IMAGE_FORMAT,
+    quality: int = GEMINI_IMAGE_QUALITY,
+) -> tuple[bytes, str]:
+    """
+    Detect the real image format and downscale to max_edge, re-encoding as target_format.
+    Images that are already small and in a format Gemini accepts are passed through untouched.
+    Returns (bytes, mime_type). CPU-bound: call via preprocess_image_for_gemini_async from async code.
+    """
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except OSError as e:
+        logger.warning(f"Could not decode image for preprocessing, sending as-is: {e}")
+        return image_bytes, "image/jpeg"
+    with img:
+        source_format = (img.format or "").upper()
+        if max(img.size) <= max_edge and source_format in _GEMINI_MIME_TYPES:
+            return image_bytes, _GEMINI_MIME_TYPES[source_format]
+        original_size = img.size
+        img.draft("RGB", (max_edge, max_edge))  # lets JPEG decode at reduced scale
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha and target_format != "JPEG" else "RGB")
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format=target_format, quality=quality)
+    processed = out.getvalue()
+    logger.info(
+        f"Preprocessed {source_format or 'unknown'} {original_size[0]}x{original_size[1]} ({len(image_bytes)} bytes) "
+        f"-> {target_format} {img.size[0]}x{img.size[1]} ({len(processed)} bytes)"
+    )
+    return processed, _GEMINI_MIME_TYPES[target_format]
+
+
+async def preprocess_image_for_gemini_async(image_bytes: bytes) -> tuple[bytes, str]:
+    return await asyncio.to_thread(preprocess_image_for_gemini, image_bytes)
+
+
+def create_image_input(image_bytes: bytes):
+    from google.genai import types
+
+    image_bytes, mime_type = preprocess_image_for_gemini(image_bytes)
+    if len(image_bytes) > GEMINI_INLINE_MAX_BYTES:
+        # CHANGE: reuse an earlier upload of the same bytes until it expires
+        handle = get_gemini_file_registry().get_or_upload(image_bytes, mime_type)
+        # CHANGE: uploaded files must be referenced by URI to fit in a Content's parts
+        return types.Part.from_uri(file_uri=handle.uri, mime_type=handle.mime_type)
+    return types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+
+
+async def create_image_input_async(image_bytes: bytes):
+    """Async counterpart of create_image_input; preprocessing and large-image uploads stay off the event loop."""
+    from google.genai import types
+
+    image_bytes, mime_type = await preprocess_image_for_gemini_async(image_bytes)
+    if len(image_bytes) > GEMINI_INLINE_MAX_BYTES:
+        handle = await get_gemini_file_registry().aget_or_upload(image_bytes, mime_type)
+        return types.Part.from_uri(file_uri=handle.uri, mime_type=handle.mime_type)
+    return types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
 
 if __name__ == "__main__":
     image_path="./input_images/dress.png"
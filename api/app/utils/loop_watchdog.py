@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional
+
+from app.utils.logger import logger
+from app.utils.metrics import REGISTRY
+
+# Opt-in: sampling the loop is cheap, but stack capture is only useful while hunting blockers
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() in ("1", "true", "yes")
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.05"))
+LOOP_WATCHDOG_THRESHOLD = float(os.getenv("LOOP_WATCHDOG_THRESHOLD", "0.25"))
+LOOP_WATCHDOG_HISTORY_SIZE = int(os.getenv("LOOP_WATCHDOG_HISTORY_SIZE", "2000"))
+
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "refractions_event_loop_lag_seconds",
+    "How late the event loop woke a sleeping probe task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_STALLS = REGISTRY.counter(
+    "refractions_event_loop_stalls_total", "Times a single callback blocked the event loop past the watchdog threshold"
+)
+
+
+class LoopWatchdog:
+    """
+    Measures event-loop lag and catches blocking callbacks in the act.
+
+    A probe task sleeps `interval` seconds in a loop; how late it wakes up is the loop lag, recorded
+    into a histogram and a rolling window for percentiles. A daemon thread watches the probe's
+    heartbeat: if the loop hasn't run it for longer than interval + threshold, some callback is
+    blocking, and the thread logs the loop thread's current stack (once per stall) while it's
+    still stuck there.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_WATCHDOG_INTERVAL,
+        threshold: float = LOOP_WATCHDOG_THRESHOLD,
+        history_size: int = LOOP_WATCHDOG_HISTORY_SIZE,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: Deque[float] = deque(maxlen=history_size)
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stalls = 0
+        self.last_stall_stack: Optional[str] = None
+
+    # ========= Lifecycle =========
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe(), name="loop-watchdog-probe")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event-loop watchdog started (interval={self.interval}s, threshold={self.threshold}s)")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, self.interval + self.threshold)
+            self._thread = None
+
+    # ========= Probe (event loop) =========
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._heartbeat = time.monotonic()
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            self._lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    # ========= Watcher (thread) =========
+    def _watch(self) -> None:
+        check_every = max(0.005, min(self.interval, self.threshold) / 2)
+        while not self._stop.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for > self.threshold and heartbeat != self._reported_heartbeat:
+                self._reported_heartbeat = heartbeat
+                self._report_stall(blocked_for)
+
+    def _report_stall(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<loop thread stack unavailable>"
+        self.stalls += 1
+        self.last_stall_stack = stack
+        LOOP_STALLS.inc()
+        logger.warning(f"Event loop blocked for >{blocked_for:.3f}s; loop thread is at:\n{stack}")
+
+    # ========= Stats =========
+    def lag_percentile(self, pct: float) -> Optional[float]:
+        """Loop lag (seconds) at the given percentile over the recent window, if any samples."""
+        if not self._lags:
+            return None
+        ordered = sorted(self._lags)
+        idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "samples": len(self._lags),
+            "lag_p50": self.lag_percentile(50),
+            "lag_p95": self.lag_percentile(95),
+            "lag_p99": self.lag_percentile(99),
+            "lag_max": max(self._lags, default=None),
+            "stalls": self.stalls,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_loop_watchdog() -> LoopWatchdog:
+    return LoopWatchdog()
+
+
+if LOOP_WATCHDOG_ENABLED:
+    # Only when the watchdog runs; otherwise the gauge would report a misleading steady 0
+    REGISTRY.callback(
+        "refractions_event_loop_lag_recent_seconds",
+        "Event-loop lag percentiles over the watchdog's recent window",
+        # Quantiles are omitted until the probe has samples, rather than reported as 0
+        lambda: {
+            str(q): lag for q in (0.5, 0.95, 0.99) if (lag := get_loop_watchdog().lag_percentile(q * 100)) is not None
+        },
+        ("quantile",),
+    )
@@ -0,0 +1,251 @@
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.utils.logger import logger
+
+# Off by default: when disabled the middleware isn't installed at all
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "profiles")
+)
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_ID_HEADER = "x-profile-id"
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_TRUTHY = ("1", "true", "yes")
+
+# Set for the lifetime of a profiled request; tasks spawned from it inherit it
+_active_profile: contextvars.ContextVar[Optional["RequestProfiler"]] = contextvars.ContextVar("active_profile", default=None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_stack(coro) -> List[str]:
+    """Logical stack of a suspended coroutine: each frame down its chain of awaits (outermost first)."""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class RequestProfiler:
+    """
+    Sampling profiler for one request. A background thread wakes every `interval` seconds and records:
+    - thread;<name>;... : every thread's Python stack (the loop thread plus to_thread/executor workers),
+      i.e. where CPU and blocking time went. The loop thread is shared, so concurrent requests show up too.
+    - task;<name>;...   : the await chain of the request's task and every task it spawned, i.e. where
+      the request's wall-clock time went, including time suspended on I/O.
+    Samples are aggregated into collapsed stacks (flamegraph.pl / speedscope input).
+    """
+
+    def __init__(self, profile_id: str, interval: float = PROFILE_SAMPLE_INTERVAL, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.profile_id = profile_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        # Weak, so finished tasks (pollers, single-flight leaders) aren't pinned for the whole request
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_wall = 0.0
+        self._started_cpu = 0.0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def start(self) -> None:
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.profile_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.wall_seconds = time.perf_counter() - self._started_wall
+        self.cpu_seconds = time.process_time() - self._started_cpu
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample(own_id)
+
+    def _sample(self, own_id: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or names.get(thread_id, "").startswith("profiler-"):
+                continue
+            stack = _thread_stack(frame)
+            self.samples[";".join(["thread", names.get(thread_id, str(thread_id))] + stack)] += 1
+        for task in self._live_tasks():
+            if task.done():
+                continue
+            stack = _await_stack(task.get_coro())
+            if stack:
+                self.samples[";".join(["task", task.get_name()] + stack)] += 1
+        self.sample_count += 1
+
+    def _live_tasks(self) -> List[asyncio.Task]:
+        while True:
+            try:
+                return list(self.tasks)
+            except RuntimeError:
+                # The loop thread added a task mid-copy; retry (as asyncio.all_tasks does)
+                continue
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_path(profile_id: str, suffix: str) -> str:
+    if not _PROFILE_ID.match(profile_id):
+        raise ValueError(f"Invalid profile id: {profile_id!r}")
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{suffix}")
+
+
+def save_profile(profiler: RequestProfiler, metadata: Dict[str, Any]) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(profile_path(profiler.profile_id, "collapsed"), "x") as f:
+        f.write(profiler.collapsed())
+    with open(profile_path(profiler.profile_id, "json"), "x") as f:
+        json.dump(
+            {
+                **metadata,
+                "profile_id": profiler.profile_id,
+                "wall_seconds": round(profiler.wall_seconds, 4),
+                # process_time covers every thread in the process, not just this request
+                "process_cpu_seconds": round(profiler.cpu_seconds, 4),
+                "samples": profiler.sample_count,
+                "interval": profiler.interval,
+            },
+            f,
+        )
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Register tasks created inside a profiled request with its profiler. Installed while at least
+    one profile is active; _uninstall_task_factory restores the previous factory after the last one.
+    """
+    current = loop.get_task_factory()
+    if getattr(current, "_registers_profiled_tasks", False):
+        current._users += 1
+        return
+    previous = current
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous is not None else asyncio.Task(coro, loop=loop, **kwargs)
+        profiler = _active_profile.get()
+        if profiler is not None:
+            profiler.tasks.add(task)
+        return task
+
+    factory._registers_profiled_tasks = True
+    factory._previous = previous
+    factory._users = 1
+    loop.set_task_factory(factory)
+
+
+def _uninstall_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    current = loop.get_task_factory()
+    if not getattr(current, "_registers_profiled_tasks", False):
+        return  # replaced by someone else since; leave their factory alone
+    current._users -= 1
+    if current._users <= 0:
+        loop.set_task_factory(current._previous)
+
+
+class RequestProfilingMiddleware:
+    """
+    Pure ASGI middleware: profiles requests that send `X-Profile: 1` or `?profile=1`. The response
+    carries X-Profile-Id (the caller's X-Request-ID, when it's a safe id, plus a unique suffix so a
+    repeated id never overwrites an earlier profile); the collapsed stacks are
+    written to PROFILE_DIR once the response body has been fully sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._active = 0
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER.encode(), b"").decode().lower() in _TRUTHY:
+            return True
+        query = scope.get("query_string", b"").decode()
+        return any(part in (f"{PROFILE_QUERY_PARAM}={v}" for v in _TRUTHY) for part in query.split("&"))
+
+    @staticmethod
+    def _profile_id(scope) -> str:
+        request_id = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode()[:48]
+        suffix = uuid.uuid4().hex
+        return f"{request_id}-{suffix[:12]}" if _PROFILE_ID.match(request_id) else suffix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            return await self.app(scope, receive, send)
+        if self._active >= PROFILE_MAX_CONCURRENT:
+            logger.warning(f"Profiling skipped for {scope['path']}: {self._active} profiles already running")
+            return await self.app(scope, receive, send)
+
+        profiler = RequestProfiler(self._profile_id(scope))
+        status: Dict[str, Any] = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER.encode(), profiler.profile_id.encode())]}
+            await send(message)
+
+        loop = asyncio.get_running_loop()
+        _install_task_factory(loop)
+        current = asyncio.current_task()
+        if current is not None:
+            profiler.tasks.add(current)
+        token = _active_profile.set(profiler)
+        self._active += 1
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+            self._active -= 1
+            _active_profile.reset(token)
+            _uninstall_task_factory(loop)
+            metadata = {"method": scope["method"], "path": scope["path"], "status": status.get("code")}
+            try:
+                await asyncio.to_thread(save_profile, profiler, metadata)
+                logger.info(f"Saved profile {profiler.profile_id} for {scope['method']} {scope['path']} ({profiler.sample_count} samples)")
+            except OSError as e:
+                logger.error(f"Failed to save profile {profiler.profile_id}: {e}")
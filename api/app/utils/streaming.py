@@ -0,0 +1,50 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from fastapi.responses import StreamingResponse
+from app.utils.logger import logger
+from app.utils.cancellation import REQUEST_DEADLINE_SECONDS, record_cancelled_request
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_results_response(
+    results: AsyncIterator[Dict[str, Any]],
+    build_summary: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+    deadline: Optional[float] = REQUEST_DEADLINE_SECONDS,
+) -> StreamingResponse:
+    """
+    Stream per-item results as NDJSON: one {"event": "result", ...} line per completed item,
+    then a final {"event": "summary", ...} line built from all results.
+    Failures mid-stream are reported as a final {"event": "error"} line, since headers are already sent.
+    If the client disconnects (Starlette cancels the stream) or deadline passes, the results
+    iterator is closed so its outstanding generations are cancelled.
+    """
+
+    async def _events() -> AsyncIterator[str]:
+        collected: List[Dict[str, Any]] = []
+        try:
+            async with asyncio.timeout(deadline):
+                async for result in results:
+                    collected.append(result)
+                    yield json.dumps({"event": "result", **result}, default=str) + "\n"
+            yield json.dumps({"event": "summary", **build_summary(collected)}, default=str) + "\n"
+        except TimeoutError:
+            record_cancelled_request("deadline")
+            logger.warning(f"Stream exceeded {deadline}s deadline after {len(collected)} results")
+            yield json.dumps({"event": "error", "detail": f"deadline of {deadline}s exceeded"}) + "\n"
+        except asyncio.CancelledError:
+            record_cancelled_request("disconnect")
+            logger.warning(f"Client disconnected after {len(collected)} streamed results")
+            raise
+        except Exception as e:
+            logger.error(f"Streaming failed after {len(collected)} results: {e}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(
+        _events(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
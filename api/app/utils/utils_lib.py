@@ -1,10 +1,117 @@
-def format_prompt(template_path: str, **kwargs) -> str:
+import hashlib
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from app.utils.logger import logger
+
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts"))
+# How often (seconds) a template's mtime is re-checked; 0 checks on every use, negative disables reloading
+PROMPTS_RELOAD_INTERVAL = float(os.getenv("PROMPTS_RELOAD_INTERVAL", "2.0"))
+
+_PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class PromptTemplate:
+    """A prompt file split once into literal text and {{variable}} slots."""
+
+    def __init__(self, name: str, text: str, mtime: float):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        self.content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.checked_at = time.monotonic()
+        pieces = _PLACEHOLDER.split(text)
+        # pieces alternate literal, variable, literal, ...
+        self._literals: List[str] = pieces[0::2]
+        self._variables: List[str] = pieces[1::2]
+
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        return tuple(self._variables)
+
+    def render(self, **kwargs) -> str:
+        if not self._variables:
+            return self.text
+        out = [self._literals[0]]
+        for var, literal in zip(self._variables, self._literals[1:]):
+            # Unknown placeholders are left as-is, matching the old str.replace behaviour
+            out.append(str(kwargs[var]) if var in kwargs else f"{{{{{var}}}}}")
+            out.append(literal)
+        return "".join(out)
+
+
+class PromptRegistry:
+    """
+    In-memory prompt templates resolved relative to the app package (not the CWD).
+    Templates are loaded once, then reloaded only when the file's mtime changes.
+    """
+
+    def __init__(self, directory: str = PROMPTS_DIR, reload_interval: float = PROMPTS_RELOAD_INTERVAL):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> int:
+        """Eagerly load every template in the directory; returns how many were loaded."""
+        count = 0
+        for name in sorted(os.listdir(self.directory)):
+            if os.path.isfile(os.path.join(self.directory, name)):
+                self._load(name)
+                count += 1
+        logger.info(f"Loaded {count} prompt templates from {self.directory}")
+        return count
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, os.path.basename(name))
+
+    def _load(self, name: str) -> PromptTemplate:
+        path = self._path(name)
+        mtime = os.stat(path).st_mtime
+        with open(path, "r") as f:
+            template = PromptTemplate(os.path.basename(name), f.read(), mtime)
+        with self._lock:
+            self._templates[template.name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        template = self._templates.get(os.path.basename(name))
+        if template is None:
+            return self._load(name)
+        if self.reload_interval < 0 or time.monotonic() - template.checked_at < self.reload_interval:
+            return template
+        try:
+            mtime = os.stat(self._path(name)).st_mtime
+        except FileNotFoundError:
+            logger.warning(f"Prompt template {name} disappeared; using the cached copy")
+            return template
+        if mtime != template.mtime:
+            logger.info(f"Reloading prompt template {template.name}")
+            return self._load(name)
+        template.checked_at = time.monotonic()
+        return template
+
+    def render(self, name: str, /, **kwargs) -> str:
+        return self.get(name).render(**kwargs)
+
+    def content_hash(self, name: str) -> str:
+        return self.get(name).content_hash
+
+
+@lru_cache(maxsize=1)
+def get_prompt_registry() -> PromptRegistry:
+    return PromptRegistry()
+
+
+def format_prompt(template_path: str, /, **kwargs) -> str:
     """Replace {{variable}} placeholders in template with kwargs"""
-    with open(template_path, "r") as f:
-        template = f.read()
+    return get_prompt_registry().render(template_path, **kwargs)
 
-    # Replace all {{key}} with values from kwargs
-    for key, value in kwargs.items():
-        template = template.replace(f"{{{{{key}}}}}", str(value))
 
-    return template
\ No newline at end of file
+def prompt_version(template_path: str) -> str:
+    """Content hash of a template, for use as a cache version key."""
+    return get_prompt_registry().content_hash(template_path)
@@ -0,0 +1,220 @@
+"""
+Local stand-in for the Bria v2 engine: POST /v2/image/generate, GET /v2/status/{request_id}
+and the result image download, with configurable latency, failures and throttling.
+
+In-process (no sockets):
+    sim = BriaSimulator(latency_median=2.0)
+    client = ImageGenClient(auth={"api_token": "sim"}, base_url=sim.base_url, transport=sim.transport(), save_to="file")
+
+Standalone, for load-testing a running API server (start it with BRIA_BASE_URL=http://127.0.0.1:8787/v2):
+    python -m loadtest.bria_simulator --port 8787 --latency-median 8 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from app.utils.logger import logger
+
+# Smallest valid PNG signature + IHDR; the rest of the payload is padding to mimic real image sizes
+_PNG_HEADER = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000")
+
+
+class _SimulatedJob:
+    __slots__ = ("request_id", "ready_at", "outcome", "structured_prompt", "seed")
+
+    def __init__(self, request_id: str, ready_at: float, outcome: str, structured_prompt: str, seed: int):
+        self.request_id = request_id
+        self.ready_at = ready_at
+        self.outcome = outcome  # "ok" / "error" / "stuck"
+        self.structured_prompt = structured_prompt
+        self.seed = seed
+
+
+class BriaSimulator:
+    """
+    Fake Bria engine. Each submitted job completes after a latency drawn from a log-normal
+    distribution (latency_median seconds, latency_sigma spread) unless latency_fn overrides it.
+
+    - error_rate: fraction of jobs that finish with status ERROR.
+    - timeout_rate: fraction of jobs that never leave IN_PROGRESS.
+    - throttle_rate: fraction of submissions rejected with 429.
+    - max_concurrent_jobs: submissions beyond this many unfinished jobs get 429 (None = unlimited).
+    Counters (submits, status_calls, throttled, downloads, ...) are exposed via stats() and GET /stats.
+    """
+
+    def __init__(
+        self,
+        latency_median: float = 5.0,
+        latency_sigma: float = 0.35,
+        latency_fn: Optional[Callable[[random.Random], float]] = None,
+        submit_latency: float = 0.05,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_concurrent_jobs: Optional[int] = None,
+        retry_after: float = 1.0,
+        image_bytes: int = 256 * 1024,
+        base_url: str = "http://bria-simulator/v2",
+        seed: Optional[int] = None,
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.latency_fn = latency_fn
+        self.submit_latency = submit_latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.throttle_rate = throttle_rate
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.retry_after = retry_after
+        self.base_url = base_url.rstrip("/")
+        self._image = _PNG_HEADER + b"\x00" * max(0, image_bytes - len(_PNG_HEADER))
+        self._random = random.Random(seed)
+        self._jobs: Dict[str, _SimulatedJob] = {}
+        self.counters: Counter = Counter()
+        self.app = self._build_app()
+
+    # ========= Simulation =========
+    def _draw_latency(self) -> float:
+        if self.latency_fn is not None:
+            return max(0.0, self.latency_fn(self._random))
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return self._random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def _draw_outcome(self) -> str:
+        roll = self._random.random()
+        if roll < self.timeout_rate:
+            return "stuck"
+        if roll < self.timeout_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def _unfinished(self, now: float) -> int:
+        return sum(1 for job in self._jobs.values() if job.outcome == "stuck" or job.ready_at > now)
+
+    def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        now = asyncio.get_running_loop().time()
+        if self._random.random() < self.throttle_rate or (
+            self.max_concurrent_jobs is not None and self._unfinished(now) >= self.max_concurrent_jobs
+        ):
+            self.counters["throttled"] += 1
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(self.retry_after)})
+        request_id = uuid.uuid4().hex
+        structured_prompt = payload.get("structured_prompt")
+        if structured_prompt is None:
+            structured_prompt = {"short_description": payload.get("prompt", ""), "style_medium": "photograph"}
+        if not isinstance(structured_prompt, str):
+            structured_prompt = json.dumps(structured_prompt)
+        seed = payload.get("seed")
+        self._jobs[request_id] = _SimulatedJob(
+            request_id,
+            ready_at=now + self._draw_latency(),
+            outcome=self._draw_outcome(),
+            structured_prompt=structured_prompt,
+            seed=seed if isinstance(seed, int) else self._random.randrange(2**31),
+        )
+        self.counters["submits"] += 1
+        return {"request_id": request_id, "status_url": f"{self.base_url}/status/{request_id}"}
+
+    def status(self, request_id: str) -> Dict[str, Any]:
+        self.counters["status_calls"] += 1
+        job = self._jobs.get(request_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown request_id {request_id}")
+        if job.outcome == "stuck" or asyncio.get_running_loop().time() < job.ready_at:
+            return {"request_id": request_id, "status": "IN_PROGRESS"}
+        if job.outcome == "error":
+            self.counters["errors_reported"] += 1
+            return {"request_id": request_id, "status": "ERROR", "error": {"code": 500, "message": "simulated failure"}}
+        self.counters["completions_reported"] += 1
+        return {
+            "request_id": request_id,
+            "status": "COMPLETED",
+            "result": {
+                "image_url": f"{self.base_url}/images/{request_id}.png",
+                "seed": job.seed,
+                "structured_prompt": job.structured_prompt,
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        now = asyncio.get_running_loop().time()
+        return {**self.counters, "jobs": len(self._jobs), "unfinished": self._unfinished(now)}
+
+    def reset(self) -> None:
+        self._jobs.clear()
+        self.counters.clear()
+
+    # ========= HTTP surface =========
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Bria simulator")
+
+        @app.post("/v2/image/generate")
+        async def generate(request: Request):
+            payload = await request.json()
+            if self.submit_latency > 0:
+                await asyncio.sleep(self.submit_latency)
+            return self.submit(payload)
+
+        @app.get("/v2/status/{request_id}")
+        async def status(request_id: str):
+            return self.status(request_id)
+
+        @app.get("/v2/images/{request_id}.png")
+        async def image(request_id: str):
+            self.counters["downloads"] += 1
+            return Response(self._image, media_type="image/png")
+
+        @app.get("/stats")
+        async def stats():
+            return self.stats()
+
+        @app.post("/reset")
+        async def reset():
+            self.reset()
+            return {"status": "ok"}
+
+        return app
+
+    def transport(self) -> httpx.AsyncBaseTransport:
+        """Transport that routes an httpx client straight into the simulator app, no sockets involved."""
+        return httpx.ASGITransport(app=self.app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-median", type=float, default=5.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.35)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent-jobs", type=int, default=None)
+    parser.add_argument("--image-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    simulator = BriaSimulator(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        throttle_rate=args.throttle_rate,
+        max_concurrent_jobs=args.max_concurrent_jobs,
+        image_bytes=args.image_bytes,
+        base_url=f"http://{args.host}:{args.port}/v2",
+        seed=args.seed,
+    )
+    logger.info(f"Bria simulator listening on {simulator.base_url}")
+    uvicorn.run(simulator.app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,384 @@
+"""
+Closed-loop load tests: N concurrent users each issue requests back to back until the total is
+reached. Reports throughput, latency percentiles, peak Python memory and Bria status-call counts.
+
+Orchestrator scenarios run in-process against BriaSimulator (no Bria credits, Gemini or Mongo):
+    python -m loadtest.harness orchestrator --scenario variants --users 20 --requests 200 --latency-median 2
+
+HTTP scenarios drive a running API server whose BRIA_BASE_URL points at a standalone simulator:
+    python -m loadtest.harness http --api-url http://127.0.0.1:8000 --simulator-url http://127.0.0.1:8787 \\
+        --scenario edit --request-id <existing image request_id> --users 10 --requests 100
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.image_gen_client import ImageGenClient
+from app.image_orchestrator import ImageGenOrchestrator
+from app.services.bria_governor import BriaGovernor
+from app.utils.logger import logger
+from loadtest.bria_simulator import BriaSimulator
+
+# A request function returns an error label (e.g. "timeout", "http_500") or None on success
+RequestFn = Callable[[int], Awaitable[Optional[str]]]
+
+SAMPLE_STRUCTURED_PROMPT = {
+    "short_description": "A glass perfume bottle on a travertine plinth, soft morning light.",
+    "style_medium": "photograph",
+    "lighting": {"conditions": "soft morning light", "direction": "upper left", "shadows": "soft"},
+    "photographic_characteristics": {"camera_angle": "eye-level", "lens_focal_length": "85mm"},
+}
+SAMPLE_SHOTS = ("hero", "detail", "flatlay", "environment")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LoadReport:
+    def __init__(
+        self,
+        name: str,
+        users: int,
+        latencies: List[float],
+        errors: Counter,
+        wall_seconds: float,
+        peak_memory_bytes: Optional[int],
+        counters: Dict[str, Any],
+    ):
+        self.name = name
+        self.users = users
+        self.latencies = latencies
+        self.errors = errors
+        self.wall_seconds = wall_seconds
+        self.peak_memory_bytes = peak_memory_bytes
+        self.counters = counters
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "scenario": self.name,
+            "users": self.users,
+            "requests": self.requests,
+            "failed": self.failed,
+            "errors": dict(self.errors),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "throughput_rps": round(self.throughput, 3),
+            "latency_p50": round(percentile(self.latencies, 50), 4),
+            "latency_p95": round(percentile(self.latencies, 95), 4),
+            "latency_p99": round(percentile(self.latencies, 99), 4),
+            "latency_max": round(max(self.latencies, default=0.0), 4),
+            "peak_memory_mb": round(self.peak_memory_bytes / 2**20, 2) if self.peak_memory_bytes is not None else None,
+            **self.counters,
+        }
+
+
+async def run_load(
+    name: str,
+    request_fn: RequestFn,
+    users: int,
+    total_requests: int,
+    counters: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None,
+    track_memory: bool = True,
+) -> LoadReport:
+    """
+    Run request_fn(i) for i in range(total_requests) across `users` concurrent workers.
+    counters() is sampled before and after; numeric values are reported as deltas.
+    """
+    before = await counters() if counters else {}
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    next_index = 0
+
+    async def user() -> None:
+        nonlocal next_index
+        while next_index < total_requests:
+            index, next_index = next_index, next_index + 1
+            started = time.perf_counter()
+            try:
+                error = await request_fn(index)
+            except Exception as e:
+                error = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors[error] += 1
+
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(user() for _ in range(users)))
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+
+    after = await counters() if counters else {}
+    deltas = {
+        key: value - before.get(key, 0) if isinstance(value, (int, float)) else value for key, value in after.items()
+    }
+    report = LoadReport(name, users, latencies, errors, wall, peak, deltas)
+    logger.info(f"Load test {name}: {report.as_dict()}")
+    return report
+
+
+# ========= In-process orchestrator scenarios =========
+class InMemoryImagesCollection:
+    """The subset of AsyncGeneratedImagesCollection the orchestrator writes through, kept in memory."""
+
+    def __init__(self):
+        self.writes: Counter = Counter()
+
+    async def insert_data(self, data: Dict[str, Any]) -> str:
+        self.writes["insert"] += 1
+        return uuid.uuid4().hex
+
+    async def push_variants(self, request_id: str, variants: List[Dict[str, Any]]) -> int:
+        self.writes["push_variants"] += 1
+        return len(variants)
+
+    async def update_image_with_edit(self, request_id: str, edited_image_data: Dict[str, Any]) -> int:
+        self.writes["edit"] += 1
+        return 1
+
+    async def get_variant_result_by_payload_key(self, payload_key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class CannedPromptsOrchestrator(ImageGenOrchestrator):
+    """Skips the upload decode and Gemini translation so run_initial_gen only exercises the Bria fan-out."""
+
+    def setup(self):
+        self.image_bytes = b""
+
+    async def get_prompts_async(self):
+        self.prompts = {
+            shot: {"prompt": f"{shot} shot of {self.vision}", "reasoning": "load test"} for shot in SAMPLE_SHOTS
+        }
+
+
+def _error_label(results: List[Dict[str, Any]]) -> Optional[str]:
+    for result in results:
+        if result.get("status") != "ok":
+            return (result.get("error") or {}).get("type", "error")
+    return None
+
+
+def orchestrator_scenarios(
+    client: ImageGenClient,
+    collection: InMemoryImagesCollection,
+    governor: BriaGovernor,
+    variants_per_request: int = 4,
+    per_request_timeout: int = 120,
+) -> Dict[str, RequestFn]:
+    """Request functions for run_initial_gen, run_variant_gen and run_json_edit. Prompts differ per request so single-flight doesn't coalesce them."""
+
+    async def initial(index: int) -> Optional[str]:
+        orchestrator = CannedPromptsOrchestrator(vision=f"campaign {index}", governor=governor)
+        results = await orchestrator.run_initial_gen(
+            client, collection, max_concurrency=4, per_request_timeout=per_request_timeout
+        )
+        return _error_label(results)
+
+    async def variants(index: int) -> Optional[str]:
+        results = await ImageGenOrchestrator(governor=governor).run_variant_gen(
+            image_gen_client=client,
+            images_collection=collection,
+            seed=index,
+            request_id=f"load-{index}",
+            structured_prompt=SAMPLE_STRUCTURED_PROMPT,
+            selected_variant_list=[
+                {"variant_label": f"v{n}", "description": f"variant {n} of request {index}"}
+                for n in range(variants_per_request)
+            ],
+            wait_time=0,
+            max_concurrency=4,
+            per_request_timeout=per_request_timeout,
+        )
+        return _error_label(results)
+
+    async def edit(index: int) -> Optional[str]:
+        result = await ImageGenOrchestrator(governor=governor).run_json_edit(
+            client,
+            collection,
+            f"load-{index}",
+            shot_type="hero",
+            user_structured_prompt={**SAMPLE_STRUCTURED_PROMPT, "short_description": f"edit {index}"},
+            per_request_timeout=per_request_timeout,
+        )
+        return _error_label([result])
+
+    return {"initial": initial, "variants": variants, "edit": edit}
+
+
+async def run_orchestrator_load(
+    scenario: str,
+    simulator: BriaSimulator,
+    users: int,
+    total_requests: int,
+    governor: Optional[BriaGovernor] = None,
+    output_dir: str = "generated_images",
+    **scenario_options,
+) -> LoadReport:
+    """Drive one orchestrator scenario against the simulator through a real ImageGenClient (save_to="file")."""
+    client = ImageGenClient(
+        auth={"api_token": "simulator"}, base_url=simulator.base_url, transport=simulator.transport(), save_to="file"
+    )
+    collection = InMemoryImagesCollection()
+    request_fn = orchestrator_scenarios(client, collection, governor or BriaGovernor(), **scenario_options)[scenario]
+
+    async def counters() -> Dict[str, Any]:
+        return {
+            **{f"bria_{k}": v for k, v in simulator.stats().items() if k not in ("jobs", "unfinished")},
+            "poller_status_calls": client.poller.status_calls,
+            "single_flight_coalesced": client.single_flight.coalesced,
+            **{f"db_{k}": v for k, v in collection.writes.items()},
+        }
+
+    try:
+        return await run_load(scenario, request_fn, users, total_requests, counters=counters)
+    finally:
+        await client.aclose()
+
+
+# ========= HTTP scenarios against a running API server =========
+def http_scenarios(api: httpx.AsyncClient, request_id: str, variants_per_request: int = 4, image_path: Optional[str] = None) -> Dict[str, RequestFn]:
+    """Request functions for POST /generate, /shots/{id}/variants/{label} and /edit/{id}. Non-2xx responses count as errors."""
+
+    def _label(response: httpx.Response) -> Optional[str]:
+        if response.status_code >= 400:
+            return f"http_{response.status_code}"
+        body = response.json()
+        return f"partial_{body['failed']}_failed" if body.get("failed") else None
+
+    async def initial(index: int) -> Optional[str]:
+        if image_path is None:
+            raise ValueError("--image is required for the initial scenario")
+        with open(image_path, "rb") as f:
+            files = {"image_file": ("upload.png", f.read(), "image/png")}
+        response = await api.post(
+            "/generate", params={"method": "text_to_image"}, data={"vision": f"load test campaign {index}"}, files=files
+        )
+        return _label(response)
+
+    async def variants(index: int) -> Optional[str]:
+        response = await api.post(
+            f"/shots/{request_id}/variants/load",
+            json={
+                "seed": index,
+                "shot_type": "hero",
+                "structured_prompt": SAMPLE_STRUCTURED_PROMPT,
+                "selected_variant_list": [
+                    {"variant_label": f"v{n}", "description": f"variant {n} of request {index}"}
+                    for n in range(variants_per_request)
+                ],
+            },
+        )
+        return _label(response)
+
+    async def edit(index: int) -> Optional[str]:
+        response = await api.post(
+            f"/edit/{request_id}",
+            params={"method": "from_structured_prompt"},
+            json={"shot_type": "hero", "user_structured_prompt": {**SAMPLE_STRUCTURED_PROMPT, "short_description": f"edit {index}"}},
+        )
+        if response.status_code >= 400:
+            return f"http_{response.status_code}"
+        return None if response.json().get("status") == "ok" else "generation_error"
+
+    return {"initial": initial, "variants": variants, "edit": edit}
+
+
+async def run_http_load(
+    scenario: str,
+    api_url: str,
+    users: int,
+    total_requests: int,
+    simulator_url: Optional[str] = None,
+    request_id: str = "",
+    timeout: float = 600,
+    **scenario_options,
+) -> LoadReport:
+    """Drive one HTTP scenario. Memory is the server's concern here, so only the simulator's counters are reported."""
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=api_url, timeout=timeout, limits=limits) as api:
+        request_fn = http_scenarios(api, request_id, **scenario_options)[scenario]
+
+        async def counters() -> Dict[str, Any]:
+            if not simulator_url:
+                return {}
+            stats = (await api.get(f"{simulator_url.rstrip('/')}/stats")).json()
+            return {f"bria_{k}": v for k, v in stats.items() if k not in ("jobs", "unfinished")}
+
+        return await run_load(f"http:{scenario}", request_fn, users, total_requests, counters=counters, track_memory=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+    for mode in ("orchestrator", "http"):
+        p = sub.add_parser(mode)
+        p.add_argument("--scenario", choices=("initial", "variants", "edit"), default="variants")
+        p.add_argument("--users", type=int, default=10)
+        p.add_argument("--requests", type=int, default=100)
+        p.add_argument("--variants-per-request", type=int, default=4)
+    orch = sub.choices["orchestrator"]
+    orch.add_argument("--latency-median", type=float, default=2.0)
+    orch.add_argument("--latency-sigma", type=float, default=0.35)
+    orch.add_argument("--error-rate", type=float, default=0.0)
+    orch.add_argument("--timeout-rate", type=float, default=0.0)
+    orch.add_argument("--throttle-rate", type=float, default=0.0)
+    orch.add_argument("--max-concurrent-jobs", type=int, default=None)
+    orch.add_argument("--per-request-timeout", type=int, default=120)
+    http = sub.choices["http"]
+    http.add_argument("--api-url", default="http://127.0.0.1:8000")
+    http.add_argument("--simulator-url", default=None)
+    http.add_argument("--request-id", default="", help="Existing image request_id for the variants/edit scenarios")
+    http.add_argument("--image", default=None, help="Image file uploaded by the initial scenario")
+    args = parser.parse_args()
+
+    if args.mode == "orchestrator":
+        simulator = BriaSimulator(
+            latency_median=args.latency_median,
+            latency_sigma=args.latency_sigma,
+            error_rate=args.error_rate,
+            timeout_rate=args.timeout_rate,
+            throttle_rate=args.throttle_rate,
+            max_concurrent_jobs=args.max_concurrent_jobs,
+        )
+        options = {"variants_per_request": args.variants_per_request, "per_request_timeout": args.per_request_timeout}
+        report = asyncio.run(run_orchestrator_load(args.scenario, simulator, args.users, args.requests, **options))
+    else:
+        options = {"variants_per_request": args.variants_per_request, "image_path": args.image}
+        report = asyncio.run(
+            run_http_load(
+                args.scenario, args.api_url, args.users, args.requests,
+                simulator_url=args.simulator_url, request_id=args.request_id, **options,
+            )
+        )
+    print(json.dumps(report.as_dict(), indent=2))
@@ -0,0 +1,46 @@
+import httpx
+import pytest
+
+from app.services.bria_governor import BriaGovernor
+from loadtest.bria_simulator import BriaSimulator
+from loadtest.harness import percentile, run_orchestrator_load
+
+
+@pytest.mark.asyncio
+async def test_simulator_throttles_and_reports_outcomes():
+    sim = BriaSimulator(latency_median=0.0, latency_sigma=0, submit_latency=0, error_rate=1.0, max_concurrent_jobs=1)
+    async with httpx.AsyncClient(transport=sim.transport()) as client:
+        submitted = (await client.post(f"{sim.base_url}/image/generate", json={"prompt": "a"})).json()
+        status = (await client.get(f"{sim.base_url}/status/{submitted['request_id']}")).json()
+        assert status["status"] == "ERROR"
+
+        sim.timeout_rate, sim.error_rate = 1.0, 0.0
+        await client.post(f"{sim.base_url}/image/generate", json={"prompt": "b"})
+        throttled = await client.post(f"{sim.base_url}/image/generate", json={"prompt": "c"})
+        assert throttled.status_code == 429
+        assert throttled.headers["retry-after"] == "1.0"
+    assert sim.stats()["submits"] == 2
+    assert sim.stats()["throttled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_load_against_simulator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = BriaSimulator(latency_median=0.05, latency_sigma=0, submit_latency=0, image_bytes=1024, seed=7)
+    report = await run_orchestrator_load(
+        "variants", sim, users=3, total_requests=6, governor=BriaGovernor(max_in_flight=16, rate=0), variants_per_request=2
+    )
+    stats = report.as_dict()
+    assert stats["requests"] == 6 and stats["failed"] == 0
+    assert stats["bria_submits"] == 12 and stats["bria_downloads"] == 12
+    assert stats["poller_status_calls"] == stats["bria_status_calls"] >= 12
+    assert stats["db_push_variants"] >= 6
+    assert 0 < stats["latency_p50"] <= stats["latency_p99"]
+    assert stats["peak_memory_mb"] > 0
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
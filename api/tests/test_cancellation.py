@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from app.utils import cancellation
+from app.utils.cancellation import CLIENT_CLOSED_REQUEST, run_until_disconnect
+
+
+class FakeRequest:
+    method = "POST"
+
+    class url:
+        path = "/generate"
+
+    def __init__(self, disconnect_after: float = None):
+        self._loop = asyncio.get_running_loop()
+        self._disconnect_at = None if disconnect_after is None else self._loop.time() + disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        return self._disconnect_at is not None and self._loop.time() >= self._disconnect_at
+
+
+async def _slow_work(cancelled: asyncio.Event):
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+@pytest.mark.asyncio
+async def test_completed_work_is_returned():
+    async def work():
+        return {"ok": True}
+
+    assert await run_until_disconnect(FakeRequest(), work(), poll_interval=0.01) == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_work():
+    before = cancellation.cancelled_requests["disconnect"]
+    cancelled = asyncio.Event()
+    with pytest.raises(HTTPException) as exc:
+        await run_until_disconnect(FakeRequest(disconnect_after=0.03), _slow_work(cancelled), poll_interval=0.01)
+    assert exc.value.status_code == CLIENT_CLOSED_REQUEST
+    assert cancelled.is_set()
+    assert cancellation.cancelled_requests["disconnect"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_work():
+    before = cancellation.cancelled_requests["deadline"]
+    cancelled = asyncio.Event()
+    with pytest.raises(HTTPException) as exc:
+        await run_until_disconnect(FakeRequest(), _slow_work(cancelled), deadline=0.05, poll_interval=0.01)
+    assert exc.value.status_code == 504
+    assert cancelled.is_set()
+    assert cancellation.cancelled_requests["deadline"] == before + 1
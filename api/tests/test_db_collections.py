@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from pymongo.errors import PyMongoError
+
+from app.db.db_connection import DatabaseConnection
+from app.db.db_collections import AsyncGeneratedImagesCollection
+
+
+@pytest_asyncio.fixture
+async def unreachable_db():
+    """Async client pointed at a closed port, so every DB call waits out server selection."""
+    db_connection = DatabaseConnection.get_instance()
+    await db_connection.close_async_connection()
+    db_connection.initialize_async_mongo_client(
+        host="mongodb://127.0.0.1:1/?directConnection=true",
+        db_name="refractions_test",
+        serverSelectionTimeoutMS=500,
+        connectTimeoutMS=100,
+    )
+    yield db_connection
+    await db_connection.close_async_connection()
+
+
+async def _max_loop_gap(stop: asyncio.Event, tick: float = 0.01) -> float:
+    max_gap = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(tick)
+        now = time.perf_counter()
+        max_gap = max(max_gap, now - last - tick)
+        last = now
+    return max_gap
+
+
+@pytest.mark.asyncio
+async def test_db_calls_do_not_block_event_loop(unreachable_db):
+    images_collection = AsyncGeneratedImagesCollection()
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_max_loop_gap(stop))
+
+    calls = [
+        images_collection.insert_data({"shot_type": "hero"}),
+        images_collection.get_image_by_request_id("missing"),
+        images_collection.update_image_with_variant("missing", {"variant_label": "softbox_even"}),
+        images_collection.update_image_with_edit("missing", {"shot_type": "hero"}),
+    ]
+    started = time.perf_counter()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    max_gap = await ticker
+
+    assert all(isinstance(r, PyMongoError) for r in results)
+    # Every call spent ~serverSelectionTimeoutMS waiting, yet the loop kept ticking throughout
+    assert elapsed >= 0.4
+    assert max_gap < 0.1
@@ -0,0 +1,30 @@
+import pytest
+
+from app.utils.decorators import async_retry_on_failure
+from app.utils.response_handlers import ResponseFailure
+
+
+@pytest.mark.asyncio
+async def test_async_retry_recovers_after_transient_failures():
+    attempts = []
+
+    @async_retry_on_failure(max_retries=3, delay=0.001)
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    assert await flaky() == "ok"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_retry_returns_failure_after_exhausting_retries():
+    @async_retry_on_failure(max_retries=1, delay=0.001)
+    async def always_fails():
+        raise RuntimeError("boom")
+
+    result = await always_fails()
+    assert isinstance(result, ResponseFailure)
+    assert "boom" in result.details
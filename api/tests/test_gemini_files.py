@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.gemini_files import GeminiFileRegistry
+
+
+class FakeFilesAPI:
+    """Stands in for client.files / client.aio.files."""
+
+    def __init__(self, clock, ttl=3600):
+        self.clock = clock
+        self.ttl = ttl
+        self.calls = 0
+
+    def _file(self, config):
+        self.calls += 1
+        return SimpleNamespace(
+            uri=f"https://generativelanguage.googleapis.com/files/{self.calls}",
+            mime_type=config.mime_type,
+            expiration_time=datetime.fromtimestamp(self.clock() + self.ttl, tz=timezone.utc),
+        )
+
+    def upload(self, *, file, config):
+        return self._file(config)
+
+
+class FakeAsyncFilesAPI(FakeFilesAPI):
+    async def upload(self, *, file, config):
+        await asyncio.sleep(0.01)
+        return self._file(config)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _registry():
+    clock = Clock()
+    client = SimpleNamespace(files=FakeFilesAPI(clock), aio=SimpleNamespace(files=FakeAsyncFilesAPI(clock)))
+    return GeminiFileRegistry(client, expiry_margin=60, clock=clock), client, clock
+
+
+def test_same_bytes_reuse_handle_until_expiry():
+    registry, client, clock = _registry()
+    first = registry.get_or_upload(b"image", "image/webp")
+    assert registry.get_or_upload(b"image", "image/webp") == first
+    assert client.files.calls == 1
+
+    registry.get_or_upload(b"other image", "image/webp")
+    assert client.files.calls == 2
+
+    clock.now += 3600 - 30  # inside the safety margin
+    refreshed = registry.get_or_upload(b"image", "image/webp")
+    assert refreshed.uri != first.uri
+    assert client.files.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_uploads_of_same_image_are_coalesced():
+    registry, client, _ = _registry()
+    handles = await asyncio.gather(*(registry.aget_or_upload(b"image", "image/png") for _ in range(4)))
+    assert client.aio.files.calls == 1
+    assert len({h.uri for h in handles}) == 1
+    assert (await registry.aget_or_upload(b"image", "image/png")).uri == handles[0].uri
+    assert registry.reuses == 1
+
+
+def _vertex_client():
+    from google.auth.credentials import AnonymousCredentials
+    from google.genai import Client
+
+    return Client(vertexai=True, project="test-project", location="us-central1", credentials=AnonymousCredentials())
+
+
+@pytest.mark.asyncio
+async def test_vertex_client_stages_large_images_in_gcs():
+    client = _vertex_client()
+    # The Files API is Developer-client only; the registry must never call it on Vertex
+    with pytest.raises(ValueError):
+        client.files.upload(file=b"image")
+
+    staged = []
+
+    def gcs_upload(key, data, mime_type):
+        staged.append(key)
+        return f"gs://refractions/gemini-inputs/{key}.png"
+
+    registry = GeminiFileRegistry(client, gcs_upload=gcs_upload)
+    assert registry.uses_gcs
+    first = registry.get_or_upload(b"image", "image/png")
+    assert first.uri.startswith("gs://") and first.mime_type == "image/png"
+    assert (await registry.aget_or_upload(b"image", "image/png")) == first
+    handles = await asyncio.gather(*(registry.aget_or_upload(b"other", "image/png") for _ in range(3)))
+    assert len({h.uri for h in handles}) == 1
+    assert len(staged) == 2
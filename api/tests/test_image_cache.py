@@ -0,0 +1,68 @@
+import httpx
+import pytest
+
+from app.utils.image_utils import ImageByteCache, get_image_bytes_async, stream_image_from_url
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"x" * 4096
+
+
+@pytest.fixture
+def image_cache(tmp_path, monkeypatch):
+    cache = ImageByteCache(memory_bytes=1024 * 1024, directory=str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr("app.utils.image_utils.get_image_cache", lambda: cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_streamed_download_populates_cache(tmp_path, image_cache):
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=PNG, headers={"content-type": "image/png"}))
+    async with httpx.AsyncClient(transport=transport) as client:
+        saved_path = await stream_image_from_url(
+            "https://cdn.example.com/out.png", http_client=client, save_to="file",
+            dir_name=str(tmp_path / "out"), request_id="abc", chunk_size=1024,
+        )
+
+    fetches = 0
+
+    def no_network(request):
+        nonlocal fetches
+        fetches += 1
+        return httpx.Response(500)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(no_network)) as client:
+        assert await get_image_bytes_async(saved_path, http_client=client) == PNG
+    assert fetches == 0
+    assert image_cache.disk.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_miss_fetches_once_then_serves_from_memory(image_cache):
+    fetches = 0
+
+    def handler(request):
+        nonlocal fetches
+        fetches += 1
+        return httpx.Response(200, content=PNG)
+
+    url = "https://storage.googleapis.com/bucket/generated_images/a.png"
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        assert await get_image_bytes_async(url, http_client=client) == PNG
+        assert await get_image_bytes_async(url, http_client=client) == PNG
+    assert fetches == 1
+    assert image_cache.memory.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_miss_without_client_uses_the_shared_pool(image_cache, monkeypatch):
+    from app.image_gen_client import ImageGenClient
+
+    pooled = ImageGenClient(
+        auth={"api_token": "test"},
+        base_url="https://engine.prod.bria-api.com/v2",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=PNG)),
+    )
+    monkeypatch.setattr("app.image_gen_client.get_image_gen_client", lambda: pooled)
+    url = "https://storage.googleapis.com/bucket/generated_images/b.png"
+    assert await get_image_bytes_async(url) == PNG
+    assert pooled._client is not None and not pooled._client.is_closed  # fetched over the pool, which stays open
+    await pooled.aclose()
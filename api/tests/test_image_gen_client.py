@@ -3,7 +3,10 @@ import os
 import json
 import pytest
 
-from app.image_gen_client import get_image_gen_client
+from app import image_gen_client, image_orchestrator
+from app.image_gen_client import build_refine_payload, canonical_payload_key, get_image_gen_client
+from app.image_orchestrator import ImageGenOrchestrator
+from app.services.prompt_store import prompt_hash
 
 
 @pytest.mark.asyncio
@@ -84,3 +87,38 @@ async def test_structured_prompt_roundtrip_equal():
         returned_sp = json.loads(returned_sp)
 
     assert returned_sp == structured_prompt, "Structured prompt mismatch between request and response"
+
+
+@pytest.mark.asyncio
+async def test_refinement_result_cache_is_keyed_by_model_version(monkeypatch):
+    class LookupRecorder:
+        def __init__(self):
+            self.keys = []
+
+        async def get_variant_result_by_payload_key(self, payload_key):
+            self.keys.append(payload_key)
+            return {"image_url": "cached"}
+
+    collection = LookupRecorder()
+    variant = {"variant_label": "softbox_even", "description": "soften the light"}
+    for version in ("FIBO", "FIBO-2"):
+        monkeypatch.setattr(image_orchestrator, "MODEL_VERSION", version)
+        result = await ImageGenOrchestrator(governor=object()).refine_image_variant(
+            seed=7, structured_prompt={"short_description": "a bottle"}, request_id="req-1", variant_item=variant,
+            image_gen_client=None, images_collection=collection, use_result_cache=True,
+        )
+        assert result["cached"]
+    assert collection.keys[0] != collection.keys[1]
+
+
+def test_payload_key_accepts_a_precomputed_prompt_hash(monkeypatch):
+    prompt = {"short_description": "a bottle", "lighting": {"conditions": "soft"}}
+    payload = build_refine_payload(7, prompt, "soften the light")
+    key = canonical_payload_key(payload)
+    assert key == canonical_payload_key(build_refine_payload(7, json.dumps(prompt, indent=2), "soften the light"))
+
+    def no_rehash(structured_prompt):
+        raise AssertionError("prompt re-hashed despite prompt_key")
+
+    monkeypatch.setattr(image_gen_client, "prompt_hash", no_rehash)
+    assert canonical_payload_key(payload, prompt_hash(prompt)) == key
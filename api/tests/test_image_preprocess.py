@@ -0,0 +1,39 @@
+import io
+from PIL import Image
+
+from app.utils.image_utils import _gemini_image_format, preprocess_image_for_gemini
+
+
+def _encode(size, fmt, mode="RGB"):
+    buf = io.BytesIO()
+    Image.new(mode, size, color=(200, 100, 50, 128) if mode == "RGBA" else (200, 100, 50)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_small_supported_images_pass_through_with_real_mime_type():
+    png = _encode((640, 480), "PNG")
+    data, mime = preprocess_image_for_gemini(png, max_edge=1024)
+    assert data is png
+    assert mime == "image/png"
+
+
+def test_large_images_are_downscaled_and_reencoded():
+    big = _encode((4000, 2000), "PNG", mode="RGBA")
+    data, mime = preprocess_image_for_gemini(big, max_edge=1000, target_format="WEBP")
+    assert mime == "image/webp"
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "WEBP"
+        assert img.size == (1000, 500)
+        assert img.mode == "RGBA"
+
+
+def test_undecodable_bytes_fall_back_to_raw():
+    data, mime = preprocess_image_for_gemini(b"not an image", max_edge=1000)
+    assert data == b"not an image"
+    assert mime == "image/jpeg"
+
+
+def test_gemini_image_format_setting_is_normalized():
+    assert _gemini_image_format("jpg") == "JPEG"
+    assert _gemini_image_format(" png ") == "PNG"
+    assert _gemini_image_format("gif") == "WEBP"
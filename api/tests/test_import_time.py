@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous default so CI noise doesn't flake; tighten locally to catch regressions
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "5.0"))
+HEAVY_MODULES = ("google.genai", "google.cloud.storage", "trimesh", "numpy", "PIL", "pygltflib")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def test_app_imports_quickly_without_credentials():
+    env = {k: v for k, v in os.environ.items() if not k.endswith("SERVICE_ACCOUNT_KEY_PATH")}
+    proc = subprocess.run([sys.executable, "-c", _PROBE], cwd=API_DIR, env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    print(f"import app.main: {result['seconds']:.3f}s")
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+from app.services.job_queue import JobQueue, JobQueueFull
+
+
+class FakeJobsCollection:
+    def __init__(self):
+        self.jobs = {}
+        self.interrupted_calls = []
+
+    async def insert_data(self, data):
+        await asyncio.sleep(0.01)
+        self.jobs[data["request_id"]] = data
+        return data["request_id"]
+
+    async def update_job(self, job_id, fields):
+        self.jobs[job_id].update(fields)
+
+    async def renew_leases(self, owner):
+        return 0
+
+    async def fail_interrupted_jobs(self, lease_seconds, previous_owner=None):
+        self.interrupted_calls.append(previous_owner)
+        return 0
+
+
+def _started_queue(max_size: int) -> JobQueue:
+    queue = JobQueue(workers=0, max_size=max_size, instance_id="instance-a")
+    queue._queue = asyncio.Queue(maxsize=max_size)
+    queue._jobs_collection = FakeJobsCollection()
+    return queue
+
+
+async def _noop_job(report_progress):
+    return {}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_past_capacity_are_rejected_cleanly():
+    queue = _started_queue(max_size=2)
+    results = await asyncio.gather(*(queue.submit("generate", {}, _noop_job) for _ in range(5)), return_exceptions=True)
+
+    accepted = [r for r in results if not isinstance(r, Exception)]
+    assert len(accepted) == 2
+    assert all(isinstance(r, JobQueueFull) for r in results if isinstance(r, Exception))
+    # Rejected submits never wrote a job document
+    assert set(queue._jobs_collection.jobs) == {job.request_id for job in accepted}
+    assert all(doc["owner"] == "instance-a" for doc in queue._jobs_collection.jobs.values())
+
+
+@pytest.mark.asyncio
+async def test_only_startup_cleanup_claims_this_instances_jobs():
+    queue = JobQueue(workers=0, instance_id="instance-a", lease_seconds=0.03)
+    jobs = FakeJobsCollection()
+    queue._jobs_collection = jobs
+    await queue._fail_interrupted_jobs(previous_owner=queue.instance_id)
+    renewer = asyncio.create_task(queue._renew_leases())
+    await asyncio.sleep(0.05)
+    renewer.cancel()
+    await asyncio.gather(renewer, return_exceptions=True)
+
+    assert jobs.interrupted_calls[0] == "instance-a"
+    # Periodic sweeps only reclaim expired leases, never this instance's live jobs
+    assert len(jobs.interrupted_calls) > 1 and set(jobs.interrupted_calls[1:]) == {None}
@@ -0,0 +1,74 @@
+import os
+import time
+import pytest
+from pydantic import BaseModel
+
+from app.services.llm_cache import GeminiResponseCache, make_cache_key
+from app.utils.cache import DiskCache
+from app.utils.response_handlers import ResponseSuccess
+
+
+class Critique(BaseModel):
+    critique: str
+    overall_rating: int
+
+
+def _key(**overrides):
+    params = dict(image_bytes=b"img", user_prompt="critique", prompt_version="sys", model="gemini-2.5-pro", response_schema=Critique)
+    params.update(overrides)
+    return make_cache_key(**params)
+
+
+def test_cache_key_changes_with_every_input():
+    base = _key()
+    assert base == _key()
+    for override in (
+        {"image_bytes": b"other"},
+        {"user_prompt": "other"},
+        {"prompt_version": "other"},
+        {"model": "gemini-2.5-flash"},
+        {"response_schema": None},
+    ):
+        assert _key(**override) != base
+
+
+@pytest.mark.asyncio
+async def test_parsed_response_round_trips_through_disk_tier(tmp_path):
+    cache = GeminiResponseCache(directory=str(tmp_path), max_bytes=1024 * 1024, ttl_seconds=60)
+    key = _key()
+    assert await cache.aget(key, Critique) is None
+    await cache.aset(key, ResponseSuccess(response=Critique(critique="flat light", overall_rating=6)), Critique)
+
+    cache.memory.clear()  # force the disk tier, as after a restart
+    hit = await cache.aget(key, Critique)
+    assert hit.response == Critique(critique="flat light", overall_rating=6)
+    assert await cache.aget(key, Critique) is not None  # now served from memory
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_cache_expires_and_evicts_oldest(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    for i in range(3):
+        disk.set(f"{i:02d}key", bytes(100))
+        past = time.time() - 10 + i
+        os.utime(disk.path_for(f"{i:02d}key"), (past, past))
+    # Over the cap after the third write: oldest entry is evicted first
+    assert disk.get("00key") is None
+    assert disk.get("02key") is not None
+
+    old = time.time() - 120
+    os.utime(disk.path_for("02key"), (old, old))
+    assert disk.get("02key") is None
+
+
+def test_disk_cache_hits_protect_entries_from_eviction(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    for i in range(2):
+        disk.set(f"{i:02d}key", bytes(100))
+        past = time.time() - 10 + i
+        os.utime(disk.path_for(f"{i:02d}key"), (past, past))
+    assert disk.get("00key") is not None  # oldest write, but most recently used
+    disk.set("02key", bytes(100))
+    assert disk.get("01key") is None
+    assert disk.get("00key") is not None
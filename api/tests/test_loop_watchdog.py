@@ -0,0 +1,40 @@
+import asyncio
+import time
+import pytest
+
+from app.utils.loop_watchdog import LoopWatchdog
+
+
+def _block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_blocking_callback_is_reported_with_its_stack():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.05)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        _block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await watchdog.stop()
+
+    assert watchdog.stalls == 1
+    assert "_block_the_loop" in watchdog.last_stall_stack
+    stats = watchdog.stats()
+    assert stats["lag_max"] >= 0.2
+    assert stats["lag_p50"] < 0.05
+    assert not stats["running"]
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_reports_no_stalls():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.15)
+    finally:
+        await watchdog.stop()
+    assert watchdog.stalls == 0
+    assert watchdog.stats()["samples"] >= 5
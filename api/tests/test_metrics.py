@@ -0,0 +1,94 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.image_orchestrator import ImageGenOrchestrator
+from app.utils.metrics import GENERATION_ERRORS, HTTP_REQUEST_SECONDS, MetricsRegistry, RequestLatencyMiddleware
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = MetricsRegistry()
+    stages = registry.histogram("test_stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    errors = registry.counter("test_errors_total", "Errors", ("type",))
+    registry.callback("test_depth", "Depth", lambda: 3)
+    stages.observe(0.05, stage="bria_submit")
+    stages.observe(0.5, stage="bria_submit")
+    stages.observe(5, stage="bria_submit")
+    errors.inc(type="timeout")
+    errors.inc(2, type="timeout")
+
+    text = registry.render()
+    assert "# TYPE test_stage_seconds histogram" in text
+    assert 'test_stage_seconds_bucket{stage="bria_submit",le="0.1"} 1' in text
+    assert 'test_stage_seconds_bucket{stage="bria_submit",le="1.0"} 2' in text
+    assert 'test_stage_seconds_bucket{stage="bria_submit",le="+Inf"} 3' in text
+    assert 'test_stage_seconds_count{stage="bria_submit"} 3' in text
+    assert 'test_errors_total{type="timeout"} 3' in text
+    assert "test_depth 3" in text
+
+
+def test_failing_callback_does_not_break_scrape():
+    registry = MetricsRegistry()
+    registry.callback("test_broken", "Broken", lambda: 1 / 0)
+    registry.counter("test_ok_total", "Fine").inc()
+    text = registry.render()
+    assert "test_ok_total 1" in text
+    assert "# TYPE test_broken" not in text
+
+
+@pytest.mark.asyncio
+async def test_error_results_are_counted_by_type():
+    before = GENERATION_ERRORS.value(type="input_error")
+    result = await ImageGenOrchestrator().generate_one(
+        shot_type="hero",
+        item={"prompt": ""},
+        image_gen_client=None,
+        images_collection=None,
+        semaphore=asyncio.Semaphore(1),
+        wait_time=0,
+        per_request_timeout=1,
+        generation_method="text",
+    )
+    assert result["status"] == "error"
+    assert GENERATION_ERRORS.value(type="input_error") == before + 1
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'refractions_http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "refractions_bria_queue_depth 0" in response.text
+    # LOOP_WATCHDOG_ENABLED is off by default, so no lag gauge is exported
+    assert "refractions_event_loop_lag_recent_seconds" not in response.text
+
+
+@pytest.mark.asyncio
+async def test_latency_middleware_times_streamed_bodies_and_records_status():
+    app = FastAPI()
+    app.add_middleware(RequestLatencyMiddleware)
+
+    @app.get("/test-stream/{item}")
+    async def stream(item: str):
+        async def body():
+            yield b"first\n"
+            await asyncio.sleep(0.05)
+            yield b"second\n"
+
+        return StreamingResponse(body(), status_code=201)
+
+    labels = {"method": "GET", "route": "/test-stream/{item}", "status": 201}
+    before = HTTP_REQUEST_SECONDS.count(**labels)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/test-stream/a")
+    assert response.text == "first\nsecond\n"
+    assert HTTP_REQUEST_SECONDS.count(**labels) == before + 1
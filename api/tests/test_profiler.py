@@ -0,0 +1,72 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.routes.profiles import router as profiles_router
+from app.utils import profiler
+from app.utils.profiler import RequestProfilingMiddleware
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def _slow_io() -> None:
+    await asyncio.sleep(0.1)
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestProfilingMiddleware)
+    app.include_router(profiles_router)
+
+    @app.get("/work")
+    async def work():
+        await asyncio.gather(asyncio.create_task(_slow_io()), asyncio.to_thread(_busy, 0.1))
+        return {"ok": True}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_profiled_request_is_stored_and_retrievable(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    loop = asyncio.get_running_loop()
+    factory_before = loop.get_task_factory()
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/work", headers={"X-Profile": "1", "X-Request-ID": "req-123"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        assert profile_id.startswith("req-123-")
+        # The task factory is only installed while a profile is running
+        assert loop.get_task_factory() is factory_before
+
+        collapsed = (await client.get(f"/profiles/{profile_id}")).text
+        assert "task;" in collapsed and "_slow_io" in collapsed  # spawned task's await chain
+        assert "thread;" in collapsed and "_busy" in collapsed  # sync frames in a worker thread
+
+        metadata = (await client.get(f"/profiles/{profile_id}", params={"format": "json"})).json()
+        assert metadata["path"] == "/work" and metadata["status"] == 200
+        assert metadata["samples"] > 0
+
+        # A repeated X-Request-ID gets its own profile instead of overwriting the first
+        again = await client.get("/work", headers={"X-Profile": "1", "X-Request-ID": "req-123"})
+        assert again.headers["x-profile-id"] != profile_id
+        listed = {p["profile_id"] for p in (await client.get("/profiles")).json()}
+        assert listed == {profile_id, again.headers["x-profile-id"]}
+
+
+@pytest.mark.asyncio
+async def test_requests_without_the_flag_are_not_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/work")
+        assert "x-profile-id" not in response.headers
+        assert (await client.get("/profiles")).json() == []
+        assert (await client.get("/profiles/../etc")).status_code in (400, 404)
@@ -0,0 +1,36 @@
+import os
+import pytest
+
+from app.utils.utils_lib import PromptRegistry, PROMPTS_DIR
+
+
+def test_templates_resolve_relative_to_package(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the old relative paths broke outside the api/ dir
+    registry = PromptRegistry(PROMPTS_DIR)
+    assert registry.load_all() == len([n for n in os.listdir(PROMPTS_DIR) if os.path.isfile(os.path.join(PROMPTS_DIR, n))])
+    assert registry.get("./app/prompts/critique.txt") is registry.get("critique.txt")
+
+
+def test_render_and_reload_on_mtime_change(tmp_path):
+    template_file = tmp_path / "greeting.txt"
+    template_file.write_text("Hello {{name}}, shot {{shot_type}} {{missing}}")
+    registry = PromptRegistry(str(tmp_path), reload_interval=0)
+
+    assert registry.render("greeting.txt", name="Ada", shot_type="hero") == "Hello Ada, shot hero {{missing}}"
+    first_hash = registry.content_hash("greeting.txt")
+
+    template_file.write_text("Bye {{name}}")
+    stat = os.stat(template_file)
+    os.utime(template_file, (stat.st_atime, stat.st_mtime + 5))
+
+    assert registry.render("greeting.txt", name="Ada") == "Bye Ada"
+    assert registry.content_hash("greeting.txt") != first_hash
+
+
+def test_unchanged_templates_are_not_reread(tmp_path):
+    template_file = tmp_path / "static.txt"
+    template_file.write_text("v1")
+    registry = PromptRegistry(str(tmp_path), reload_interval=60)
+    assert registry.render("static.txt") == "v1"
+    template_file.write_text("v2")
+    assert registry.render("static.txt") == "v1"
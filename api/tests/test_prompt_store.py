@@ -0,0 +1,90 @@
+import pytest
+
+from app.services.prompt_store import REF_KEY, StructuredPromptStore, prompt_hash
+
+
+class InMemoryPromptStore(StructuredPromptStore):
+    def __init__(self):
+        super().__init__(memory_entries=16)
+        self.db = {}
+        self.saves = 0
+
+    async def _save(self, prompts):
+        self.saves += 1
+        for h, p in prompts.items():
+            self.db.setdefault(h, p)
+
+    async def _load(self, hashes):
+        return {h: self.db[h] for h in hashes if h in self.db}
+
+
+def test_hash_ignores_formatting_and_key_order():
+    assert prompt_hash({"b": 1, "a": [1, 2]}) == prompt_hash('{ "a": [1, 2], "b": 1 }')
+    assert prompt_hash("not json") is None
+
+
+@pytest.mark.asyncio
+async def test_documents_store_refs_and_resolve_transparently():
+    store = InMemoryPromptStore()
+    prompt = {"lighting": {"conditions": "soft"}, "objects": []}
+    variants = [
+        {"refinement_data": {"previous_structured_prompt": prompt}, "result_data": {"structured_prompt": {**prompt, "seed_note": i}}}
+        for i in range(3)
+    ]
+    stored = await store.dehydrate_many(variants)
+
+    assert store.saves == 1  # one write for the whole batch
+    assert len(store.db) == 4  # shared parent prompt stored once
+    assert stored[0]["refinement_data"]["previous_structured_prompt"] == {REF_KEY: prompt_hash(prompt)}
+    assert variants[0]["refinement_data"]["previous_structured_prompt"] is prompt  # input untouched
+
+    await store.dehydrate({"result_data": {"structured_prompt": prompt}})
+    assert store.saves == 1  # already known prompts aren't rewritten
+
+    cold = InMemoryPromptStore()
+    cold.db = store.db
+    resolved = await cold.hydrate(stored[2])
+    assert resolved["result_data"]["structured_prompt"] == {**prompt, "seed_note": 2}
+    assert resolved["refinement_data"]["previous_structured_prompt"] == prompt
+    legacy = {"result_data": {"structured_prompt": prompt}}
+    assert await cold.hydrate(legacy) == legacy
+
+
+class FakeAsyncCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.writes = []
+
+    def find(self, query, projection=None, batch_size=None):
+        async def cursor():
+            for document in self.documents:
+                yield document
+        return cursor()
+
+    async def bulk_write(self, requests, ordered=True):
+        self.writes.extend(requests)
+
+
+@pytest.mark.asyncio
+async def test_backfill_replaces_inline_prompts_with_refs():
+    from app.db.backfill_prompt_refs import backfill_collection
+
+    store = InMemoryPromptStore()
+    prompt = {"lighting": {"conditions": "soft"}}
+    ref = {REF_KEY: prompt_hash(prompt)}
+    collection = FakeAsyncCollection([
+        {"_id": 1, "refinement_data": {"previous_structured_prompt": prompt}, "result_data": {"structured_prompt": ref}},
+        {"_id": 2, "result_data": {"structured_prompt": '{"lighting": {"conditions": "soft"}}', "image_url": "u"}},
+    ])
+
+    dry = await backfill_collection(collection, store, batch_size=1, dry_run=True)
+    assert dry == {"documents": 2, "fields": 2}
+    assert collection.writes == [] and store.db == {}
+
+    stats = await backfill_collection(collection, store, batch_size=1)
+    assert stats == {"documents": 2, "fields": 2}
+    assert [w._doc for w in collection.writes] == [
+        {"$set": {"refinement_data.previous_structured_prompt": ref}},
+        {"$set": {"result_data.structured_prompt": ref}},
+    ]
+    assert store.db == {prompt_hash(prompt): prompt}
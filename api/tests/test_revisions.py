@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.db.db_collections import decode_revisions_cursor, encode_revisions_cursor
+from app.db.migrate_revisions import revision_documents
+
+
+def test_cursor_round_trips_to_keyset_filter():
+    ts = datetime(2026, 10, 1, 12, 0, 0, 123000)  # Mongo returns naive UTC datetimes
+    oid = ObjectId()
+    query = decode_revisions_cursor(encode_revisions_cursor({"timestamp": ts, "_id": oid}))
+    expected_ts = ts.replace(tzinfo=timezone.utc)
+    assert query == {"$or": [{"timestamp": {"$lt": expected_ts}}, {"timestamp": expected_ts, "_id": {"$lt": oid}}]}
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_revisions_cursor("not-a-cursor")
+
+
+def test_embedded_history_becomes_ordered_child_documents():
+    ts = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    parent = {
+        "result_data": {"request_id": "img-1"},
+        "timestamp": ts,
+        "variants": [{"variant_label": "low_hero"}, {"variant_label": "softbox_even"}],
+        "edits": [{"result_data": {"request_id": "edit-1"}}],
+    }
+    documents = revision_documents(parent)
+    assert [(d["kind"], d["migrated_index"]) for d in documents] == [("variant", 0), ("variant", 1), ("edit", 0)]
+    assert all(d["parent_request_id"] == "img-1" for d in documents)
+    assert documents[0]["timestamp"] < documents[1]["timestamp"]
+    assert documents[0]["variant_label"] == "low_hero"
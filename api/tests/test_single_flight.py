@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_keys_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return {"image_url": "https://example.com/a.png"}
+
+    results = await asyncio.gather(*(flight.do("same", work) for _ in range(5)))
+    assert calls == 1
+    assert flight.coalesced == 4
+    assert all(r == {"image_url": "https://example.com/a.png"} for r in results)
+    results[0]["image_url"] = "mutated"
+    assert results[1]["image_url"] == "https://example.com/a.png"
+    assert flight.in_flight == 0
+
+    await flight.do("same", work)
+    assert calls == 2  # finished flights are not cached
+
+
+@pytest.mark.asyncio
+async def test_work_survives_until_last_waiter_cancels():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.gather(first, second, return_exceptions=True)
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+
+from app.services.status_poller import StatusPoller
+
+
+class FakeBria:
+    """Jobs complete after a fixed number of status calls."""
+
+    def __init__(self, polls_to_complete):
+        self.polls_to_complete = polls_to_complete
+        self.calls = {}
+
+    async def fetch_status(self, request_id):
+        self.calls[request_id] = self.calls.get(request_id, 0) + 1
+        if self.calls[request_id] >= self.polls_to_complete[request_id]:
+            return {"status": "COMPLETED", "result": {"image_url": f"https://x/{request_id}.png"}}
+        return {"status": "IN_PROGRESS"}
+
+
+@pytest.mark.asyncio
+async def test_poller_resolves_each_job_from_one_background_task():
+    bria = FakeBria({"a": 1, "b": 3, "c": 2})
+    poller = StatusPoller(bria.fetch_status, min_interval=0.01, max_interval=0.02, jitter=0.0)
+    try:
+        results = await asyncio.gather(*(poller.wait_for(rid, timeout=2) for rid in ("a", "b", "c")))
+        assert [r["result"]["image_url"] for r in results] == [f"https://x/{rid}.png" for rid in ("a", "b", "c")]
+        assert bria.calls == {"a": 1, "b": 3, "c": 2}
+        assert poller.in_flight == 0
+        assert poller.completion_percentile(50) is not None
+    finally:
+        await poller.stop()
+
+
+@pytest.mark.asyncio
+async def test_poller_timeout_stops_polling_job():
+    bria = FakeBria({"slow": 10_000})
+    poller = StatusPoller(bria.fetch_status, min_interval=0.01, max_interval=0.01, jitter=0.0)
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await poller.wait_for("slow", timeout=0.05)
+        calls_at_timeout = bria.calls["slow"]
+        await asyncio.sleep(0.05)
+        assert bria.calls["slow"] == calls_at_timeout
+        assert poller.in_flight == 0
+    finally:
+        await poller.stop()
+
+
+@pytest.mark.asyncio
+async def test_hung_status_call_does_not_delay_other_jobs():
+    bria = FakeBria({"hung": 10_000, "a": 2, "b": 3})
+    release = asyncio.Event()
+    hung_calls = 0
+
+    async def fetch_status(request_id):
+        nonlocal hung_calls
+        if request_id == "hung":
+            hung_calls += 1
+            await release.wait()  # e.g. a GET stuck until the HTTP timeout
+        return await bria.fetch_status(request_id)
+
+    poller = StatusPoller(fetch_status, min_interval=0.01, max_interval=0.02, jitter=0.0, concurrency=4)
+    try:
+        hung = asyncio.ensure_future(poller.wait_for("hung", timeout=5))
+        await asyncio.sleep(0.02)  # the hung poll is in flight before the others are tracked
+        results = await asyncio.wait_for(asyncio.gather(poller.wait_for("a"), poller.wait_for("b")), timeout=0.5)
+        assert [r["status"] for r in results] == ["COMPLETED", "COMPLETED"]
+        assert hung_calls == 1  # not picked again while its GET is outstanding
+        release.set()
+    finally:
+        hung.cancel()
+        await poller.stop()
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+
+from app.services.variant_writer import VariantBatchWriter
+
+
+class FakeImagesCollection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.pushes = []
+
+    async def push_variants(self, request_id, variants):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("write concern timeout")
+        self.pushes.append((request_id, [v["variant_label"] for v in variants]))
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_written_in_one_push():
+    collection = FakeImagesCollection()
+    writer = VariantBatchWriter(collection, "req-1", max_batch=3, max_delay=10)
+    await asyncio.gather(*(writer.add({"variant_label": label}) for label in ("a", "b", "c")))
+    assert collection.pushes == [("req-1", ["a", "b", "c"])]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushes_after_delay():
+    collection = FakeImagesCollection()
+    writer = VariantBatchWriter(collection, "req-1", max_batch=5, max_delay=0.05)
+    await asyncio.wait_for(asyncio.gather(writer.add({"variant_label": "a"}), writer.add({"variant_label": "b"})), timeout=1)
+    assert collection.pushes == [("req-1", ["a", "b"])]
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_reported_to_every_waiter_and_survives_cancellation():
+    collection = FakeImagesCollection(fail=True)
+    writer = VariantBatchWriter(collection, "req-1", max_batch=2, max_delay=10)
+    first = asyncio.create_task(writer.add({"variant_label": "a"}))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(RuntimeError):
+        await writer.add({"variant_label": "b"})
+    await writer.flush()
+
+    collection.fail = False
+    cancelled = asyncio.create_task(writer.add({"variant_label": "c"}))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await writer.flush()
+    assert collection.pushes == [("req-1", ["c"])]  # cancelling the caller doesn't drop the write